@@ -11,6 +11,7 @@ from routes.user import user
 from routes.career import career
 from routes.payment import payment
 from routes.message import message
+from auth.principal import AuthError, auth_error_handler  # Error y manejador de las dependencias de autorización.
 from fastapi.middleware.cors import CORSMiddleware  # Importa el middleware CORS para manejar solicitudes de origen cruzado.
 from fastapi.staticfiles import StaticFiles  # Importa StaticFiles para servir archivos estáticos.
 
@@ -30,6 +31,10 @@ api_escu.include_router(career)
 api_escu.include_router(payment)
 api_escu.include_router(message)
 
+# Registra el manejador que convierte los errores de autorización (401/403) de las dependencias
+# compartidas en la respuesta {"message": ...} que espera el frontend.
+api_escu.add_exception_handler(AuthError, auth_error_handler)
+
 # Añade el middleware CORS (Cross-Origin Resource Sharing) a la aplicación.
 # Esto permite que los clientes de diferentes orígenes (dominios) realicen solicitudes a esta API.
 api_escu.add_middleware(
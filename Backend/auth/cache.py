@@ -0,0 +1,60 @@
+# Importación de módulos necesarios
+# OrderedDict recuerda el orden de uso de las claves (sirve para descartar la menos usada, LRU),
+# time.monotonic da un reloj que no retrocede aunque cambie la hora del sistema,
+# threading.Lock protege el caché si se usa desde varios hilos a la vez.
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Caché en memoria acotado, con expiración por tiempo (TTL) y descarte LRU.
+    - maxsize: cantidad máxima de entradas. Al superarla se descarta la usada hace más tiempo.
+    - ttl: segundos que vive una entrada por defecto. Cada entrada puede tener su propio vencimiento.
+    Es un caché por proceso: con varios workers de uvicorn cada uno tiene el suyo.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # clave -> (vencimiento, valor)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Devuelve el valor guardado o None si no existe o ya venció."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            # Se marca como recién usada para que sea la última en descartarse.
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Guarda un valor. `ttl` permite un vencimiento distinto al del caché (en segundos)."""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, predicate):
+        """Elimina todas las entradas cuya clave cumpla la condición `predicate(clave)`."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,197 @@
+# Dependencias de autorización compartidas por los routers.
+# Resuelven "quién hace la petición" (el principal) a partir del JWT y verifican su rol,
+# para que cada ruta no tenga que repetir la consulta del usuario y de su detalle.
+from fastapi import Header, Depends, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert   # INSERT con ON CONFLICT (propio de PostgreSQL)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from auth.security import Security
+from auth.cache import TTLCache
+from configs.async_db import get_async_db, AsyncSessionLocal
+from models.modelo import User, TokenRevocation
+import os
+import threading
+import time
+
+
+class Principal:
+    """Datos mínimos del usuario autenticado que necesitan las rutas para autorizar."""
+
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+
+class AuthError(Exception):
+    """
+    Error de autenticación (401) o de permisos (403) lanzado por las dependencias.
+    El manejador `auth_error_handler` lo convierte en la misma respuesta {"message": ...}
+    que devuelven el resto de las rutas, que es lo que lee el frontend.
+    """
+
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.message = message
+
+
+async def auth_error_handler(request: Request, exc: AuthError):
+    return JSONResponse(status_code=exc.status_code, content={"message": exc.message})
+
+
+# Caché de principales, indexado por (user_id, token). Tamaño y duración configurables.
+# Como es por proceso, el TTL acota cuánto puede tardar otro worker en ver un cambio de rol.
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+    ttl=int(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+)
+
+
+def invalidate_principal(user_id):
+    """Descarta del caché todas las entradas del usuario (se llama al modificarlo o borrarlo)."""
+    principal_cache.invalidate(lambda key: key[0] == user_id)
+
+
+# Modo de autorización sin estado: si está activo, el rol se toma del claim "role" del JWT
+# (que está firmado, así que no se puede falsificar) y no se consulta la base de datos.
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() in ("1", "true", "yes")
+
+
+# Cada cuántos segundos un worker vuelve a leer la lista de revocaciones de la base de datos.
+# Es lo más que puede tardar un token revocado en otro worker en dejar de valer.
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+
+
+class RevocationList:
+    """
+    Copia en memoria de la tabla token_revocation: user_id -> momento de la revocación (segundos enteros,
+    como el 'iat' del JWT). La tabla es la que comparten todos los workers; cada proceso la relee con
+    `refresh` como mucho cada REVOCATION_SYNC_SECONDS, así que verificar un token no agrega una consulta
+    por petición (tampoco en modo AUTH_STATELESS). Una entrada deja de ser necesaria cuando vencen todos
+    los tokens emitidos antes de ella, así que la lista nunca crece más allá de los cambios hechos en las
+    últimas `Security.token_minutes`.
+    """
+
+    def __init__(self):
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self._synced_at = None
+
+    @staticmethod
+    def oldest_relevant():
+        """Revocaciones anteriores a este momento ya no afectan a ningún token vigente."""
+        return int(time.time()) - Security.token_minutes * 60
+
+    def revoke(self, user_id, revoked_at):
+        with self._lock:
+            self._revoked[user_id] = revoked_at
+
+    def is_revoked(self, user_id, issued_at):
+        """
+        Un token está revocado si se emitió antes del segundo de la revocación. Uno emitido en ese mismo
+        segundo se acepta: puede ser el del nuevo inicio de sesión y el 'iat' no permite distinguirlos.
+        """
+        revoked_at = self._revoked.get(user_id)
+        return revoked_at is not None and issued_at < revoked_at
+
+    async def refresh(self, db_session):
+        """Relee la tabla de revocaciones si pasaron más de REVOCATION_SYNC_SECONDS desde la última vez."""
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < REVOCATION_SYNC_SECONDS:
+            return
+        # Se marca antes de consultar para que las peticiones concurrentes no repitan la consulta.
+        self._synced_at = now
+        rows = (await db_session.execute(
+            select(TokenRevocation.user_id, TokenRevocation.revoked_at)
+            .where(TokenRevocation.revoked_at > self.oldest_relevant())
+        )).all()
+        with self._lock:
+            self._revoked = {row.user_id: row.revoked_at for row in rows}
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+revoked_users = RevocationList()
+
+
+async def revoke_user(db_session, user_id):
+    """
+    Invalida los tokens ya emitidos del usuario (cambio de rol o borrado) y su principal cacheado.
+    La revocación se escribe en la transacción de `db_session`, así que se llama antes del commit y queda
+    registrada junto con el cambio; los demás workers la ven en su próxima lectura de la tabla.
+    De paso se borran las revocaciones que ya no afectan a ningún token vigente.
+    """
+    revoked_at = int(time.time())
+    await db_session.execute(delete(TokenRevocation).where(TokenRevocation.revoked_at <= RevocationList.oldest_relevant()))
+    await db_session.execute(
+        pg_insert(TokenRevocation).values(user_id=user_id, revoked_at=revoked_at)
+        .on_conflict_do_update(index_elements=[TokenRevocation.user_id], set_={"revoked_at": revoked_at})
+    )
+    revoked_users.revoke(user_id, revoked_at)
+    invalidate_principal(user_id)
+
+
+async def get_principal(authorization: str | None = Header(default=None), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Dependencia que devuelve el Principal de la petición.
+    Verifica el token y que no esté revocado (según la lista compartida de revocaciones, que se relee
+    cada REVOCATION_SYNC_SECONDS). En modo sin estado (AUTH_STATELESS) confía en los
+    claims del token; si no, busca al usuario en el caché y solo si no está consulta la base de
+    datos (una única consulta con el detalle ya cargado).
+    """
+    token_data = Security.verify_token({"authorization": authorization})
+    if "user_id" not in token_data:
+        raise AuthError(401, "Token inválido o no proporcionado.")
+
+    await revoked_users.refresh(db_session)
+    if revoked_users.is_revoked(token_data["user_id"], token_data["iat"]):
+        raise AuthError(401, "La sesión ya no es válida. Vuelve a iniciar sesión.")
+
+    if AUTH_STATELESS:
+        # Cero consultas: el principal se arma con los claims firmados del token.
+        return Principal(token_data["user_id"], token_data["username"], token_data["role"])
+
+    cache_key = (token_data["user_id"], authorization)
+    principal = principal_cache.get(cache_key)
+    if principal is not None:
+        return principal
+
+    user_found = await db_session.scalar(select(User).options(joinedload(User.userdetail)).where(User.id == token_data["user_id"]))
+    if not user_found or not user_found.userdetail:
+        raise AuthError(401, "Token inválido o no proporcionado.")
+
+    principal = Principal(user_found.id, user_found.username, user_found.userdetail.type)
+    principal_cache.set(cache_key, principal)
+    return principal
+
+
+async def still_authorized(authorization):
+    """
+    Vuelve a verificar un token que ya se aceptó: que no haya vencido y que no se haya revocado después.
+    La usan las conexiones que quedan abiertas mucho tiempo, como el canal de mensajes en tiempo real.
+    La lista de revocaciones se relee solo si pasaron REVOCATION_SYNC_SECONDS; si no, la sesión
+    ni siquiera toma una conexión del pool.
+    """
+    token_data = Security.verify_token({"authorization": authorization})
+    if "user_id" not in token_data:
+        return False
+    async with AsyncSessionLocal() as session:
+        await revoked_users.refresh(session)
+    return not revoked_users.is_revoked(token_data["user_id"], token_data["iat"])
+
+
+async def require_admin(principal: Principal = Depends(get_principal)):
+    """Dependencia que exige rol de administrador."""
+    if principal.role != "administrador":
+        raise AuthError(403, "Permiso denegado. Se requiere rol de administrador.")
+    return principal
+
+
+async def require_professor(principal: Principal = Depends(get_principal)):
+    """Dependencia que exige rol de profesor."""
+    if principal.role != "profesor":
+        raise AuthError(403, "Acceso denegado. Se requiere rol de profesor.")
+    return principal
@@ -1,11 +1,25 @@
 # Importación de módulos necesarios
 # para trabajar con fechas y horas(datetime), para manejar zonas horarias (pytz), para codificar y decodificar tokens (jwt)
 import datetime, pytz, jwt
+# os (para leer la configuración desde variables de entorno) y time (para calcular cuánto le queda a un token)
+import os, time
+# Caché acotado con vencimiento por entrada (se usa para recordar tokens ya verificados)
+from auth.cache import TTLCache
 
 class Security:
     # Clave secreta utilizada para firmar y verificar los tokens JWT.
     # Es crucial que esta clave sea robusta y se mantenga segura en un entorno de producción.
     secret = "cualquier cosa"
+    # Duración de los tokens en minutos (8 horas).
+    token_minutes = 480
+    # Caché opcional de tokens ya verificados (token -> payload). Con tamaño 0 (por defecto) está desactivado.
+    # Se activa con la variable de entorno JWT_CACHE_SIZE o con `enable_token_cache`.
+    _token_cache = TTLCache(maxsize=int(os.getenv("JWT_CACHE_SIZE", "0")))
+
+    @classmethod
+    def enable_token_cache(cls, maxsize=1024):
+        """Activa (o desactiva con maxsize=0) el caché de tokens verificados."""
+        cls._token_cache = TTLCache(maxsize=maxsize)
 
     @classmethod
     def hoy(cls):
@@ -28,8 +42,8 @@ class Security:
             # 'iat' (issued at): Marca de tiempo de cuándo se emitió el token.
             "iat": cls.hoy(), 
             # 'exp' (expiration time): Marca de tiempo de cuándo expira el token.
-            # Se establece 480 minutos (8 horas) después de la hora de emisión.
-            "exp": cls.hoy() + datetime.timedelta(minutes=480),
+            # Se establece `token_minutes` minutos (8 horas) después de la hora de emisión.
+            "exp": cls.hoy() + datetime.timedelta(minutes=cls.token_minutes),
             # Nombre de usuario del usuario autenticado.
             "username" : authUser.username,
             # ID del usuario autenticado.
@@ -56,9 +70,17 @@ class Security:
                 # Extrae el token. Se asume que el token viene en el formato 'Bearer <token>',
                 # por lo que se hace un split(" ") y se toma la segunda parte.
                 tkn = headers["authorization"].split(" ")[1]
+                # Si el token ya se verificó antes y no venció, se evita recalcular la firma HMAC.
+                # Se devuelve una copia para que quien lo use no modifique el payload cacheado.
+                cached = cls._token_cache.get(tkn)
+                if cached is not None:
+                    return dict(cached)
                 # Intenta decodificar el token usando la clave secreta y el algoritmo HS256.
                 # Si la decodificación es exitosa, devuelve el payload.
                 payload = jwt.decode(tkn, cls.secret, algorithms=["HS256"])
+                # La entrada vence justo cuando vence el token (claim 'exp').
+                if "exp" in payload:
+                    cls._token_cache.set(tkn, dict(payload), ttl=payload["exp"] - time.time())
                 return payload
             except jwt.ExpiredSignatureError:  # Captura el error si el token ha expirado
                 return {"message":"El token ha expirado!"}
@@ -0,0 +1,478 @@
+"""
+Script de benchmark de la API.
+Lanza peticiones concurrentes contra un servidor en ejecución y mide cómo escala el
+rendimiento (peticiones por segundo) a medida que aumenta la concurrencia.
+
+Uso:
+    uvicorn app:api_escu --workers 1          (en otra terminal)
+    python benchmark.py concurrencia --usuario admin --password 1234
+    python benchmark.py concurrencia --ruta /career/all --niveles 1 4 16 64
+    python benchmark.py verificacion          (no necesita servidor)
+    python benchmark.py arranque              (tiempo de importar la app, como al iniciar un worker)
+    python benchmark.py busqueda --usuarios 100000   (datos sintéticos en la base de DATABASE_URL, que se deshacen al terminar)
+    python benchmark.py consultas             (cantidad de consultas SQL por ruta; falla si crece con los datos)
+    python benchmark.py pagos --pagos 1000000 (páginas de /payment/all/detailled; datos sintéticos que se deshacen al terminar)
+    python benchmark.py morosos --alumnos 50000 --meses 24   (reporte de meses impagos; datos sintéticos que se deshacen al terminar)
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+def login(base_url, username, password):
+    """Obtiene un token JWT haciendo login contra la API."""
+    body = json.dumps({"username": username, "password": password}).encode()
+    req = urllib.request.Request(f"{base_url}/users/login", data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as res:
+        return json.loads(res.read())["token"]
+
+
+def timed_get(url, headers):
+    """Hace un GET y devuelve (latencia en segundos, código de estado)."""
+    start = time.perf_counter()
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req) as res:
+            res.read()
+            code = res.status
+    except urllib.error.HTTPError as e:
+        code = e.code
+    return time.perf_counter() - start, code
+
+
+def bench_concurrency(args):
+    """Mide peticiones/segundo y latencias para cada nivel de concurrencia."""
+    headers = {}
+    if args.usuario:
+        headers["Authorization"] = f"Bearer {login(args.url, args.usuario, args.password)}"
+    url = f"{args.url}{args.ruta}"
+
+    print(f"Ruta: {url} | {args.peticiones} peticiones por nivel")
+    print(f"{'concurrencia':>12} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'errores':>8}")
+    for level in args.niveles:
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            start = time.perf_counter()
+            results = list(pool.map(lambda _: timed_get(url, headers), range(args.peticiones)))
+            elapsed = time.perf_counter() - start
+        latencies = sorted(r[0] for r in results)
+        errors = sum(1 for r in results if r[1] >= 400)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{level:>12} {args.peticiones / elapsed:>10.1f} "
+              f"{statistics.median(latencies) * 1000:>10.1f} {p95 * 1000:>10.1f} {errors:>8}")
+
+
+def bench_verify(args):
+    """Compara verificaciones de token por segundo sin caché y con el caché de Security."""
+    from auth.security import Security
+
+    class FakeDetail:
+        type = "administrador"
+
+    class FakeUser:
+        id = 1
+        username = "benchmark"
+        userdetail = FakeDetail()
+
+    headers = {"authorization": f"Bearer {Security.generate_token(FakeUser())}"}
+    for label, size in (("sin caché", 0), ("con caché", 1024)):
+        Security.enable_token_cache(size)
+        start = time.perf_counter()
+        for _ in range(args.iteraciones):
+            Security.verify_token(headers)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>10}: {args.iteraciones / elapsed:>12.0f} verificaciones/s")
+    Security.enable_token_cache(0)
+
+
+def bench_startup(args):
+    """
+    Mide cuánto tarda un proceso nuevo en importar la aplicación (lo que hace cada worker de uvicorn
+    al arrancar). Cada medición es un intérprete nuevo para que no influyan los módulos ya importados.
+    """
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(args.repeticiones):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    print(f"importar app: mediana {statistics.median(times) * 1000:.1f} ms, "
+          f"mínimo {min(times) * 1000:.1f} ms ({args.repeticiones} procesos)")
+
+
+# Nombres para los usuarios sintéticos de `busqueda`.
+BENCH_FIRST_NAMES = ["Ana", "Juan", "María", "Pedro", "Lucía", "Carlos", "Sofía", "Diego", "Valentina", "Martín",
+                     "Camila", "Javier", "Florencia", "Nicolás", "Julieta", "Tomás", "Agustina", "Federico"]
+BENCH_LAST_NAMES = ["Gómez", "Rodríguez", "Fernández", "López", "Martínez", "Pérez", "García", "Sánchez",
+                    "Romero", "Sosa", "Torres", "Álvarez", "Ruiz", "Ramírez", "Flores", "Benítez", "Acosta", "Medina"]
+
+
+@contextmanager
+def rolled_back_connection(engine):
+    """
+    Conexión con una transacción que se deshace siempre al salir, pase lo que pase.
+    Los benchmarks crean sus datos sintéticos y miden dentro de ella (ANALYZE incluido), así la base de
+    datos queda como estaba: ni usuarios "bench" con contraseña conocida, ni pagos o inscripciones que
+    aparezcan en los reportes, los contadores o el resumen de recaudación.
+    """
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            yield conn
+        finally:
+            trans.rollback()
+
+
+def seed_bench_users(conn, total):
+    """
+    Crea usuarios sintéticos (username "bench<n>") hasta llegar a `total`, con dos INSERT ... SELECT
+    sobre generate_series, y actualiza las estadísticas del planificador.
+    `conn` debe venir de `rolled_back_connection`: los usuarios no deben quedar en la base.
+    """
+    from sqlalchemy import text
+
+    existing = conn.execute(text("SELECT count(*) FROM \"user\" WHERE username LIKE 'bench%'")).scalar()
+    if existing >= total:
+        return existing
+    params = {"start": existing + 1, "end": total, "first": BENCH_FIRST_NAMES, "last": BENCH_LAST_NAMES}
+    conn.execute(text(
+            "INSERT INTO userdetail (first_name, last_name, dni, type, email) "
+            "SELECT (:first)[1 + n % cardinality(:first)], "
+            "       (:last)[1 + (n / cardinality(:first)) % cardinality(:last)], "
+            "       20000000 + n, CASE WHEN n % 20 = 0 THEN 'profesor' ELSE 'alumno' END, "
+            "       'bench' || n || '@escuela.com' "
+            "FROM generate_series(:start, :end) AS n"
+    ), params)
+    conn.execute(text(
+        "INSERT INTO \"user\" (username, password, id_userdetail) "
+        "SELECT split_part(email, '@', 1), 'bench', id FROM userdetail "
+        "WHERE email LIKE 'bench%' AND id NOT IN (SELECT id_userdetail FROM \"user\" WHERE id_userdetail IS NOT NULL)"
+    ))
+    # ANALYZE dentro de la transacción cuenta las filas recién insertadas; sus estadísticas también se deshacen.
+    conn.execute(text("ANALYZE userdetail, \"user\""))
+    return total
+
+
+def bench_search(args):
+    """
+    Compara la búsqueda indexada de /users/search con lo que hacía el frontend antes:
+    descargar todos los usuarios (como /users/all) y filtrar en memoria.
+    """
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session, joinedload
+    from configs.db import engine
+    from models.modelo import User
+    from routes.user import search_users_query
+
+    with rolled_back_connection(engine) as conn, Session(bind=conn) as session:
+        total = seed_bench_users(conn, args.usuarios)
+        print(f"Usuarios sintéticos: {total}")
+        terms = ["gomez", "ana lop", "bench4217", "20031337", "sofia ram", "martinez", "flor", "bench9@escuela"]
+
+        latencies = []
+        for _ in range(args.repeticiones):
+            for term in terms:
+                start = time.perf_counter()
+                session.execute(search_users_query(term, 20)).all()
+                latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"/users/search (índice): p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms "
+              f"({len(latencies)} búsquedas)")
+
+        start = time.perf_counter()
+        users = session.scalars(select(User).options(joinedload(User.userdetail))).all()
+        found = [u for u in users if "gomez" in f"{u.userdetail.first_name} {u.userdetail.last_name}".lower()]
+        elapsed = time.perf_counter() - start
+        print(f"descargar todo y filtrar:  {elapsed * 1000:.1f} ms por búsqueda ({len(users)} usuarios leídos)")
+
+
+def seed_bench_payments(conn, total, careers=10, students=20000):
+    """
+    Crea pagos sintéticos hasta llegar a `total` (repartidos entre `careers` carreras "bench<n>" y los
+    usuarios de `seed_bench_users`), con un INSERT ... SELECT sobre generate_series. Los meses pagados
+    cubren los últimos cinco años. Devuelve la cantidad de pagos.
+    `conn` debe venir de `rolled_back_connection`: los pagos (y lo que suman los triggers al resumen de
+    recaudación) no deben quedar en la base.
+    """
+    from sqlalchemy import text
+
+    seed_bench_users(conn, students)
+    existing = conn.execute(text("SELECT count(*) FROM payment")).scalar()
+    if existing >= total:
+        return existing
+    conn.execute(text(
+            "INSERT INTO career (name) SELECT 'bench' || n FROM generate_series(1, :careers) AS n "
+        "WHERE NOT EXISTS (SELECT 1 FROM career WHERE name = 'bench' || n)"
+    ), {"careers": careers})
+    career_ids = conn.execute(text("SELECT id FROM career WHERE name LIKE 'bench%' ORDER BY id")).scalars().all()
+    user_ids = conn.execute(text("SELECT id FROM \"user\" WHERE username LIKE 'bench%' ORDER BY id LIMIT :n"),
+                            {"n": students}).scalars().all()
+    conn.execute(text(
+        "INSERT INTO payment (id_career, id_user, amount, affected_month, created_at) "
+        "SELECT (:careers)[1 + n % cardinality(:careers)], "
+        "       (:users)[1 + (n::bigint * 7919) % cardinality(:users)], "
+        "       1000 * (5 + (n::bigint * 31) % 46), "
+        "       date_trunc('month', now() - make_interval(months => (n / cardinality(:careers)) % 60))::date, "
+        "       now() - make_interval(mins => (:end - n)) "
+        "FROM generate_series(:start, :end) AS n"
+    ), {"careers": career_ids, "users": user_ids, "start": existing + 1, "end": total})
+    conn.execute(text("ANALYZE payment"))
+    return total
+
+
+def bench_payments(args):
+    """
+    Latencia de las páginas de /payment/all/detailled sobre pagos sintéticos, con y sin filtros,
+    en la primera página y en una página profunda (cursor a mitad de la tabla).
+    Con --sin-paginar mide además lo que hacía la ruta antes: traer todos los pagos.
+    """
+    import datetime
+    from sqlalchemy import select, func
+    from sqlalchemy.orm import Session, joinedload
+    from configs.db import engine
+    from models.modelo import Payment, User
+    from routes.payment import payments_page_query
+
+    with rolled_back_connection(engine) as conn, Session(bind=conn) as session:
+        total = seed_bench_payments(conn, args.pagos)
+        max_id, career_id, user_id = session.execute(
+            select(func.max(Payment.id), func.min(Payment.id_career), func.min(Payment.id_user))).one()
+        print(f"Pagos sintéticos: {total}")
+        today = datetime.date.today()
+        scenarios = [
+            ("sin filtros", {}),
+            ("página profunda", {"cursor": max_id // 2}),
+            ("por carrera", {"career": career_id}),
+            ("por alumno", {"student": user_id}),
+            ("rango de meses", {"month_from": today.replace(day=1) - datetime.timedelta(days=90), "month_to": today}),
+            ("rango de montos", {"amount_min": 10000, "amount_max": 12000}),
+            ("carrera + meses + montos", {"career": career_id, "month_from": datetime.date(today.year - 2, 1, 1),
+                                          "month_to": datetime.date(today.year - 2, 12, 31), "amount_min": 40000}),
+        ]
+        for label, filters in scenarios:
+            latencies = []
+            for _ in range(args.repeticiones):
+                start = time.perf_counter()
+                rows = session.scalars(payments_page_query(args.limite, **filters)).all()
+                latencies.append(time.perf_counter() - start)
+                session.expunge_all()
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{label:<26} p50 {statistics.median(latencies) * 1000:7.1f} ms, p95 {p95 * 1000:7.1f} ms ({len(rows)} filas)")
+
+        if args.sin_paginar:
+            start = time.perf_counter()
+            payments = session.scalars(select(Payment).options(
+                joinedload(Payment.user).joinedload(User.userdetail), joinedload(Payment.career))).all()
+            print(f"{'todos los pagos (antes)':<26} {(time.perf_counter() - start) * 1000:9.1f} ms ({len(payments)} filas)")
+
+
+# Período de los pagos sintéticos de `morosos`: empieza en un año sin pagos reales para no mezclarse con ellos.
+DELINQUENCY_BENCH_START = "2000-01-01"
+
+
+def seed_bench_delinquency(conn, students, months, careers=10):
+    """
+    Inscribe a `students` alumnos sintéticos en las carreras "bench<n>" y registra sus pagos de `months`
+    meses desde DELINQUENCY_BENCH_START, dejando sin pagar alrededor de uno de cada veinte
+    (alumno, mes). Todo con INSERT ... SELECT; si los pagos del período ya existen no se vuelven a crear.
+    `conn` debe venir de `rolled_back_connection`: las inscripciones (y los contadores de alumnos que
+    actualizan sus triggers) y los pagos no deben quedar en la base.
+    """
+    from sqlalchemy import text
+
+    # Uno de cada veinte usuarios de `seed_bench_users` es profesor.
+    seed_bench_users(conn, students * 20 // 19 + 1)
+    conn.execute(text(
+        "INSERT INTO career (name) SELECT 'bench' || n FROM generate_series(1, :careers) AS n "
+        "WHERE NOT EXISTS (SELECT 1 FROM career WHERE name = 'bench' || n)"
+    ), {"careers": careers})
+    career_ids = conn.execute(text("SELECT id FROM career WHERE name LIKE 'bench%' ORDER BY id")).scalars().all()
+    conn.execute(text(
+        "INSERT INTO pivote_user_career (id_user, id_career) "
+        "SELECT u.id, (:careers)[1 + u.id % cardinality(:careers)] "
+        "FROM \"user\" u JOIN userdetail d ON d.id = u.id_userdetail "
+        "WHERE u.username LIKE 'bench%' AND d.type = 'alumno' "
+        "ORDER BY u.id LIMIT :students "
+        "ON CONFLICT (id_user, id_career) DO NOTHING"
+    ), {"careers": career_ids, "students": students})
+    end = conn.execute(text("SELECT (CAST(:start AS date) + make_interval(months => :months - 1))::date"),
+                       {"start": DELINQUENCY_BENCH_START, "months": months}).scalar()
+    already = conn.execute(text("SELECT count(*) FROM payment WHERE affected_month BETWEEN :start AND :end"),
+                           {"start": DELINQUENCY_BENCH_START, "end": end}).scalar()
+    if not already:
+        conn.execute(text(
+            "INSERT INTO payment (id_career, id_user, amount, affected_month, created_at) "
+            "SELECT p.id_career, p.id_user, 10000, m::date, m "
+            "FROM pivote_user_career p JOIN \"user\" u ON u.id = p.id_user "
+            "CROSS JOIN generate_series(CAST(:start AS date), CAST(:end AS date), interval '1 month') AS m "
+            "WHERE u.username LIKE 'bench%' AND (p.id_user * 31 + extract(month FROM m)::int) % 20 <> 0"
+        ), {"start": DELINQUENCY_BENCH_START, "end": end})
+    conn.execute(text("ANALYZE payment, pivote_user_career"))
+    return end
+
+
+def bench_delinquency(args):
+    """
+    Tiempo del reporte de meses impagos (/payment/reports/delinquency) sobre el período sintético:
+    el cálculo completo (todas las filas, como la exportación CSV) y la primera página del JSON.
+    """
+    import datetime
+    from sqlalchemy.orm import Session
+    from configs.db import engine
+    from routes.payment import delinquency_query, delinquency_page_query
+
+    with rolled_back_connection(engine) as conn, Session(bind=conn) as session:
+        month_to = seed_bench_delinquency(conn, args.alumnos, args.meses)
+        month_from = datetime.date.fromisoformat(DELINQUENCY_BENCH_START)
+        start = time.perf_counter()
+        rows = session.execute(delinquency_query(month_from, month_to)).all()
+        elapsed = time.perf_counter() - start
+        students = len({(row.id_user, row.id_career) for row in rows})
+        print(f"reporte completo: {elapsed * 1000:.0f} ms, {len(rows)} meses impagos de {students} inscripciones "
+              f"({args.alumnos} alumnos x {args.meses} meses)")
+        start = time.perf_counter()
+        page = session.execute(delinquency_page_query(month_from, month_to, limit=100)).all()
+        print(f"primera página (100 alumnos): {(time.perf_counter() - start) * 1000:.0f} ms")
+        start = time.perf_counter()
+        page = session.execute(delinquency_page_query(month_from, month_to, limit=100, after=(page[-1].id_user, page[-1].id_career))).all()
+        print(f"página siguiente: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+async def seed_dashboard(session, careers, students):
+    """Crea un profesor asignado a `careers` carreras y `students` alumnos repartidos entre ellas. Devuelve el ID del profesor."""
+    from models.modelo import User, UserDetail, Career, PivoteUserCareer
+
+    tag = f"{careers}x{students}"
+    professor = User(f"qc_prof_{tag}", "x")
+    professor.userdetail = UserDetail("Prof", tag, 0, "profesor", f"qc_prof_{tag}@bench")
+    new_careers = [Career(f"qc_{tag}_{i}") for i in range(careers)]
+    session.add_all([professor, *new_careers])
+    await session.flush()
+    session.add_all(PivoteUserCareer(professor.id, c.id) for c in new_careers)
+    for i in range(students):
+        student = User(f"qc_al_{tag}_{i}", "x")
+        student.userdetail = UserDetail("Alumno", str(i), i, "alumno", f"qc_al_{tag}_{i}@bench")
+        session.add(student)
+        await session.flush()
+        session.add(PivoteUserCareer(student.id, new_careers[i % careers].id))
+    await session.flush()
+    return professor.id
+
+
+async def count_queries(engine, call):
+    """Ejecuta `call()` y devuelve (resultado, cantidad de sentencias SQL enviadas a la base de datos)."""
+    from sqlalchemy import event
+
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    try:
+        result = await call()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+    return result, len(statements)
+
+
+async def check_query_counts(args):
+    """
+    Llama a las rutas directamente, con datos chicos y con datos grandes, y compara la cantidad de consultas.
+    Los datos se crean dentro de una transacción que se deshace al final: la base de datos queda como estaba.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from configs.async_db import async_engine
+    from auth.principal import Principal
+    from routes.career import get_professor_dashboard_data
+
+    failures = 0
+    async with async_engine.connect() as conn:
+        trans = await conn.begin()
+        session = AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False)
+        try:
+            counts = []
+            for careers, students in ((1, 2), (args.carreras, args.alumnos)):
+                professor_id = await seed_dashboard(session, careers, students)
+                professor = Principal(professor_id, "qc", "profesor")
+                data, queries = await count_queries(
+                    async_engine, lambda: get_professor_dashboard_data(professor=professor, db_session=session))
+                ok = len(data) == careers and sum(d["student_count"] for d in data) == students
+                failures += not ok
+                counts.append(queries)
+                print(f"dashboard del profesor: {careers:>4} carreras, {students:>6} alumnos -> {queries} consulta(s)"
+                      f"{'' if ok else '  (datos incorrectos)'}")
+            if counts[0] != counts[1] or counts[1] > 1:
+                failures += 1
+                print("FALLA: la cantidad de consultas del dashboard del profesor debe ser 1 y no crecer con los datos.")
+        finally:
+            await session.close()
+            await trans.rollback()
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+def bench_query_counts(args):
+    import asyncio
+    asyncio.run(check_query_counts(args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de la API de la escuela.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    conc = sub.add_parser("concurrencia", help="Escalado del throughput según la concurrencia.")
+    conc.add_argument("--url", default="http://localhost:8000")
+    conc.add_argument("--ruta", default="/users/all")
+    conc.add_argument("--usuario", help="Usuario para obtener un token (si la ruta lo requiere).")
+    conc.add_argument("--password", default="")
+    conc.add_argument("--peticiones", type=int, default=500)
+    conc.add_argument("--niveles", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    conc.set_defaults(func=bench_concurrency)
+
+    verif = sub.add_parser("verificacion", help="Throughput de Security.verify_token con y sin caché.")
+    verif.add_argument("--iteraciones", type=int, default=50000)
+    verif.set_defaults(func=bench_verify)
+
+    start = sub.add_parser("arranque", help="Tiempo de importación de la app en un proceso nuevo.")
+    start.add_argument("--repeticiones", type=int, default=10)
+    start.set_defaults(func=bench_startup)
+
+    search = sub.add_parser("busqueda", help="Latencia de /users/search sobre usuarios sintéticos.")
+    search.add_argument("--usuarios", type=int, default=100000, help="Usuarios sintéticos a generar.")
+    search.add_argument("--repeticiones", type=int, default=20)
+    search.set_defaults(func=bench_search)
+
+    queries = sub.add_parser("consultas", help="Verifica que la cantidad de consultas SQL de las rutas no crezca con los datos.")
+    queries.add_argument("--carreras", type=int, default=20)
+    queries.add_argument("--alumnos", type=int, default=500)
+    queries.set_defaults(func=bench_query_counts)
+
+    payments = sub.add_parser("pagos", help="Latencia de las páginas de /payment/all/detailled sobre pagos sintéticos.")
+    payments.add_argument("--pagos", type=int, default=1000000, help="Pagos sintéticos a generar.")
+    payments.add_argument("--limite", type=int, default=50, help="Tamaño de página.")
+    payments.add_argument("--repeticiones", type=int, default=20)
+    payments.add_argument("--sin-paginar", action="store_true", help="Mide también traer todos los pagos de una vez.")
+    payments.set_defaults(func=bench_payments)
+
+    delinquency = sub.add_parser("morosos", help="Tiempo del reporte de meses impagos sobre alumnos sintéticos.")
+    delinquency.add_argument("--alumnos", type=int, default=50000)
+    delinquency.add_argument("--meses", type=int, default=24)
+    delinquency.set_defaults(func=bench_delinquency)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
+
+# python benchmark.py concurrencia --usuario admin --password 1234
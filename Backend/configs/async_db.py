@@ -0,0 +1,32 @@
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from configs.db import DATABASE_URL, POOL_OPTIONS
+import os
+# create_async_engine crea un motor asíncrono: las consultas se esperan con `await` y no bloquean un hilo.
+# async_sessionmaker crea la "fábrica" de sesiones asíncronas (AsyncSession).
+# Se reutilizan la cadena de conexión y la configuración del pool del motor síncrono (configs/db.py).
+
+# Cadena de conexión asíncrona. Por defecto es la misma base de datos que DATABASE_URL pero usando
+# el driver asyncpg ("postgresql+asyncpg://..."). Se puede sobrescribir con ASYNC_DATABASE_URL.
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+)
+
+# Motor asíncrono con el mismo pool configurado (tamaño, overflow, pre-ping, reciclado).
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_OPTIONS)
+
+# expire_on_commit=False: después de un commit los objetos conservan sus valores cargados.
+# En modo asíncrono no se puede hacer "lazy loading" implícito, así que leer un atributo
+# expirado fuera de un `await` fallaría.
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+async def get_async_db():
+    """
+    Dependencia de FastAPI que entrega una sesión asíncrona nueva por cada petición.
+    Mientras la petición espera a PostgreSQL el event loop atiende otras peticiones,
+    por lo que un solo worker de uvicorn puede tener miles de peticiones en curso
+    sin necesidad de agrandar el pool de hilos.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,20 +1,24 @@
-from models.modelo import User, UserDetail, session, Base, engine # <-- Importamos Base y engine
+from models.modelo import User, UserDetail
+from configs.db import SessionLocal, engine
+import migrations
 
 def create_first_admin():
     """
     Script para crear el usuario administrador inicial.
-    También se asegura de que todas las tablas de la DB existan.
+    También se asegura de que el esquema de la DB esté al día aplicando las migraciones pendientes.
     """
-    # --- INICIO DE LA CORRECCIÓN ---
-    # Esta línea crea todas las tablas definidas en tus modelos si no existen.
-    # Es el paso que faltaba.
-    print("Verificando y creando tablas si es necesario...")
-    Base.metadata.create_all(bind=engine)
+    # Aplica las migraciones que falten (en una base nueva crea todas las tablas).
+    # Es lo mismo que ejecutar `python migrate.py`.
+    print("Aplicando migraciones pendientes...")
+    for migration in migrations.upgrade(engine):
+        print(f"  v{migration.version:04d} {migration.name}")
     print("¡Tablas listas!")
-    # --- FIN DE LA CORRECCIÓN ---
 
     print("\n--- Creación del Usuario Administrador Inicial ---")
 
+    # El script abre su propia sesión (ya no existe una sesión global compartida).
+    session = SessionLocal()
+
     # Verificamos si ya existe algún administrador para no crear duplicados
     existing_admin = session.query(UserDetail).filter(UserDetail.type == 'administrador').first()
     if existing_admin:
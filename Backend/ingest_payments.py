@@ -0,0 +1,84 @@
+"""
+Carga masiva de pagos desde un archivo CSV por consola (el mismo proceso que POST /payment/ingest).
+El archivo lleva el encabezado id_user,id_career,amount,affected_month; el mes pagado puede ser
+YYYY-MM-DD o YYYY-MM. El archivo se lee fila por fila y los pagos se registran por lotes, en una sola
+transacción, junto con el mensaje de aviso a cada alumno.
+
+Uso:
+    python ingest_payments.py extracto.csv
+    python ingest_payments.py extracto.csv --simular                (solo valida; no registra nada)
+    python ingest_payments.py extracto.csv --remitente admin        (usuario que firma los avisos)
+    python ingest_payments.py extracto.csv --reporte resultado.csv  (guarda el resultado de cada fila)
+Sale con código 1 si alguna fila tiene errores.
+"""
+import argparse
+import asyncio
+import csv
+import sys
+import time
+from sqlalchemy import select
+from configs.async_db import AsyncSessionLocal
+from models.modelo import User, UserDetail
+from routes.payment import ingest_payments, PaymentIngestError
+
+
+async def find_sender(session, username=None):
+    """ID del usuario que firma los avisos: el indicado o, si no se indica, el primer administrador."""
+    query = select(User.id).join(UserDetail, UserDetail.id == User.id_userdetail)
+    if username:
+        query = query.where(User.username == username)
+    else:
+        query = query.where(UserDetail.type == "administrador").order_by(User.id)
+    return (await session.scalars(query.limit(1))).first()
+
+
+async def run(path, sender, dry_run):
+    async with AsyncSessionLocal() as session:
+        sender_id = await find_sender(session, sender)
+        if sender_id is None:
+            raise PaymentIngestError(f"No existe el usuario '{sender}'." if sender else "No hay ningún administrador para firmar los avisos.")
+        with open(path, encoding="utf-8-sig", newline="") as lines:
+            report = await ingest_payments(lines, session, sender_id, dry_run=dry_run)
+        if dry_run:
+            await session.rollback()
+        else:
+            await session.commit()
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registra los pagos de un archivo CSV.")
+    parser.add_argument("archivo", help="CSV con id_user,id_career,amount,affected_month.")
+    parser.add_argument("--remitente", help="Usuario que firma los avisos (por defecto, el primer administrador).")
+    parser.add_argument("--simular", action="store_true", help="Solo valida el archivo; no registra nada.")
+    parser.add_argument("--reporte", help="Archivo CSV donde guardar el resultado de cada fila.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        report = asyncio.run(run(args.archivo, args.remitente, args.simular))
+    except PaymentIngestError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    for result in report["results"]:
+        if result["status"] in ("error", "duplicate"):
+            print(f"Línea {result['row']}: {result['error']}")
+    if args.reporte:
+        with open(args.reporte, "w", encoding="utf-8", newline="") as output:
+            writer = csv.DictWriter(output, fieldnames=["row", "status", "payment_id", "error"])
+            writer.writeheader()
+            writer.writerows(report["results"])
+
+    done = f"{report['valid']} válidos" if args.simular else f"{report['inserted']} registrados"
+    print(f"{report['processed']} filas en {elapsed:.1f} s: {done}, "
+          f"{report['duplicates']} duplicados, {report['errors']} con errores.")
+    if report["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+
+# python ingest_payments.py extracto.csv
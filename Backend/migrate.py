@@ -0,0 +1,158 @@
+"""
+Comando de migraciones del esquema.
+Aplica las migraciones versionadas de la carpeta migrations/ y comprueba, con EXPLAIN, que las
+consultas más frecuentes de la API usan los índices que esas migraciones crean.
+
+Uso:
+    python migrate.py                 (aplica las migraciones pendientes)
+    python migrate.py aplicar --hasta 1
+    python migrate.py estado
+    python migrate.py planes          (verifica los planes de consulta)
+"""
+import argparse
+import json
+import sys
+from sqlalchemy import select, text, func
+from configs.db import engine
+import migrations
+
+
+def cmd_apply(args):
+    """Aplica las migraciones pendientes y muestra cuáles se ejecutaron."""
+    applied = migrations.upgrade(engine, target=args.hasta)
+    if not applied:
+        print("El esquema ya está actualizado.")
+    for migration in applied:
+        print(f"Aplicada v{migration.version:04d} {migration.name}")
+
+
+def cmd_status(args):
+    """Lista todas las migraciones indicando cuáles están aplicadas y cuándo."""
+    done = migrations.applied_versions(engine)
+    for migration in migrations.discover():
+        applied_at = done.get(migration.version)
+        state = f"aplicada {applied_at:%Y-%m-%d %H:%M}" if applied_at else "pendiente"
+        print(f"v{migration.version:04d} {migration.name:<30} {state}")
+
+
+def hot_queries():
+    """
+    Consultas frecuentes de las rutas y el índice que cada una debe usar.
+    Se arman con los mismos modelos que usan las rutas para que el plan sea el de la consulta real.
+    """
+    from models.modelo import User, UserDetail, Payment, PivoteUserCareer, RevenueMonthly
+    from routes.user import search_users_query
+    from routes.message import inbox_page_query
+    from reconcile_counts import actual_unread_counts
+    import datetime
+
+    return [
+        ("usuarios por rol",
+         select(User).join(User.userdetail).where(UserDetail.type == "profesor"),
+         "ix_userdetail_type"),
+        ("usuarios por apellido",
+         select(User).join(User.userdetail).where(func.lower(UserDetail.last_name).like("gom%")),
+         "ix_userdetail_lower_last_name"),
+        ("búsqueda de usuarios",
+         search_users_query("gomez", 20),
+         "ix_userdetail_search"),
+        ("búsqueda por usuario",
+         search_users_query("gomez", 20),
+         "ix_user_username_search"),
+        ("página de usuarios",
+         select(User).where(User.id > 100).order_by(User.id).limit(51),
+         "user_pkey"),
+        ("usuario de un detalle",
+         select(User).where(User.id_userdetail == 1),
+         "ix_user_id_userdetail"),
+        ("pagos de un alumno",
+         select(Payment).where(Payment.id_user == 1),
+         "ix_payment_user_career_month"),
+        ("pagos de una carrera",
+         select(Payment).where(Payment.id_career == 1),
+         "ix_payment_id_career"),
+        ("pagos de un mes",
+         select(Payment).where(Payment.affected_month == datetime.date(2024, 5, 1)),
+         "ix_payment_affected_month"),
+        ("bandeja de entrada",
+         inbox_page_query(1, 20, after=(datetime.datetime(2024, 5, 1), 1000)),
+         "ix_message_recipient_timestamp_id"),
+        ("bandeja sin leer",
+         inbox_page_query(1, 20, unread_only=True),
+         "ix_message_recipient_unread"),
+        ("mensajes sin leer",
+         actual_unread_counts(),
+         "ix_message_recipient_unread"),
+        ("inscripción existente",
+         select(PivoteUserCareer).filter_by(id_user=1, id_career=1),
+         "uq_pivote_user_career"),
+        ("alumnos de una carrera",
+         select(PivoteUserCareer).where(PivoteUserCareer.id_career == 1),
+         "ix_pivote_user_career_id_career"),
+        ("recaudación por carrera",
+         select(RevenueMonthly).where(RevenueMonthly.id_career == 1,
+                                      RevenueMonthly.affected_month >= datetime.date(2023, 1, 1)),
+         "revenue_monthly_pkey"),
+    ]
+
+
+def plan_indexes(node):
+    """Recorre un plan de EXPLAIN (FORMAT JSON) y devuelve los nombres de índice que usa."""
+    found = set()
+    if "Index Name" in node:
+        found.add(node["Index Name"])
+    for child in node.get("Plans", []):
+        found |= plan_indexes(child)
+    return found
+
+
+def cmd_plans(args):
+    """
+    Ejecuta EXPLAIN de cada consulta frecuente y falla si alguna no usa su índice.
+    Con tablas chicas PostgreSQL prefiere un recorrido secuencial aunque el índice exista, así que
+    se desactiva `enable_seqscan` dentro de la transacción: lo que se comprueba es que el índice
+    sirve para la consulta, no el costo con los datos actuales.
+    """
+    failures = 0
+    with engine.connect() as conn:
+        with conn.begin() as trans:
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            for label, query, index_name in hot_queries():
+                sql = str(query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+                plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                used = plan_indexes(plan[0]["Plan"])
+                ok = index_name in used
+                failures += not ok
+                print(f"{'OK   ' if ok else 'FALLA'} {label:<24} espera {index_name:<32} usa {', '.join(sorted(used)) or '-'}")
+            trans.rollback()
+    if failures:
+        print(f"{failures} consulta(s) no usan el índice esperado. ¿Faltan migraciones? (python migrate.py estado)")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de la escuela.")
+    sub = parser.add_subparsers(dest="comando")
+
+    apply_cmd = sub.add_parser("aplicar", help="Aplica las migraciones pendientes (acción por defecto).")
+    apply_cmd.add_argument("--hasta", type=int, help="Última versión a aplicar.")
+    apply_cmd.set_defaults(func=cmd_apply)
+
+    status_cmd = sub.add_parser("estado", help="Muestra las migraciones aplicadas y pendientes.")
+    status_cmd.set_defaults(func=cmd_status)
+
+    plans_cmd = sub.add_parser("planes", help="Verifica que las consultas frecuentes usan sus índices.")
+    plans_cmd.set_defaults(func=cmd_plans)
+
+    args = parser.parse_args()
+    if args.comando is None:
+        args = parser.parse_args(["aplicar"])
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
+
+# python migrate.py
@@ -0,0 +1,74 @@
+# Migraciones versionadas del esquema de la base de datos.
+# Cada cambio de esquema vive en un módulo `vNNNN_descripcion.py` de esta carpeta, con una función
+# `upgrade(conn)` que recibe una conexión ya dentro de una transacción.
+# La tabla `schema_version` registra qué versiones se aplicaron, así cada migración corre una sola vez
+# y en orden. Se ejecutan con `python migrate.py` (ver migrate.py).
+import importlib
+import pkgutil
+import re
+from sqlalchemy import text
+
+# Nombre de los módulos de migración: "v" + número de versión + "_" + descripción.
+MODULE_PATTERN = re.compile(r"^v(\d{4})_(\w+)$")
+
+
+class Migration:
+    """Una migración disponible en la carpeta: su versión, su nombre y la función que la aplica."""
+
+    def __init__(self, version, name, upgrade):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+
+
+def discover():
+    """Devuelve las migraciones de esta carpeta ordenadas por versión."""
+    migrations = []
+    for module_info in pkgutil.iter_modules(__path__):
+        match = MODULE_PATTERN.match(module_info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f"{__name__}.{module_info.name}")
+        migrations.append(Migration(int(match.group(1)), match.group(2), module.upgrade))
+    migrations.sort(key=lambda m: m.version)
+    return migrations
+
+
+def ensure_version_table(conn):
+    """Crea la tabla de control de versiones si todavía no existe."""
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        " version integer PRIMARY KEY,"
+        " name varchar(100) NOT NULL,"
+        " applied_at timestamp NOT NULL DEFAULT now())"
+    ))
+
+
+def applied_versions(engine):
+    """Devuelve {versión: fecha de aplicación} de las migraciones ya aplicadas."""
+    with engine.begin() as conn:
+        ensure_version_table(conn)
+        rows = conn.execute(text("SELECT version, applied_at FROM schema_version"))
+        return {row.version: row.applied_at for row in rows}
+
+
+def upgrade(engine, target=None):
+    """
+    Aplica en orden las migraciones pendientes (hasta `target` inclusive, si se indica).
+    Cada migración corre en su propia transacción junto con su registro en `schema_version`:
+    si falla, no queda aplicada a medias y las anteriores siguen registradas.
+    Devuelve la lista de migraciones aplicadas.
+    """
+    done = applied_versions(engine)
+    applied = []
+    for migration in discover():
+        if migration.version in done or (target is not None and migration.version > target):
+            continue
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version, name) VALUES (:version, :name)"),
+                {"version": migration.version, "name": migration.name},
+            )
+        applied.append(migration)
+    return applied
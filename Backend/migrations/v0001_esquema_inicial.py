@@ -0,0 +1,64 @@
+# Esquema inicial: las tablas tal como las creaba `Base.metadata.create_all` a partir de models/modelo.py.
+# Usa IF NOT EXISTS para que una base de datos creada antes de las migraciones quede registrada
+# en esta versión sin tocar sus datos.
+from sqlalchemy import text
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS userdetail (
+        id SERIAL PRIMARY KEY,
+        first_name varchar(50),
+        last_name varchar(50),
+        dni integer,
+        type varchar(50),
+        email varchar(50) NOT NULL UNIQUE,
+        profile_image_url varchar(255)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS career (
+        id SERIAL PRIMARY KEY,
+        name varchar(50)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS "user" (
+        id SERIAL PRIMARY KEY,
+        username varchar(50) NOT NULL UNIQUE,
+        password varchar(40),
+        id_userdetail integer REFERENCES userdetail (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS payment (
+        id SERIAL PRIMARY KEY,
+        id_career integer REFERENCES career (id),
+        id_user integer REFERENCES "user" (id),
+        amount integer,
+        affected_month date,
+        created_at timestamp
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pivote_user_career (
+        id SERIAL PRIMARY KEY,
+        id_career integer REFERENCES career (id),
+        id_user integer REFERENCES "user" (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS message (
+        id SERIAL PRIMARY KEY,
+        sender_id integer NOT NULL REFERENCES "user" (id),
+        recipient_id integer NOT NULL REFERENCES "user" (id),
+        content varchar(500) NOT NULL,
+        "timestamp" timestamp,
+        is_read boolean NOT NULL
+    )
+    """,
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
@@ -0,0 +1,34 @@
+# Índices para las columnas por las que filtran y ordenan las consultas más frecuentes,
+# y la restricción de unicidad de las inscripciones (un alumno no puede estar dos veces en la misma carrera).
+# Los nombres coinciden con los declarados en models/modelo.py.
+from sqlalchemy import text
+
+STATEMENTS = [
+    # Filtros por rol ("alumno", "profesor", "administrador").
+    "CREATE INDEX IF NOT EXISTS ix_userdetail_type ON userdetail (type)",
+    # Unión user -> userdetail desde el lado del detalle (p. ej. "todos los profesores").
+    'CREATE INDEX IF NOT EXISTS ix_user_id_userdetail ON "user" (id_userdetail)',
+    # Pagos de un alumno, de una carrera y de un mes.
+    "CREATE INDEX IF NOT EXISTS ix_payment_id_user ON payment (id_user)",
+    "CREATE INDEX IF NOT EXISTS ix_payment_id_career ON payment (id_career)",
+    "CREATE INDEX IF NOT EXISTS ix_payment_affected_month ON payment (affected_month)",
+    # Bandeja de entrada: mensajes de un destinatario ordenados por fecha. El índice compuesto
+    # resuelve el filtro y el ORDER BY sin ordenar en memoria.
+    'CREATE INDEX IF NOT EXISTS ix_message_recipient_timestamp ON message (recipient_id, "timestamp")',
+    # Alumnos de una carrera (el índice único de abajo empieza por id_user y no sirve para esto).
+    "CREATE INDEX IF NOT EXISTS ix_pivote_user_career_id_career ON pivote_user_career (id_career)",
+    # Antes de exigir unicidad se borran las inscripciones repetidas, conservando la más antigua.
+    """
+    DELETE FROM pivote_user_career duplicate
+    USING pivote_user_career original
+    WHERE duplicate.id_user = original.id_user
+      AND duplicate.id_career = original.id_career
+      AND duplicate.id > original.id
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_pivote_user_career ON pivote_user_career (id_user, id_career)",
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
@@ -0,0 +1,14 @@
+# Índices para el filtro por prefijo de nombre o apellido del listado de usuarios (/users/all?name=...).
+# Se indexa lower(columna) porque la búsqueda no distingue mayúsculas, y se usa varchar_pattern_ops
+# para que PostgreSQL pueda resolver `LIKE 'abc%'` con el índice cualquiera sea la collation de la base.
+from sqlalchemy import text
+
+STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_userdetail_lower_first_name ON userdetail (lower(first_name) varchar_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_userdetail_lower_last_name ON userdetail (lower(last_name) varchar_pattern_ops)",
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
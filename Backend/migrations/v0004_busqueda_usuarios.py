@@ -0,0 +1,32 @@
+# Índices de texto completo (GIN) para la búsqueda de usuarios (/users/search).
+# Uno cubre nombre, apellido, email y DNI del detalle; el otro el nombre de usuario, que está en otra tabla.
+# Se usa la configuración 'simple' (sin diccionario ni stemming): los nombres propios, emails y números
+# se indexan tal cual, en minúsculas. Además:
+# - se quitan los acentos con translate() para que "gomez" encuentre "Gómez";
+# - en el email se reemplazan '@', '.' y '-' por espacios para que cada parte ("ana", "lopez", "escuela")
+#   sea un término y se pueda buscar por prefijo.
+# Las expresiones deben coincidir exactamente con USER_DETAIL_SEARCH_VECTOR y USERNAME_SEARCH_VECTOR
+# de routes/user.py; si no, PostgreSQL no usa el índice.
+from sqlalchemy import text
+
+STATEMENTS = [
+    """
+    CREATE INDEX IF NOT EXISTS ix_userdetail_search ON userdetail USING gin (
+        to_tsvector('simple'::regconfig, translate(
+            coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' ||
+            coalesce(email, '') || ' ' || coalesce(dni::text, ''),
+            'áàâäéèêëíìîïóòôöúùûüñçÁÀÂÄÉÈÊËÍÌÎÏÓÒÔÖÚÙÛÜÑÇ@.-',
+            'aaaaeeeeiiiioooouuuuncAAAAEEEEIIIIOOOOUUUUNC   '))
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_user_username_search ON "user" USING gin (
+        to_tsvector('simple'::regconfig, translate(coalesce(username, ''), '@.-', '   '))
+    )
+    """,
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
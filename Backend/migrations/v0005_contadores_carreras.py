@@ -0,0 +1,106 @@
+# Contador de alumnos por carrera (career.student_count), mantenido por la propia base de datos.
+# Lo actualizan triggers en la misma transacción que modifica las inscripciones o el rol de un usuario,
+# así ninguna ruta ni script (inscripción masiva, importación, populate_db, borrado de usuarios) puede
+# dejarlo desfasado. `python reconcile_counts.py` lo compara contra pivote_user_career.
+from sqlalchemy import text
+
+# Suma a cada carrera los alumnos de un conjunto de inscripciones (una tabla de transición del trigger).
+# Se agrupa por carrera para hacer un solo UPDATE por carrera afectada aunque la sentencia toque miles de filas.
+ADJUST_FROM_ROWS = """
+    UPDATE career SET student_count = career.student_count {sign} delta.total
+    FROM (
+        SELECT rows.id_career, count(*) AS total
+        FROM {rows} rows
+        JOIN "user" u ON u.id = rows.id_user
+        JOIN userdetail d ON d.id = u.id_userdetail
+        WHERE d.type = 'alumno'
+        GROUP BY rows.id_career
+    ) delta
+    WHERE career.id = delta.id_career;
+"""
+
+STATEMENTS = [
+    "ALTER TABLE career ADD COLUMN IF NOT EXISTS student_count integer NOT NULL DEFAULT 0",
+    # Inscripciones nuevas (INSERT, incluido INSERT ... SELECT ... ON CONFLICT): triggers por sentencia
+    # con tabla de transición, una sola actualización por carrera y sentencia.
+    f"""
+    CREATE OR REPLACE FUNCTION career_count_enrolled() RETURNS trigger AS $$
+    BEGIN
+        {ADJUST_FROM_ROWS.format(sign="+", rows="new_rows")}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION career_count_unenrolled() RETURNS trigger AS $$
+    BEGIN
+        {ADJUST_FROM_ROWS.format(sign="-", rows="old_rows")}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Si una inscripción cambia de carrera o de usuario, se descuenta la vieja y se suma la nueva.
+    f"""
+    CREATE OR REPLACE FUNCTION career_count_moved() RETURNS trigger AS $$
+    BEGIN
+        {ADJUST_FROM_ROWS.format(sign="-", rows="old_rows")}
+        {ADJUST_FROM_ROWS.format(sign="+", rows="new_rows")}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Cambio de rol: si el usuario pasa a ser alumno (o deja de serlo) cuenta (o deja de contar)
+    # en todas las carreras en las que está inscrito.
+    """
+    CREATE OR REPLACE FUNCTION career_count_role_changed() RETURNS trigger AS $$
+    BEGIN
+        IF (OLD.type = 'alumno') IS DISTINCT FROM (NEW.type = 'alumno') THEN
+            UPDATE career SET student_count = career.student_count
+                + CASE WHEN NEW.type = 'alumno' THEN 1 ELSE -1 END
+            FROM pivote_user_career p
+            JOIN "user" u ON u.id = p.id_user
+            WHERE u.id_userdetail = NEW.id AND career.id = p.id_career;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_career_count_insert ON pivote_user_career",
+    """
+    CREATE TRIGGER trg_career_count_insert AFTER INSERT ON pivote_user_career
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION career_count_enrolled()
+    """,
+    "DROP TRIGGER IF EXISTS trg_career_count_delete ON pivote_user_career",
+    """
+    CREATE TRIGGER trg_career_count_delete AFTER DELETE ON pivote_user_career
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION career_count_unenrolled()
+    """,
+    "DROP TRIGGER IF EXISTS trg_career_count_update ON pivote_user_career",
+    """
+    CREATE TRIGGER trg_career_count_update AFTER UPDATE ON pivote_user_career
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION career_count_moved()
+    """,
+    "DROP TRIGGER IF EXISTS trg_career_count_role ON userdetail",
+    """
+    CREATE TRIGGER trg_career_count_role AFTER UPDATE OF type ON userdetail
+    FOR EACH ROW EXECUTE FUNCTION career_count_role_changed()
+    """,
+    # Valores iniciales a partir de las inscripciones que ya existen.
+    """
+    UPDATE career SET student_count = (
+        SELECT count(*)
+        FROM pivote_user_career p
+        JOIN "user" u ON u.id = p.id_user
+        JOIN userdetail d ON d.id = u.id_userdetail
+        WHERE p.id_career = career.id AND d.type = 'alumno'
+    )
+    """,
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
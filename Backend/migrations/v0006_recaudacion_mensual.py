@@ -0,0 +1,102 @@
+# Resumen de recaudación por carrera y mes (revenue_monthly), mantenido por la propia base de datos.
+# Triggers por sentencia sobre payment suman o restan lo cobrado en la misma transacción que registra,
+# modifica o borra los pagos, sea desde las rutas, la carga masiva o un script. `python rebuild_revenue.py`
+# lo recalcula desde cero. Los pagos sin carrera o sin mes pagado no entran en el resumen.
+from sqlalchemy import text
+
+# Agrupa un conjunto de pagos (una tabla de transición del trigger) por carrera y mes.
+GROUPED_ROWS = """
+    SELECT id_career, date_trunc('month', affected_month)::date AS affected_month,
+           coalesce(sum(amount), 0) AS total_amount, count(*) AS payment_count
+    FROM {rows}
+    WHERE id_career IS NOT NULL AND affected_month IS NOT NULL
+    GROUP BY 1, 2
+"""
+
+# Suma los pagos nuevos: crea la fila del mes si no existe (INSERT ... ON CONFLICT DO UPDATE).
+ADD_ROWS = f"""
+    INSERT INTO revenue_monthly (id_career, affected_month, total_amount, payment_count)
+    {GROUPED_ROWS.format(rows="new_rows")}
+    ON CONFLICT (id_career, affected_month) DO UPDATE
+    SET total_amount = revenue_monthly.total_amount + EXCLUDED.total_amount,
+        payment_count = revenue_monthly.payment_count + EXCLUDED.payment_count;
+"""
+
+# Resta los pagos quitados y borra los meses que quedan sin pagos, así el resumen es igual al que
+# arma rebuild_revenue.py.
+SUBTRACT_ROWS = f"""
+    UPDATE revenue_monthly SET total_amount = revenue_monthly.total_amount - delta.total_amount,
+                               payment_count = revenue_monthly.payment_count - delta.payment_count
+    FROM ({GROUPED_ROWS.format(rows="old_rows")}) delta
+    WHERE revenue_monthly.id_career = delta.id_career AND revenue_monthly.affected_month = delta.affected_month;
+    DELETE FROM revenue_monthly USING ({GROUPED_ROWS.format(rows="old_rows")}) delta
+    WHERE revenue_monthly.id_career = delta.id_career AND revenue_monthly.affected_month = delta.affected_month
+      AND revenue_monthly.payment_count <= 0;
+"""
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS revenue_monthly (
+        id_career integer NOT NULL REFERENCES career (id),
+        affected_month date NOT NULL,
+        total_amount bigint NOT NULL DEFAULT 0,
+        payment_count integer NOT NULL DEFAULT 0,
+        PRIMARY KEY (id_career, affected_month)
+    )
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION revenue_payments_added() RETURNS trigger AS $$
+    BEGIN
+        {ADD_ROWS}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION revenue_payments_removed() RETURNS trigger AS $$
+    BEGIN
+        {SUBTRACT_ROWS}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Un pago modificado (monto, carrera o mes) se descuenta como estaba y se vuelve a sumar como quedó.
+    f"""
+    CREATE OR REPLACE FUNCTION revenue_payments_changed() RETURNS trigger AS $$
+    BEGIN
+        {SUBTRACT_ROWS}
+        {ADD_ROWS}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_revenue_insert ON payment",
+    """
+    CREATE TRIGGER trg_revenue_insert AFTER INSERT ON payment
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION revenue_payments_added()
+    """,
+    "DROP TRIGGER IF EXISTS trg_revenue_delete ON payment",
+    """
+    CREATE TRIGGER trg_revenue_delete AFTER DELETE ON payment
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION revenue_payments_removed()
+    """,
+    "DROP TRIGGER IF EXISTS trg_revenue_update ON payment",
+    """
+    CREATE TRIGGER trg_revenue_update AFTER UPDATE ON payment
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION revenue_payments_changed()
+    """,
+    # Valores iniciales a partir de los pagos que ya existen.
+    "DELETE FROM revenue_monthly",
+    f"""
+    INSERT INTO revenue_monthly (id_career, affected_month, total_amount, payment_count)
+    {GROUPED_ROWS.format(rows="payment")}
+    """,
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
@@ -0,0 +1,15 @@
+# Índice de pagos por (alumno, carrera, mes pagado). El reporte de meses impagos agrupa los pagos de cada
+# inscripción recorriendo este índice en orden, sin ordenar la tabla. Como empieza por id_user también
+# resuelve "los pagos de un alumno", así que reemplaza a ix_payment_id_user (un índice menos que mantener
+# en cada pago registrado).
+from sqlalchemy import text
+
+STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_payment_user_career_month ON payment (id_user, id_career, affected_month)",
+    "DROP INDEX IF EXISTS ix_payment_id_user",
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
@@ -0,0 +1,83 @@
+# Cantidad de mensajes no leídos de cada usuario ("user".unread_messages), mantenida por la propia base de datos.
+# Triggers por sentencia sobre message la actualizan en la misma transacción que crea, marca como leídos o
+# borra mensajes, sea desde las rutas (enviar mensaje, registrar un pago, marcar como leído), la carga masiva
+# de pagos o el borrado de un usuario. El índice parcial de mensajes no leídos es el respaldo:
+# `python reconcile_counts.py` (actual_unread_counts) cuenta con él, usuario por usuario y sin leer la
+# tabla, los no leídos reales y los compara con el contador. v0009 lo amplía a (recipient_id, timestamp, id)
+# para que también lo use la bandeja con unread_only. `python migrate.py planes` comprueba ambos usos.
+from sqlalchemy import text
+
+# Suma a cada destinatario los no leídos que aparecen en `new_rows` y le resta los que desaparecen de
+# `old_rows` (tablas de transición del trigger). Un solo UPDATE por destinatario aunque la sentencia
+# toque miles de mensajes; los que no cambian (p. ej. marcar como leído un mensaje ya leído) no se tocan.
+ADJUST_UNREAD = """
+    UPDATE "user" SET unread_messages = "user".unread_messages + delta.total
+    FROM (
+        SELECT recipient_id, sum(change) AS total
+        FROM ({rows}) changes
+        GROUP BY recipient_id
+        HAVING sum(change) <> 0
+    ) delta
+    WHERE "user".id = delta.recipient_id;
+"""
+NEW_UNREAD = "SELECT recipient_id, 1 AS change FROM new_rows WHERE NOT is_read"
+OLD_UNREAD = "SELECT recipient_id, -1 AS change FROM old_rows WHERE NOT is_read"
+
+STATEMENTS = [
+    'ALTER TABLE "user" ADD COLUMN IF NOT EXISTS unread_messages integer NOT NULL DEFAULT 0',
+    "CREATE INDEX IF NOT EXISTS ix_message_recipient_unread ON message (recipient_id) WHERE NOT is_read",
+    f"""
+    CREATE OR REPLACE FUNCTION unread_messages_added() RETURNS trigger AS $$
+    BEGIN
+        {ADJUST_UNREAD.format(rows=NEW_UNREAD)}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION unread_messages_removed() RETURNS trigger AS $$
+    BEGIN
+        {ADJUST_UNREAD.format(rows=OLD_UNREAD)}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Marcar como leído (o no leído) o cambiar de destinatario: se descuenta como estaba y se suma como quedó.
+    f"""
+    CREATE OR REPLACE FUNCTION unread_messages_changed() RETURNS trigger AS $$
+    BEGIN
+        {ADJUST_UNREAD.format(rows=OLD_UNREAD + " UNION ALL " + NEW_UNREAD)}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_unread_insert ON message",
+    """
+    CREATE TRIGGER trg_unread_insert AFTER INSERT ON message
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION unread_messages_added()
+    """,
+    "DROP TRIGGER IF EXISTS trg_unread_delete ON message",
+    """
+    CREATE TRIGGER trg_unread_delete AFTER DELETE ON message
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION unread_messages_removed()
+    """,
+    "DROP TRIGGER IF EXISTS trg_unread_update ON message",
+    """
+    CREATE TRIGGER trg_unread_update AFTER UPDATE ON message
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION unread_messages_changed()
+    """,
+    # Valores iniciales a partir de los mensajes que ya existen.
+    """
+    UPDATE "user" SET unread_messages = unread.total
+    FROM (SELECT recipient_id, count(*) AS total FROM message WHERE NOT is_read GROUP BY recipient_id) unread
+    WHERE "user".id = unread.recipient_id
+    """,
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
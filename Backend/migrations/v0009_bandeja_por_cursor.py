@@ -0,0 +1,22 @@
+# Índices para paginar la bandeja de entrada por cursor sobre (timestamp, id).
+# - ix_message_recipient_timestamp_id reemplaza a ix_message_recipient_timestamp: con el id al final,
+#   "los N mensajes anteriores a (timestamp, id)" de un destinatario es un recorrido del índice que
+#   arranca en el cursor, sin importar cuántos mensajes tenga el usuario.
+# - ix_message_recipient_unread (parcial, solo no leídos) pasa a incluir (timestamp, id): sigue sirviendo
+#   para contar los no leídos y además resuelve la bandeja filtrada con unread_only.
+# Un mensaje sin fecha quedaría fuera de la paginación, así que timestamp pasa a ser obligatorio.
+from sqlalchemy import text
+
+STATEMENTS = [
+    "UPDATE message SET timestamp = now() WHERE timestamp IS NULL",
+    "ALTER TABLE message ALTER COLUMN timestamp SET NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_message_recipient_timestamp_id ON message (recipient_id, timestamp, id)",
+    "DROP INDEX IF EXISTS ix_message_recipient_timestamp",
+    "DROP INDEX IF EXISTS ix_message_recipient_unread",
+    "CREATE INDEX ix_message_recipient_unread ON message (recipient_id, timestamp, id) WHERE NOT is_read",
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
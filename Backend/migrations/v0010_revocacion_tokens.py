@@ -0,0 +1,20 @@
+# Lista de revocaciones de tokens compartida por todos los workers.
+# Hasta ahora cada proceso guardaba en memoria a quién le había revocado los tokens, así que con varios
+# workers (y sobre todo con AUTH_STATELESS, donde no se consulta al usuario) un token revocado seguía
+# valiendo en los demás procesos. La revocación se escribe en esta tabla en la misma transacción que el
+# cambio de rol o el borrado, y cada worker la relee cada REVOCATION_SYNC_SECONDS.
+from sqlalchemy import text
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS token_revocation (
+        user_id integer PRIMARY KEY,
+        revoked_at bigint NOT NULL
+    )
+    """,
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
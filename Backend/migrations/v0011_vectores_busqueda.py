@@ -0,0 +1,32 @@
+# Vectores de búsqueda guardados (columnas generadas) para /users/search.
+# Los índices de v0004 eran sobre expresiones: encontrar las coincidencias era barato, pero ordenarlas
+# por relevancia obligaba a recalcular to_tsvector en cada una, así que la ruta tomaba los primeros
+# candidatos que daba el índice, sin ordenar, y solo a esos los ordenaba (una coincidencia exacta podía
+# quedar afuera). Con el vector guardado en la fila, ts_rank se calcula sobre todas las coincidencias y
+# los candidatos son los más relevantes.
+# Las expresiones son las mismas de v0004 (y de search_vector en models/modelo.py). Los índices GIN
+# conservan el nombre, ahora sobre las columnas. Agregar las columnas reescribe las dos tablas.
+from sqlalchemy import text
+
+USER_DETAIL_VECTOR = """
+    to_tsvector('simple'::regconfig, translate(
+        coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' ||
+        coalesce(email, '') || ' ' || coalesce(dni::text, ''),
+        'áàâäéèêëíìîïóòôöúùûüñçÁÀÂÄÉÈÊËÍÌÎÏÓÒÔÖÚÙÛÜÑÇ@.-',
+        'aaaaeeeeiiiioooouuuuncAAAAEEEEIIIIOOOOUUUUNC   '))
+"""
+USERNAME_VECTOR = "to_tsvector('simple'::regconfig, translate(coalesce(username, ''), '@.-', '   '))"
+
+STATEMENTS = [
+    f"ALTER TABLE userdetail ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({USER_DETAIL_VECTOR}) STORED",
+    f'ALTER TABLE "user" ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({USERNAME_VECTOR}) STORED',
+    "DROP INDEX IF EXISTS ix_userdetail_search",
+    "CREATE INDEX ix_userdetail_search ON userdetail USING gin (search_vector)",
+    "DROP INDEX IF EXISTS ix_user_username_search",
+    'CREATE INDEX ix_user_username_search ON "user" USING gin (search_vector)',
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
@@ -3,19 +3,23 @@
 # Aquí se importan todas las herramientas necesarias de las librerías.
 # =================================================================================
 
-# De tu archivo de configuración, traes el 'engine' (la conexión a la BD)
-# y 'Base' (el molde para crear las tablas).
-from configs.db import engine, Base
+# De tu archivo de configuración, traes 'Base' (el molde para crear las tablas).
+# El 'engine' no hace falta aquí: importar los modelos no se conecta a la base de datos.
+from configs.db import Base
 
 # De SQLAlchemy, importas todo lo necesario para definir la estructura de las tablas.
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Date
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Boolean, Date, Index, Computed, func, text
+# Tipo tsvector de PostgreSQL (vectores de la búsqueda de texto completo).
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 # De SQLAlchemy.orm, traes las herramientas para interactuar con la BD a través de objetos.
-# 'sessionmaker' crea la fábrica de sesiones y 'relationship' define cómo se conectan las tablas.
-from sqlalchemy.orm import sessionmaker, relationship
+# 'relationship' define cómo se conectan las tablas; 'deferred' hace que una columna no se lea salvo que se pida.
+from sqlalchemy.orm import relationship, deferred
 
-# De Pydantic, importas 'BaseModel', que es el molde para crear validadores de datos.
-from pydantic import BaseModel
+# De Pydantic, importas 'BaseModel', que es el molde para crear validadores de datos,
+# 'Field', que agrega restricciones a un campo (p. ej. cantidad mínima y máxima de elementos),
+# y 'field_validator', que transforma o valida un campo después de convertirlo a su tipo.
+from pydantic import BaseModel, Field, field_validator
 
 # Importas la librería estándar de Python para manejar fechas y horas.
 import datetime
@@ -42,7 +46,14 @@ class User(Base):
     id = Column(Integer, primary_key =True)  # Clave primaria, autoincremental.
     username = Column( String(50), nullable=False, unique=True)  # No puede ser nulo y debe ser único.
     password = Column(String(40))   # Contraseña del usuario.
-    id_userdetail = Column(Integer, ForeignKey("userdetail.id"))    # Clave foránea que la conecta con UserDetail.
+    id_userdetail = Column(Integer, ForeignKey("userdetail.id"), index=True)    # Clave foránea que la conecta con UserDetail.
+    # Cantidad de mensajes recibidos sin leer. No se escribe desde la aplicación: lo mantienen los triggers
+    # de la migración v0008 (mensajes nuevos, marcados como leídos o borrados).
+    unread_messages = Column(Integer, nullable=False, server_default="0")
+    # Vector de búsqueda del nombre de usuario, calculado por la base de datos (migración v0011).
+    # Diferido: solo lo lee la búsqueda.
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "to_tsvector('simple'::regconfig, translate(coalesce(username, ''), '@.-', '   '))", persisted=True)))
 
     # --- Relaciones con otras tablas ---
     # Estas no son columnas, son "atajos" que SQLAlchemy crea para navegar entre tablas.
@@ -80,9 +91,17 @@ class UserDetail(Base):
     first_name = Column(String(50))
     last_name = Column(String(50))
     dni = Column(Integer)
-    type = Column(String(50))   # Rol del usuario: "alumno", "profesor", "administrador".
+    type = Column(String(50), index=True)   # Rol del usuario: "alumno", "profesor", "administrador". Indexado para filtrar por rol.
     email = Column(String(50), nullable=False, unique=True)
     profile_image_url = Column(String(255), nullable=True)   # El 'nullable=True' permite que este campo esté vacío.
+    # Vector de búsqueda de nombre, apellido, email (separado en partes) y DNI, sin acentos, calculado por
+    # la base de datos (migración v0011). Diferido: solo lo lee la búsqueda.
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "to_tsvector('simple'::regconfig, translate("
+        "coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || "
+        "coalesce(email, '') || ' ' || coalesce(dni::text, ''), "
+        "'áàâäéèêëíìîïóòôöúùûüñçÁÀÂÄÉÈÊËÍÌÎÏÓÒÔÖÚÙÛÜÑÇ@.-', "
+        "'aaaaeeeeiiiioooouuuuncAAAAEEEEIIIIOOOOUUUUNC   '))", persisted=True)))
 
     def __init__(self, first_name, last_name, dni, type, email):
         self.first_name = first_name
@@ -91,12 +110,22 @@ class UserDetail(Base):
         self.type = type
         self.email = email
 
+# Filtro por prefijo de nombre o apellido sin distinguir mayúsculas (ver migrations/v0003_prefijo_nombres.py).
+# Se declaran fuera de la clase porque son índices sobre una expresión (lower(columna)).
+Index("ix_userdetail_lower_first_name", func.lower(UserDetail.first_name).label("lower_first_name"),
+      postgresql_ops={"lower_first_name": "varchar_pattern_ops"})
+Index("ix_userdetail_lower_last_name", func.lower(UserDetail.last_name).label("lower_last_name"),
+      postgresql_ops={"lower_last_name": "varchar_pattern_ops"})
+
 class Career(Base):
     """Modelo para la tabla 'career'. Almacena las carreras disponibles."""
 
     __tablename__="career"
     id = Column(Integer, primary_key=True)
     name = Column(String(50))
+    # Cantidad de alumnos inscritos. No se escribe desde la aplicación: lo mantienen los triggers de la
+    # migración v0005 (inscripciones, desinscripciones, borrado de usuarios y cambios de rol).
+    student_count = Column(Integer, nullable=False, server_default="0")
 
     def __init__(self, name):
         self.name= name
@@ -105,11 +134,15 @@ class Payment(Base):
     """Modelo para la tabla 'payment'. Registra los pagos de los usuarios."""
 
     __tablename__="payment"
+    # Pagos de un alumno por carrera y mes: lo usan la lista de pagos de un alumno y el reporte de meses impagos.
+    __table_args__ = (
+        Index("ix_payment_user_career_month", "id_user", "id_career", "affected_month"),
+    )
     id = Column(Integer, primary_key=True)
-    id_career=Column(Integer, ForeignKey("career.id"))   # FK para saber a qué carrera corresponde el pago.
+    id_career=Column(Integer, ForeignKey("career.id"), index=True)   # FK para saber a qué carrera corresponde el pago.
     id_user=Column(Integer, ForeignKey("user.id"))   # FK para saber qué usuario realizó el pago.
     amount = Column(Integer)
-    affected_month = Column(Date)   # El mes y año de la cuota pagada.
+    affected_month = Column(Date, index=True)   # El mes y año de la cuota pagada.
     created_at = Column(DateTime, default=datetime.datetime.now)    # La fecha y hora exactas del registro.
 
     # Relaciones inversas para navegar "hacia atrás".
@@ -130,6 +163,12 @@ class PivoteUserCareer(Base):
     """
 
     __tablename__="pivote_user_career"
+    # Un alumno solo puede estar inscrito una vez en cada carrera. El índice único también resuelve
+    # la búsqueda "¿ya está inscrito?"; el de id_career sirve para listar los alumnos de una carrera.
+    __table_args__ = (
+        Index("uq_pivote_user_career", "id_user", "id_career", unique=True),
+        Index("ix_pivote_user_career_id_career", "id_career"),
+    )
     id = Column(Integer, primary_key=True)
     id_career = Column(ForeignKey("career.id"))
     id_user = Column(ForeignKey("user.id"))
@@ -146,11 +185,17 @@ class Message(Base):
     """Modelo para la tabla 'message', para la funcionalidad extra de mensajería."""
 
     __tablename__ = "message"
+    # La bandeja de entrada filtra por destinatario y pagina por (fecha, id): un índice compuesto resuelve ambas cosas.
+    __table_args__ = (
+        Index("ix_message_recipient_timestamp_id", "recipient_id", "timestamp", "id"),
+        # Índice parcial: solo los mensajes sin leer, para contarlos y paginarlos sin recorrer todo el historial.
+        Index("ix_message_recipient_unread", "recipient_id", "timestamp", "id", postgresql_where=text("NOT is_read")),
+    )
     id = Column(Integer, primary_key=True)
     sender_id = Column(Integer, ForeignKey("user.id"), nullable=False)   # ID de quien envía.
     recipient_id = Column(Integer, ForeignKey("user.id"), nullable=False)   # ID de quien recibe.
     content = Column(String(500), nullable=False)
-    timestamp = Column(DateTime, default=datetime.datetime.now)
+    timestamp = Column(DateTime, default=datetime.datetime.now, nullable=False)
     is_read = Column(Boolean, default=False, nullable=False)   # Para marcar si el mensaje fue leído.
 
     # Relaciones para poder acceder a los objetos User completos del emisor y receptor.
@@ -161,6 +206,33 @@ class Message(Base):
         self.sender_id = sender_id
         self.recipient_id = recipient_id
         self.content = content
+
+class RevenueMonthly(Base):
+    """
+    Resumen de recaudación: total cobrado y cantidad de pagos por carrera y mes pagado.
+    No se escribe desde la aplicación: lo mantienen los triggers de la migración v0006 sobre 'payment'
+    y `python rebuild_revenue.py` lo recalcula desde cero. Los reportes leen esta tabla en lugar de
+    recorrer todos los pagos.
+    """
+
+    __tablename__ = "revenue_monthly"
+    id_career = Column(Integer, ForeignKey("career.id"), primary_key=True)
+    affected_month = Column(Date, primary_key=True)   # Primer día del mes pagado, como en 'payment'.
+    total_amount = Column(BigInteger, nullable=False, default=0)
+    payment_count = Column(Integer, nullable=False, default=0)
+
+
+class TokenRevocation(Base):
+    """
+    Usuarios cuyos tokens emitidos antes de `revoked_at` ya no son válidos (se les cambió el rol o se los borró).
+    Es la lista de revocaciones compartida por todos los workers: cada proceso la copia en memoria y la
+    vuelve a leer cada pocos segundos (ver auth/principal.py). No tiene clave foránea a 'user' porque
+    tiene que sobrevivir al borrado del usuario.
+    """
+
+    __tablename__ = "token_revocation"
+    user_id = Column(Integer, primary_key=True)
+    revoked_at = Column(BigInteger, nullable=False)   # Segundos desde epoch, la misma resolución que el 'iat' del JWT.
 # endregion
 
 # =================================================================================
@@ -179,6 +251,10 @@ class InputUser(BaseModel):
     type:str
     email:str
 
+class InputUserImport(InputUser):
+    """Un usuario de una importación masiva: los campos de InputUser y las carreras (IDs) en las que se lo inscribe."""
+    careers: list[int] = []
+
 class InputLogin(BaseModel):
     """Define los campos necesarios para el login."""
     username:str
@@ -195,6 +271,10 @@ class InputCareer(BaseModel):
     """Define el campo necesario para crear una carrera."""
     name: str
 
+class InputCareerEnrollment(BaseModel):
+    """Define la lista de usuarios (IDs) a inscribir o desinscribir de una carrera de una sola vez."""
+    user_ids: list[int] = Field(min_length=1, max_length=5000)
+
 class InputPayment(BaseModel):
     """Define los campos necesarios para registrar un pago."""
     id_career: int
@@ -229,6 +309,33 @@ class InputMessage(BaseModel):
     recipient_id: int
     content: str
 
+class InputBroadcast(BaseModel):
+    """
+    Define un mensaje para muchos destinatarios. Se indica uno solo de los destinos:
+    todos los usuarios de un tipo (role), todos los alumnos de una carrera (career) o una lista de IDs.
+    """
+    content: str = Field(min_length=1, max_length=500)
+    role: str | None = None
+    career: int | None = None
+    recipient_ids: list[int] | None = Field(default=None, min_length=1, max_length=5000)
+
+class InputMarkRead(BaseModel):
+    """Define qué mensajes marcar como leídos: una lista de IDs o todos los recibidos hasta una fecha."""
+    ids: list[int] | None = Field(default=None, min_length=1, max_length=5000)
+    before: datetime.datetime | None = None
+
+    @field_validator("before")
+    @classmethod
+    def before_local_time(cls, value):
+        """
+        Las fechas de los mensajes se guardan sin zona horaria, en la hora local del servidor.
+        Si "before" trae zona (p. ej. "Z" o "+00:00") se pasa a la hora local y se le quita la zona,
+        para poder compararla con la columna.
+        """
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone().replace(tzinfo=None)
+        return value
+
 class MessageResponse(BaseModel):
     """Define la forma de la respuesta al pedir los mensajes."""
     id: int
@@ -240,21 +347,22 @@ class MessageResponse(BaseModel):
     class Config:
         # Permite que Pydantic cree este modelo a partir de un objeto SQLAlchemy.
         from_attributes = True
+
+
+class MessagesPage(BaseModel):
+    """Una página de la bandeja de entrada y el cursor de la siguiente (null si no hay más)."""
+    messages: list[MessageResponse]
+    next_cursor: str | None
 # endregion
 
 # =================================================================================
-# region 4. CONFIGURACIÓN Y CREACIÓN DE LA SESIÓN
-# Código que se ejecuta una sola vez para preparar la base de datos.
+# region 4. CREACIÓN DEL ESQUEMA
+# Importar este módulo no tiene efectos secundarios: no se conecta a la base de datos
+# ni crea tablas, así que arrancar un worker de uvicorn o importar los modelos es inmediato.
 # =================================================================================
 
-# Esta línea revisa todos los modelos definidos arriba y crea las tablas en la
-# base de datos si es que no existen. Si ya existen, no hace nada. 
-Base.metadata.create_all(bind=engine)
-
-# Crea una "fábrica" de sesiones, que sabe cómo conectarse a la base de datos.
-Session = sessionmaker(bind=engine)
-
-# Crea una instancia de sesión. Este es el objeto que usarás en tus rutas
-# para hacer consultas, añadir datos, etc. (`session.query(...)`, `session.add(...)`).
-session = Session()
+# Las tablas, índices y restricciones se crean con las migraciones versionadas de la carpeta
+# migrations/, ejecutando `python migrate.py` antes de levantar la API.
+# Las sesiones tampoco se crean aquí: cada petición obtiene la suya mediante la
+# dependencia `get_async_db` de configs/async_db.py, y los scripts usan `SessionLocal()` de configs/db.py.
 # endregion
\ No newline at end of file
@@ -1,16 +1,20 @@
 import datetime
-from models.modelo import User, UserDetail, Career, Payment, PivoteUserCareer, session, Base, engine
+from models.modelo import User, UserDetail, Career, Payment, PivoteUserCareer
+from configs.db import SessionLocal, engine
+import migrations
 
 def populate_db():
     """
     Script para poblar la base de datos con datos de ejemplo.
     """
-    # Crea las tablas si no existen
-    print("Verificando y creando tablas si es necesario...")
-    Base.metadata.create_all(bind=engine)
+    # Aplica las migraciones pendientes (en una base nueva crea todas las tablas), igual que `python migrate.py`.
+    print("Aplicando migraciones pendientes...")
+    for migration in migrations.upgrade(engine):
+        print(f"  v{migration.version:04d} {migration.name}")
     print("¡Tablas listas!")
 
     print("\n--- Creación de Datos de Ejemplo ---")
+    session = SessionLocal()
 
     try:
         # --- 1. CREAR CARRERAS ---
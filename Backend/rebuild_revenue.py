@@ -0,0 +1,85 @@
+"""
+Recalcula el resumen de recaudación mensual (revenue_monthly) a partir de los pagos.
+El resumen lo mantienen los triggers de la migración v0006; este comando sirve para reconstruirlo
+(después de cargar datos con los triggers desactivados, por ejemplo) o para verificar que coincide.
+
+Uso:
+    python rebuild_revenue.py              (reconstruye el resumen completo)
+    python rebuild_revenue.py --verificar  (solo compara; sale con código 1 si hay diferencias)
+"""
+import argparse
+import sys
+import time
+from sqlalchemy import select, insert, delete, func, text, Date
+from configs.db import engine
+from models.modelo import Payment, RevenueMonthly
+
+
+def grouped_payments():
+    """Total y cantidad de pagos por carrera y mes pagado, con el mismo criterio que los triggers."""
+    month = func.date_trunc("month", Payment.affected_month).cast(Date)
+    return (
+        select(Payment.id_career, month.label("affected_month"),
+               func.coalesce(func.sum(Payment.amount), 0).label("total_amount"),
+               func.count().label("payment_count"))
+        .where(Payment.id_career.is_not(None), Payment.affected_month.is_not(None))
+        .group_by(Payment.id_career, month)
+    )
+
+
+def rebuild():
+    """
+    Reemplaza el resumen por el calculado desde payment, en una sola transacción.
+    Antes se bloquea revenue_monthly: un pago registrado mientras tanto espera en su trigger a que
+    termine la reconstrucción y después suma sobre el resumen nuevo, así que no se pierde ni se cuenta dos veces.
+    Devuelve la cantidad de filas (carrera, mes) del resumen.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE revenue_monthly IN EXCLUSIVE MODE"))
+        conn.execute(delete(RevenueMonthly))
+        conn.execute(insert(RevenueMonthly).from_select(
+            ["id_career", "affected_month", "total_amount", "payment_count"], grouped_payments()))
+        return conn.execute(select(func.count()).select_from(RevenueMonthly)).scalar()
+
+
+def differences():
+    """
+    Compara el resumen con el calculado desde payment en la misma transacción (la misma foto de los datos).
+    Devuelve [(carrera, mes, (total, cantidad) guardado, (total, cantidad) real)] de las filas que difieren.
+    """
+    with engine.connect() as conn:
+        with conn.begin():
+            conn.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"))
+            stored = {(r.id_career, r.affected_month): (r.total_amount, r.payment_count)
+                      for r in conn.execute(select(RevenueMonthly))}
+            actual = {(r.id_career, r.affected_month): (r.total_amount, r.payment_count)
+                      for r in conn.execute(grouped_payments())}
+    return [(career, month, stored.get((career, month)), actual.get((career, month)))
+            for career, month in sorted(stored.keys() | actual.keys())
+            if stored.get((career, month)) != actual.get((career, month))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye o verifica el resumen de recaudación mensual.")
+    parser.add_argument("--verificar", action="store_true", help="Solo compara el resumen con los pagos.")
+    args = parser.parse_args()
+
+    if args.verificar:
+        diffs = differences()
+        if not diffs:
+            print("El resumen de recaudación coincide con los pagos.")
+            return
+        for career, month, stored, actual in diffs:
+            print(f"Carrera {career}, {month:%Y-%m}: resumen {stored or '-'}, pagos {actual or '-'}")
+        print(f"{len(diffs)} fila(s) con diferencias. Ejecute sin --verificar para reconstruir el resumen.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    rows = rebuild()
+    print(f"Resumen reconstruido: {rows} filas (carrera, mes) en {time.perf_counter() - start:.1f} s.")
+
+
+if __name__ == "__main__":
+    main()
+
+# python rebuild_revenue.py
@@ -0,0 +1,117 @@
+"""
+Reconciliación de los contadores que mantiene la base de datos con triggers:
+- `career.student_count` (migración v0005) contra la cuenta real sobre pivote_user_career
+  (inscripciones de usuarios de tipo "alumno").
+- `"user".unread_messages` (migración v0008) contra los mensajes sin leer de cada usuario
+  (contados con el índice parcial ix_message_recipient_unread).
+Muestra los contadores que no coinciden. Pensado para correr periódicamente (p. ej. desde cron).
+
+Uso:
+    python reconcile_counts.py              (solo informa; sale con código 1 si hay diferencias)
+    python reconcile_counts.py --corregir   (además reemplaza los contadores desfasados por la cuenta real)
+"""
+import argparse
+import sys
+from sqlalchemy import select, update, func
+from configs.db import engine
+from models.modelo import Career, PivoteUserCareer, User, UserDetail, Message
+
+
+def actual_counts():
+    """Consulta con la cuenta real de alumnos de cada carrera junto al contador guardado."""
+    actual = (
+        select(func.count())
+        .select_from(PivoteUserCareer)
+        .join(User, User.id == PivoteUserCareer.id_user)
+        .join(UserDetail, UserDetail.id == User.id_userdetail)
+        .where(PivoteUserCareer.id_career == Career.id, UserDetail.type == "alumno")
+        .scalar_subquery()
+    )
+    return select(Career.id, Career.name, Career.student_count, actual.label("actual")).order_by(Career.id)
+
+
+def reconcile(fix=False):
+    """
+    Devuelve las filas (id, name, student_count, actual) de las carreras cuyo contador no coincide.
+    Contador y cuenta real salen de la misma consulta, es decir, de la misma foto de la base de datos:
+    una inscripción concurrente no produce falsas diferencias.
+    Para corregir se bloquean antes las filas de career. Una inscripción que esté en curso espera a que
+    termine la corrección y después suma sobre el valor corregido, así que no se pierde.
+    """
+    with engine.begin() as conn:
+        if fix:
+            conn.execute(select(Career.id).with_for_update())
+        mismatches = [row for row in conn.execute(actual_counts()) if row.student_count != row.actual]
+        if fix:
+            for row in mismatches:
+                conn.execute(update(Career).where(Career.id == row.id).values(student_count=row.actual))
+    return mismatches
+
+
+def actual_unread_counts():
+    """
+    Usuarios cuyo contador de no leídos no coincide con sus mensajes sin leer: (id, username, unread_messages, actual).
+    La cuenta real es una subconsulta por usuario que recorre solo sus entradas del índice parcial
+    ix_message_recipient_unread (sin leer la tabla): cuesta según los mensajes sin leer, no según todo el
+    historial, y al volver a comparar unos pocos usuarios solo se cuentan los de ellos.
+    """
+    actual = (
+        select(func.count())
+        .select_from(Message)
+        .where(Message.recipient_id == User.id, ~Message.is_read)
+        .scalar_subquery()
+    )
+    return (
+        select(User.id, User.username, User.unread_messages, actual.label("actual"))
+        .where(User.unread_messages != actual)
+        .order_by(User.id)
+    )
+
+
+def reconcile_unread(fix=False):
+    """
+    Igual que `reconcile` para los contadores de mensajes sin leer. La diferencia se filtra en la propia
+    consulta (hay un contador por usuario, no por carrera). Para corregir se bloquean solo las filas de
+    los usuarios desfasados y se vuelven a comparar bajo el bloqueo.
+    """
+    with engine.begin() as conn:
+        mismatches = conn.execute(actual_unread_counts()).all()
+        if fix and mismatches:
+            ids = [row.id for row in mismatches]
+            conn.execute(select(User.id).where(User.id.in_(ids)).with_for_update())
+            mismatches = conn.execute(actual_unread_counts().where(User.id.in_(ids))).all()
+            for row in mismatches:
+                conn.execute(update(User).where(User.id == row.id).values(unread_messages=row.actual))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los contadores de alumnos por carrera y de mensajes sin leer con los datos reales.")
+    parser.add_argument("--corregir", action="store_true", help="Reemplaza los contadores desfasados por la cuenta real.")
+    args = parser.parse_args()
+
+    mismatches = reconcile(fix=args.corregir)
+    for row in mismatches:
+        print(f"Carrera {row.id} ({row.name}): contador {row.student_count}, alumnos inscritos {row.actual}")
+    if not mismatches:
+        print("Los contadores coinciden con las inscripciones.")
+
+    unread_mismatches = reconcile_unread(fix=args.corregir)
+    for row in unread_mismatches:
+        print(f"Usuario {row.id} ({row.username}): contador {row.unread_messages}, mensajes sin leer {row.actual}")
+    if not unread_mismatches:
+        print("Los contadores coinciden con los mensajes sin leer.")
+
+    total = len(mismatches) + len(unread_mismatches)
+    if not total:
+        return
+    if args.corregir:
+        print(f"{total} contador(es) corregido(s).")
+    else:
+        print(f"{total} contador(es) desfasado(s). Ejecute con --corregir para actualizarlos.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
+
+# python reconcile_counts.py
@@ -1,223 +1,332 @@
-from fastapi import APIRouter, Header
-from fastapi.responses import JSONResponse
-from models.modelo import Career, InputCareer, session, User, PivoteUserCareer, UserDetail
-from sqlalchemy import func
-from auth.security import Security
-from sqlalchemy.orm import joinedload
+import base64
+import hashlib
+import json
+import os
+from fastapi import APIRouter, Header, Depends, Query
+from fastapi.responses import JSONResponse, Response
+from models.modelo import Career, InputCareer, InputCareerEnrollment, User, PivoteUserCareer, UserDetail
+from configs.async_db import get_async_db
+from sqlalchemy import func, select, delete, literal, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert   # INSERT con ON CONFLICT (propio de PostgreSQL)
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth.principal import Principal, get_principal, require_admin, require_professor
+from auth.cache import TTLCache
+from sqlalchemy.orm import contains_eager
 
 career = APIRouter()
 
+# Caché del catálogo de carreras (/career/all), que piden casi todas las vistas y cambia muy pocas veces.
+# Se guarda ya serializado, bajo la versión vigente del catálogo: add/update/delete de carreras llaman a
+# `invalidate_career_catalog`, que incrementa la versión y vacía el caché. Una consulta que empezó antes de
+# la invalidación guarda su resultado bajo la versión vieja, que ya nadie pide, así que nunca se sirve.
+# Es por proceso: el TTL acota cuánto puede tardar otro worker (o un cambio hecho por fuera de la API,
+# como populate_db) en verse.
+career_catalog_cache = TTLCache(maxsize=1, ttl=int(os.getenv("CAREER_CATALOG_TTL", "300")))
+career_catalog_version = 0
+
+# Cache-Control del catálogo: el navegador o un proxy pueden guardarlo, pero lo revalidan con el ETag
+# pasados CAREER_CATALOG_MAX_AGE segundos (por defecto en cada uso); si no cambió la respuesta es un 304 sin cuerpo.
+CAREER_CATALOG_CACHE_CONTROL = f"public, max-age={int(os.getenv('CAREER_CATALOG_MAX_AGE', '0'))}, must-revalidate"
+
+
+def invalidate_career_catalog():
+    """Se llama después de confirmar un cambio en las carreras."""
+    global career_catalog_version
+    career_catalog_version += 1
+    career_catalog_cache.clear()
+
+
+async def load_career_catalog(db_session):
+    """Devuelve (cuerpo JSON, ETag) del catálogo, desde el caché o, si no está, desde la base de datos."""
+    version = career_catalog_version
+    cached = career_catalog_cache.get(version)
+    if cached is None:
+        rows = (await db_session.execute(select(Career.id, Career.name).order_by(Career.id))).all()
+        body = json.dumps([{"id": row.id, "name": row.name} for row in rows], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        # El ETag sale del contenido (no de la versión), así todos los workers dan el mismo para el mismo catálogo.
+        cached = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+        career_catalog_cache.set(version, cached)
+    return cached
+
+
 @career.get("/career/all")
-def get_careers():
-    return session.query(Career).all()
+async def get_careers(if_none_match: str | None = Header(default=None), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Devuelve el catálogo de carreras (id y nombre).
+    Responde con ETag y Cache-Control: si el cliente envía If-None-Match con el ETag vigente se devuelve
+    304 sin cuerpo. El catálogo sale del caché en memoria; la base de datos solo se consulta cuando
+    cambió alguna carrera o venció el TTL.
+    """
+    body, etag = await load_career_catalog(db_session)
+    headers = {"ETag": etag, "Cache-Control": CAREER_CATALOG_CACHE_CONTROL}
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @career.post("/career/add")
-def add_career(ca: InputCareer, authorization: str | None = Header(default=None)):
+async def add_career(ca: InputCareer, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     """
     Añade una nueva carrera.
     Solo accesible por administradores.
     """
-    # 1. Capa de Seguridad
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data:
-        return JSONResponse(status_code=401, content={"message": "Token inválido o no proporcionado."})
-
-    db_session = session
     try:
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
-
-        # 2. Tu lógica original para añadir la carrera
+        # La capa de seguridad la resuelve la dependencia `require_admin`.
         newCareer = Career(ca.name)
         db_session.add(newCareer)
-        db_session.commit()
+        await db_session.commit()
+        invalidate_career_catalog()
         res = f"Carrera '{ca.name}' guardada correctamente!"
         print(res)
         return JSONResponse(status_code=201, content={"message": res})
         
     except Exception as ex:
-        db_session.rollback()
+        await db_session.rollback()
         print("Error al agregar career --> ", ex)
         return JSONResponse(status_code=500, content={"message": "Error interno al añadir la carrera."})
-    finally:
-        db_session.close()
 @career.get("/career/{career_id}")
-def get_career_by_id(career_id: int, authorization: str | None = Header(default=None)):
+async def get_career_by_id(career_id: int, principal: Principal = Depends(get_principal), db_session: AsyncSession = Depends(get_async_db)):
     """
     Obtiene los datos de una carrera específica por su ID.
+    Requiere un token válido y no revocado (lo verifica la dependencia `get_principal`).
     """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data:
-        return JSONResponse(status_code=401, content={"message": "Token inválido."})
-
-    db_session = session
-    try:
-        career_data = db_session.query(Career).filter(Career.id == career_id).first()
-        if not career_data:
-            return JSONResponse(status_code=404, content={"message": "Carrera no encontrada."})
-        return {"id": career_data.id, "name": career_data.name}
-    finally:
-        db_session.close()
+    career_data = await db_session.scalar(select(Career).where(Career.id == career_id))
+    if not career_data:
+        return JSONResponse(status_code=404, content={"message": "Carrera no encontrada."})
+    return {"id": career_data.id, "name": career_data.name}
 
 
 @career.put("/career/update/{career_id}")
-def update_career(career_id: int, career_update: InputCareer, authorization: str | None = Header(default=None)):
+async def update_career(career_id: int, career_update: InputCareer, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     """
     Actualiza el nombre de una carrera.
     Solo para administradores.
     """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data:
-        return JSONResponse(status_code=401, content={"message": "Token inválido."})
-        
-    db_session = session
     try:
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
-
-        career_to_update = db_session.query(Career).filter(Career.id == career_id).first()
+        career_to_update = await db_session.scalar(select(Career).where(Career.id == career_id))
         if not career_to_update:
             return JSONResponse(status_code=404, content={"message": "Carrera no encontrada."})
 
         career_to_update.name = career_update.name
-        db_session.commit()
+        await db_session.commit()
+        invalidate_career_catalog()
         return JSONResponse(status_code=200, content={"message": "Carrera actualizada con éxito."})
     except Exception as e:
-        db_session.rollback()
+        await db_session.rollback()
         return JSONResponse(status_code=500, content={"message": f"Error interno: {e}"})
-    finally:
-        db_session.close()
 
 
 @career.delete("/career/delete/{career_id}")
-def delete_career(career_id: int, authorization: str | None = Header(default=None)):
+async def delete_career(career_id: int, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     """
     Elimina una carrera.
     Solo para administradores.
     """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data:
-        return JSONResponse(status_code=401, content={"message": "Token inválido."})
-
-    db_session = session
     try:
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
-
-        career_to_delete = db_session.query(Career).filter(Career.id == career_id).first()
+        career_to_delete = await db_session.scalar(select(Career).where(Career.id == career_id))
         if not career_to_delete:
             return JSONResponse(status_code=404, content={"message": "Carrera no encontrada."})
 
-        db_session.delete(career_to_delete)
-        db_session.commit()
+        await db_session.delete(career_to_delete)
+        await db_session.commit()
+        invalidate_career_catalog()
         return JSONResponse(status_code=200, content={"message": "Carrera eliminada con éxito."})
     except Exception as e:
-        db_session.rollback()
+        await db_session.rollback()
         # Este error puede ocurrir si un alumno está inscrito en la carrera que intentas borrar.
         print("Error al eliminar carrera:", e)
         return JSONResponse(status_code=409, content={"message": f"Error: No se puede eliminar la carrera, es posible que esté en uso. Para esto, necesita eliminar usuarios inscriptos a esta carrera"})
-    finally:
-        db_session.close()
+
+# Tamaño de página del listado de alumnos de una carrera: el predeterminado y el máximo que puede pedir el cliente.
+CAREER_STUDENTS_PAGE_SIZE = int(os.getenv("CAREER_STUDENTS_PAGE_SIZE", "50"))
+CAREER_STUDENTS_MAX_PAGE_SIZE = int(os.getenv("CAREER_STUDENTS_MAX_PAGE_SIZE", "500"))
+
+# Columnas por las que se puede ordenar el listado. Las de texto pueden ser NULL: se ordena por
+# coalesce(..., '') para que el cursor pueda compararlas.
+STUDENT_SORT_COLUMNS = {
+    "id": User.id,
+    "last_name": func.coalesce(UserDetail.last_name, ""),
+    "first_name": func.coalesce(UserDetail.first_name, ""),
+}
+
+
+def encode_students_cursor(value, user_id):
+    """El cursor es el par (valor de la columna de orden, ID) del último alumno devuelto, en base64 para que sea opaco."""
+    return base64.urlsafe_b64encode(json.dumps([value, user_id]).encode()).decode()
+
+
+def decode_students_cursor(cursor, sort):
+    """Devuelve el par (valor, ID) de un cursor, o lanza ValueError si no es válido para el orden pedido."""
+    try:
+        value, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Cursor inválido.")
+    if not isinstance(user_id, int) or not isinstance(value, int if sort == "id" else str):
+        raise ValueError("Cursor inválido.")
+    return value, user_id
+
 
 @career.get("/career/{career_id}/students")
-def get_students_in_career(career_id: int, authorization: str | None = Header(default=None)):
+async def get_students_in_career(
+    career_id: int,
+    limit: int | None = Query(default=None, ge=1, le=CAREER_STUDENTS_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    sort: str = Query(default="last_name", pattern="^(last_name|first_name|id)$"),
+    order: str = Query(default="asc", pattern="^(asc|desc)$"),
+    admin: Principal = Depends(require_admin),
+    db_session: AsyncSession = Depends(get_async_db),
+):
     """
-    Obtiene todos los alumnos inscritos en una carrera específica.
+    Obtiene los alumnos inscritos en una carrera específica.
     Solo para administradores.
-    """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data:
-        return JSONResponse(status_code=401, content={"message": "Token inválido."})
 
-    db_session = session
-    try:
-        # Verificamos que el que pide es admin
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
+    La respuesta es {"career", "total", "students", "next_cursor"}. `total` es el contador de alumnos de la
+    carrera (career.student_count). Si se envía `limit` o `cursor` la respuesta es una página (de `limit`
+    alumnos, CAREER_STUDENTS_PAGE_SIZE si solo se envía el cursor): para pedir la siguiente se envía
+    `cursor=next_cursor` con los mismos `sort` y `order`; cuando no quedan más alumnos `next_cursor` es null.
+    Sin `limit` ni `cursor` se devuelven todos los alumnos (ordenados), como antes.
 
+    Todo se resuelve en la base de datos con una sola consulta por página: el filtro por rol, la unión con
+    el usuario y su detalle (cargado con contains_eager) y la paginación por cursor sobre
+    (columna de orden, ID). Cada página cuesta lo mismo aunque la carrera tenga miles de alumnos.
+    """
+    try:
         # Buscamos la carrera para asegurarnos de que existe
-        career_info = db_session.query(Career).filter(Career.id == career_id).first()
+        career_info = await db_session.scalar(select(Career).where(Career.id == career_id))
         if not career_info:
             return JSONResponse(status_code=404, content={"message": "Carrera no encontrada."})
 
-        # Buscamos todas las inscripciones para esa carrera
-        enrollments = db_session.query(PivoteUserCareer).filter(PivoteUserCareer.id_career == career_id).all()
-        
-        student_list = []
-        for enrollment in enrollments:
-            if enrollment.user and enrollment.user.userdetail and enrollment.user.userdetail.type == 'alumno':
-                student_data = {
-                    "id": enrollment.user.id,
-                    "first_name": enrollment.user.userdetail.first_name,
-                    "last_name": enrollment.user.userdetail.last_name,
-                    "email": enrollment.user.userdetail.email,
-                    "dni": enrollment.user.userdetail.dni
-                }
-                student_list.append(student_data)
-        
-        return {"career": career_info.name, "students": student_list}
+        paginated = limit is not None or cursor is not None
+        page_size = limit or CAREER_STUDENTS_PAGE_SIZE
+        sort_column = STUDENT_SORT_COLUMNS[sort]
+        key = tuple_(sort_column, User.id)
+        query = (
+            select(User)
+            .join(PivoteUserCareer, PivoteUserCareer.id_user == User.id)
+            .join(User.userdetail)
+            .options(contains_eager(User.userdetail))
+            .where(PivoteUserCareer.id_career == career_id, UserDetail.type == "alumno")
+            .order_by(*((sort_column, User.id) if order == "asc" else (sort_column.desc(), User.id.desc())))
+        )
+        if paginated:
+            # Se pide un alumno de más para saber si hay otra página sin hacer un COUNT.
+            query = query.limit(page_size + 1)
+        if cursor is not None:
+            try:
+                last = decode_students_cursor(cursor, sort)
+            except ValueError as e:
+                return JSONResponse(status_code=400, content={"message": str(e)})
+            query = query.where(key > tuple_(*last) if order == "asc" else key < tuple_(*last))
+
+        students = (await db_session.scalars(query)).all()
+        next_cursor = None
+        if paginated and len(students) > page_size:
+            students = students[:page_size]
+            last_student = students[-1]
+            last_value = last_student.id if sort == "id" else getattr(last_student.userdetail, sort) or ""
+            next_cursor = encode_students_cursor(last_value, last_student.id)
+
+        student_list = [{
+            "id": student.id,
+            "first_name": student.userdetail.first_name,
+            "last_name": student.userdetail.last_name,
+            "email": student.userdetail.email,
+            "dni": student.userdetail.dni
+        } for student in students]
+
+        return {"career": career_info.name, "total": career_info.student_count, "students": student_list, "next_cursor": next_cursor}
 
     except Exception as e:
-        db_session.rollback()
+        await db_session.rollback()
         return JSONResponse(status_code=500, content={"message": f"Error interno: {e}"})
-    finally:
-        db_session.close()
+
+@career.post("/career/{career_id}/enrollments")
+async def enroll_users_in_career(career_id: int, data: InputCareerEnrollment, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Inscribe una lista de usuarios en una carrera, en una sola sentencia y una sola transacción.
+    Solo accesible por administradores.
+    Usa INSERT ... SELECT ... ON CONFLICT DO NOTHING sobre el índice único (id_user, id_career): los que ya
+    estaban inscritos se saltean sin error y no hay una verificación previa que pueda quedar desactualizada
+    si otra petición inscribe al mismo usuario al mismo tiempo.
+    """
+    try:
+        if not await db_session.scalar(select(Career.id).where(Career.id == career_id)):
+            return JSONResponse(status_code=404, content={"message": "Carrera no encontrada."})
+
+        user_ids = set(data.user_ids)
+        # Solo se insertan los IDs que existen en "user"; RETURNING devuelve los que realmente se inscribieron.
+        statement = (
+            pg_insert(PivoteUserCareer)
+            .from_select(["id_user", "id_career"], select(User.id, literal(career_id)).where(User.id.in_(user_ids)))
+            .on_conflict_do_nothing(index_elements=["id_user", "id_career"])
+            .returning(PivoteUserCareer.id_user)
+        )
+        enrolled = set((await db_session.scalars(statement)).all())
+        existing_users = set((await db_session.scalars(select(User.id).where(User.id.in_(user_ids)))).all())
+        await db_session.commit()
+        return JSONResponse(status_code=200, content={
+            "message": f"Usuarios inscritos: {len(enrolled)}.",
+            "enrolled": sorted(enrolled),
+            "already_enrolled": sorted(existing_users - enrolled),
+            "not_found": sorted(user_ids - existing_users),
+        })
+
+    except Exception as e:
+        await db_session.rollback()
+        print("Error en la inscripción masiva:", e)
+        return JSONResponse(status_code=500, content={"message": "Error interno al inscribir a los usuarios."})
+
+@career.delete("/career/{career_id}/enrollments")
+async def unenroll_users_from_career(career_id: int, data: InputCareerEnrollment, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Quita de una carrera a una lista de usuarios con un único DELETE.
+    Solo accesible por administradores. Los usuarios que no estaban inscritos se informan en "not_enrolled".
+    """
+    try:
+        user_ids = set(data.user_ids)
+        statement = (
+            delete(PivoteUserCareer)
+            .where(PivoteUserCareer.id_career == career_id, PivoteUserCareer.id_user.in_(user_ids))
+            .returning(PivoteUserCareer.id_user)
+        )
+        removed = set((await db_session.scalars(statement)).all())
+        await db_session.commit()
+        return JSONResponse(status_code=200, content={
+            "message": f"Usuarios desinscritos: {len(removed)}.",
+            "unenrolled": sorted(removed),
+            "not_enrolled": sorted(user_ids - removed),
+        })
+
+    except Exception as e:
+        await db_session.rollback()
+        print("Error en la desinscripción masiva:", e)
+        return JSONResponse(status_code=500, content={"message": "Error interno al desinscribir a los usuarios."})
     
 @career.get("/professor/careers-data")
-def get_professor_dashboard_data(authorization: str | None = Header(default=None)):
+async def get_professor_dashboard_data(professor: Principal = Depends(require_professor), db_session: AsyncSession = Depends(get_async_db)):
     """
     Endpoint para el dashboard del profesor.
     Devuelve las carreras asignadas al profesor y el número de alumnos en cada una.
+    El rol de profesor lo verifica la dependencia `require_professor`.
+    La cantidad de alumnos es el contador `career.student_count`, que la base de datos mantiene al día
+    en cada inscripción, desinscripción, borrado de usuario o cambio de rol: no se cuentan inscripciones
+    en cada visita y todo se resuelve con una única consulta, tenga el profesor las carreras que tenga.
     """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    username = token_data.get("username")
-
-    if not username:
-        return JSONResponse(status_code=401, content={"message": "Token inválido."})
-
-    db_session = session
     try:
-        professor_user = db_session.query(User).options(joinedload(User.userdetail)).filter(User.username == username).first()
-        if not professor_user or professor_user.userdetail.type != 'profesor':
-            return JSONResponse(status_code=403, content={"message": "Acceso denegado. Se requiere rol de profesor."})
-
-        professor_careers = db_session.query(PivoteUserCareer).filter(PivoteUserCareer.id_user == professor_user.id).all()
-
-        if not professor_careers:
-            return []
-
-        dashboard_data = []
-        for prof_career in professor_careers:
-            enrollments_in_career = db_session.query(PivoteUserCareer).options(
-                joinedload(PivoteUserCareer.user).joinedload(User.userdetail)
-            ).filter(PivoteUserCareer.id_career == prof_career.id_career).all()
-            
-            student_count = 0
-            for enrollment in enrollments_in_career:
-                if enrollment.user and enrollment.user.userdetail and enrollment.user.userdetail.type == 'alumno':
-                    student_count += 1
-
-            dashboard_data.append({
-                "career_id": prof_career.career.id,
-                "career_name": prof_career.career.name,
-                "student_count": student_count
-            })
-            
-        return dashboard_data
+        query = (
+            select(Career.id, Career.name, Career.student_count)
+            .join(PivoteUserCareer, PivoteUserCareer.id_career == Career.id)
+            .where(PivoteUserCareer.id_user == professor.id)
+            .order_by(Career.id)
+        )
+        rows = (await db_session.execute(query)).all()
+
+        return [{
+            "career_id": row.id,
+            "career_name": row.name,
+            "student_count": row.student_count
+        } for row in rows]
 
     except Exception as e:
-        db_session.rollback()
+        await db_session.rollback()
         print(f"Error en dashboard de profesor: {e}")
         return JSONResponse(status_code=500, content={"message": "Error interno al obtener los datos del dashboard."})
-    finally:
-        db_session.close()
\ No newline at end of file
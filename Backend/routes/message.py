@@ -1,51 +1,115 @@
-from fastapi import APIRouter, status, Request, HTTPException
-from fastapi.responses import JSONResponse
-from models.modelo import session, User, Message, InputMessage, MessageResponse
-from auth.security import Security
-from typing import List
+from fastapi import APIRouter, status, HTTPException, Depends, Header, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from models.modelo import User, UserDetail, Career, PivoteUserCareer, Message, InputMessage, InputBroadcast, InputMarkRead, MessageResponse, MessagesPage
+from configs.async_db import get_async_db, AsyncSessionLocal
+from sqlalchemy import select, insert, update, tuple_, literal, false
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth.principal import Principal, require_admin, get_principal, still_authorized
+from routes.user import USER_TYPES
+from datetime import datetime
+import asyncio
+import base64
+import json
+import os
 
 message = APIRouter()
 
+# Tamaño de página de la bandeja de entrada: el predeterminado y el máximo que puede pedir el cliente.
+MESSAGES_PAGE_SIZE = int(os.getenv("MESSAGES_PAGE_SIZE", "20"))
+MESSAGES_MAX_PAGE_SIZE = int(os.getenv("MESSAGES_MAX_PAGE_SIZE", "100"))
+
+# Canal de notificaciones en tiempo real (Server-Sent Events, GET /messages/stream).
+# Segundos entre comentarios de keepalive (evitan que un proxy corte la conexión inactiva),
+# mensajes pendientes por conexión antes de cerrarla por lenta, y máximo de mensajes que se
+# reenvían al reconectar.
+MESSAGE_STREAM_KEEPALIVE = int(os.getenv("MESSAGE_STREAM_KEEPALIVE", "15"))
+MESSAGE_STREAM_QUEUE_SIZE = int(os.getenv("MESSAGE_STREAM_QUEUE_SIZE", "100"))
+MESSAGE_STREAM_REPLAY_LIMIT = int(os.getenv("MESSAGE_STREAM_REPLAY_LIMIT", "100"))
+
+
+class MessageBroker:
+    """
+    Distribuye los mensajes nuevos a las conexiones abiertas de su destinatario, dentro del proceso.
+    Cada conexión tiene su propia cola acotada. Si un cliente no consume y su cola se llena, se cierra
+    su conexión: al reconectar recibe lo que le falte desde la base de datos (cabecera Last-Event-ID),
+    así que un cliente lento no hace crecer la memoria del servidor.
+    Es un broker por proceso: con varios workers de uvicorn, solo reciben el aviso las conexiones
+    del worker que registró el mensaje; las demás lo ven al reconectar o al volver a pedir /messages.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}   # user_id -> conjunto de colas (una por pestaña conectada)
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def publish(self, messages):
+        """
+        Entrega cada mensaje (ya confirmado en la base de datos) a las conexiones de su destinatario.
+        No espera ni consulta nada: se puede llamar desde cualquier ruta después del commit.
+        """
+        for msg in messages:
+            if msg.recipient_id in self._subscribers:
+                self._deliver(msg.recipient_id, msg.id, MessageResponse.model_validate(msg).model_dump_json())
+
+    def publish_broadcast(self, rows, sender_id, content, timestamp):
+        """
+        Igual que `publish` para un mensaje difundido: `rows` son los pares (id, recipient_id) de los
+        mensajes creados, que comparten remitente, contenido y fecha. Solo se arma el evento de los
+        destinatarios conectados.
+        """
+        for message_id, recipient_id in rows:
+            if recipient_id in self._subscribers:
+                event = MessageResponse(id=message_id, sender_id=sender_id, content=content,
+                                        timestamp=timestamp, is_read=False).model_dump_json()
+                self._deliver(recipient_id, message_id, event)
+
+    def _deliver(self, user_id, message_id, event):
+        for queue in list(self._subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait((message_id, event))
+            except asyncio.QueueFull:
+                # Cliente lento: se vacía su cola y se le indica que cierre (None).
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def __len__(self):
+        return sum(len(queues) for queues in self._subscribers.values())
+
+
+message_broker = MessageBroker(queue_size=MESSAGE_STREAM_QUEUE_SIZE)
+
 # --- 3. RUTA PARA ENVIAR UN MENSAJE (SOLO ADMINS) ---
 # @message.post("/messages") indica que esta función se ejecuta cuando se recibe una petición POST a /api/messages.
 # Un POST se usa para CREAR algo nuevo, en este caso, un mensaje.
 @message.post("/messages", status_code=status.HTTP_201_CREATED, summary="Enviar un nuevo mensaje (Solo Admin)")
-def send_message(msg_input: InputMessage, req: Request):
+async def send_message(msg_input: InputMessage, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     """
     Permite que un Administrador envíe un mensaje a otro usuario.
     - msg_input (InputMessage): Son los datos que vienen en el cuerpo de la petición (el JSON).
       FastAPI automáticamente valida que el JSON tenga 'recipient_id' y 'content'.
-    - req (Request): Es la petición completa, la usamos para obtener el token de las cabeceras.
+    - admin (Principal): El administrador que envía el mensaje. La dependencia `require_admin`
+      verifica el token, que no esté revocado y que el rol sea "administrador".
     """
 
-    # PASO A: Verificar que el usuario sea un Administrador.
-    try:
-        # Decodificamos el token para ver quién está haciendo la petición.
-        token_data = Security.verify_token(req.headers)
-        print("DEBUG TOKEN:", token_data)
-
-        # En el token guardamos el rol del usuario cuando hizo login.
-        # Si el rol no es "Administrador", no lo dejamos continuar.
-        if token_data.get("role") != "administrador":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, # 403 Forbidden significa "Sé quién eres, pero no tienes permiso".
-                detail="No tienes permiso para enviar mensajes."
-            )
-        
-        # Si es un admin, guardamos su ID. Será el remitente (sender).
-        sender_id = token_data["user_id"]
-
-    except Exception:
-        # Si `verify_token` falla (token inválido, expirado, etc.), devolvemos un error de autenticación.
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, # 401 Unauthorized significa "No sé quién eres, identifícate".
-            detail="Token inválido o expirado."
-        )
+    # PASO A: El administrador que hace la petición será el remitente (sender).
+    sender_id = admin.id
 
     # PASO B: Crear y guardar el mensaje en la Base de Datos.
     try:
         # Buscamos en la tabla User si existe un usuario con el ID que nos enviaron.
-        recipient = session.query(User).filter(User.id == msg_input.recipient_id).first()
+        recipient = await db_session.scalar(select(User).where(User.id == msg_input.recipient_id))
         if not recipient:
             # Si no encontramos al destinatario, devolvemos un error 404 Not Found.
             raise HTTPException(
@@ -60,56 +124,232 @@ def send_message(msg_input: InputMessage, req: Request):
             content=msg_input.content
         )
 
-        session.add(new_message) # Preparamos el mensaje para guardarlo.
-        session.commit() # Confirmamos y guardamos el mensaje en la base de datos.
+        db_session.add(new_message) # Preparamos el mensaje para guardarlo.
+        await db_session.commit() # Confirmamos y guardamos el mensaje en la base de datos.
+        # Recién confirmado, se avisa al destinatario si tiene el canal en tiempo real abierto.
+        message_broker.publish([new_message])
 
         # Devolvemos una respuesta de éxito.
         return {"detail": "Mensaje enviado correctamente."}
 
     except Exception as e:
         # Si algo falla al interactuar con la base de datos, deshacemos cualquier cambio pendiente.
-        session.rollback()
+        await db_session.rollback()
         # Devolvemos un error genérico del servidor.
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocurrió un error interno al guardar el mensaje."
         )
-    finally:
-        # Este bloque se ejecuta SIEMPRE (con éxito o con error).
-        # Es una buena práctica cerrar la sesión para liberar la conexión a la base de datos.
-        session.close()
+
+
+# --- 3b. RUTA PARA DIFUNDIR UN MENSAJE A MUCHOS USUARIOS (SOLO ADMINS) ---
+def broadcast_recipients(data):
+    """
+    Consulta con los IDs de los destinatarios de una difusión, según el destino indicado:
+    los usuarios de un tipo, los alumnos inscritos en una carrera o los IDs de la lista que existen.
+    """
+    if data.role is not None:
+        return select(User.id).join(UserDetail, UserDetail.id == User.id_userdetail).where(UserDetail.type == data.role)
+    if data.career is not None:
+        return (
+            select(PivoteUserCareer.id_user)
+            .join(User, User.id == PivoteUserCareer.id_user)
+            .join(UserDetail, UserDetail.id == User.id_userdetail)
+            .where(PivoteUserCareer.id_career == data.career, UserDetail.type == "alumno")
+        )
+    return select(User.id).where(User.id.in_(set(data.recipient_ids)))
+
+
+@message.post("/messages/broadcast", status_code=status.HTTP_201_CREATED, summary="Difundir un mensaje (Solo Admin)")
+async def broadcast_message(data: InputBroadcast, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Envía el mismo mensaje a muchos usuarios a la vez: a todos los de un tipo ("role"), a todos los alumnos
+    de una carrera ("career") o a una lista de IDs ("recipient_ids"); uno solo de los tres.
+    Crea un mensaje por destinatario con un único INSERT ... SELECT: la base de datos arma las filas a partir
+    de la consulta de destinatarios, sin traer los IDs a Python ni hacer un INSERT por usuario. Así cada
+    destinatario lo ve en su bandeja, su contador de no leídos y su canal en tiempo real como cualquier otro mensaje.
+    Devuelve {"message", "sent"} y, con una lista de IDs, "not_found" con los que no existen.
+    """
+    if sum(target is not None for target in (data.role, data.career, data.recipient_ids)) != 1:
+        return JSONResponse(status_code=400, content={"message": "Indique un solo destino: \"role\", \"career\" o \"recipient_ids\"."})
+    if data.role is not None and data.role not in USER_TYPES:
+        return JSONResponse(status_code=400, content={"message": f"Tipo de usuario inválido: '{data.role}'."})
+
+    try:
+        if data.career is not None and not await db_session.scalar(select(Career.id).where(Career.id == data.career)):
+            return JSONResponse(status_code=404, content={"message": "Carrera no encontrada."})
+
+        # Todos los mensajes de la difusión comparten la fecha; el id los ordena dentro de la bandeja.
+        timestamp = datetime.now()
+        recipients = broadcast_recipients(data).subquery()
+        statement = (
+            insert(Message)
+            .from_select(
+                ["sender_id", "recipient_id", "content", "timestamp", "is_read"],
+                select(literal(admin.id), recipients.c[0], literal(data.content), literal(timestamp), false()),
+            )
+            .returning(Message.id, Message.recipient_id)
+        )
+        created = (await db_session.execute(statement)).all()
+        await db_session.commit()
+    except Exception as e:
+        await db_session.rollback()
+        print("Error en la difusión del mensaje:", e)
+        return JSONResponse(status_code=500, content={"message": "Error interno al difundir el mensaje."})
+
+    message_broker.publish_broadcast(created, admin.id, data.content, timestamp)
+    body = {"message": f"Mensaje enviado a {len(created)} usuario(s).", "sent": len(created)}
+    if data.recipient_ids is not None:
+        body["not_found"] = sorted(set(data.recipient_ids) - {recipient_id for _, recipient_id in created})
+    return JSONResponse(status_code=201, content=body)
 
 
 # --- 4. RUTA PARA OBTENER LOS MENSAJES DE UN USUARIO ---
-# @message.get() maneja peticiones GET. Un GET se usa para LEER o solicitar datos.
-@message.get("/messages", response_model=List[MessageResponse], summary="Obtener mis mensajes recibidos")
-def get_user_messages(req: Request):
+def inbox_page_query(user_id, limit, after=None, unread_only=False):
     """
-    Devuelve todos los mensajes que ha recibido el usuario que hace la petición.
+    Consulta de una página de la bandeja de entrada, de los mensajes más nuevos a los más viejos.
+    El orden es (timestamp, id): el id desempata los mensajes con la misma fecha (p. ej. una carga masiva).
+    `after` = (timestamp, id) del último mensaje de la página anterior: la consulta sigue desde ahí
+    por el índice (recipient_id, timestamp, id), en lugar de saltear filas con OFFSET.
+    Pide `limit + 1` filas para saber si hay otra página.
     """
-    # PASO A: Verificar quién es el usuario.
+    query = select(Message).where(Message.recipient_id == user_id)
+    if unread_only:
+        query = query.where(~Message.is_read)
+    if after is not None:
+        query = query.where(tuple_(Message.timestamp, Message.id) < after)
+    return query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit + 1)
+
+
+def encode_inbox_cursor(msg):
+    """El cursor es (fecha ISO, ID) del último mensaje devuelto, en base64 para que sea opaco."""
+    return base64.urlsafe_b64encode(json.dumps([msg.timestamp.isoformat(), msg.id]).encode()).decode()
+
+
+def decode_inbox_cursor(cursor):
+    """Devuelve el par (timestamp, id) de un cursor, o lanza ValueError si no es válido."""
     try:
-        token_data = Security.verify_token(req.headers)
-        if "user_id" not in token_data:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
-        
-        # Obtenemos el ID del usuario que está pidiendo sus mensajes.
-        user_id = token_data["user_id"] 
-    
+        timestamp, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        timestamp = datetime.fromisoformat(timestamp)
     except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido o expirado.")
+        raise ValueError("Cursor inválido.")
+    if not isinstance(message_id, int):
+        raise ValueError("Cursor inválido.")
+    return timestamp, message_id
+
+
+# @message.get() maneja peticiones GET. Un GET se usa para LEER o solicitar datos.
+@message.get("/messages", response_model=MessagesPage, summary="Obtener mis mensajes recibidos")
+async def get_user_messages(
+    limit: int = Query(default=MESSAGES_PAGE_SIZE, ge=1, le=MESSAGES_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    unread_only: bool = False,
+    principal: Principal = Depends(get_principal),
+    db_session: AsyncSession = Depends(get_async_db),
+):
+    """
+    Devuelve una página de los mensajes que ha recibido el usuario que hace la petición, del más nuevo
+    al más viejo: {"messages": [...], "next_cursor": ...}. Para la página siguiente se envía
+    `cursor=next_cursor` (con el mismo `unread_only`); cuando no hay más mensajes `next_cursor` es null.
+    Con `unread_only=true` solo devuelve los no leídos.
+    """
+    # PASO A: El usuario que pide sus mensajes es el del token (la dependencia `get_principal`
+    # lo verifica y rechaza los tokens revocados).
+    user_id = principal.id
 
-    # PASO B: Consultar sus mensajes en la Base de Datos.
     try:
-        # Buscamos en la tabla 'Message' todos los registros donde el 'recipient_id' sea el nuestro.
-        # Los ordenamos del más nuevo al más viejo (descendente).
-        messages = session.query(Message).filter(Message.recipient_id == user_id).order_by(Message.timestamp.desc()).all()
-        
-        # Devolvemos la lista de mensajes. FastAPI la convertirá a JSON automáticamente.
-        return messages
+        after = decode_inbox_cursor(cursor) if cursor is not None else None
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+
+    # PASO B: Consultar una página de sus mensajes en la Base de Datos.
+    messages = (await db_session.scalars(inbox_page_query(user_id, limit, after, unread_only))).all()
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_inbox_cursor(messages[-1])
+    
+    # FastAPI convierte la página a JSON automáticamente.
+    return {"messages": messages, "next_cursor": next_cursor}
+
+
+
+# --- 4a. CANTIDAD DE MENSAJES SIN LEER ---
+@message.get("/messages/unread-count", summary="Cantidad de mensajes sin leer")
+async def get_unread_count(principal: Principal = Depends(get_principal), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Devuelve {"unread": n}, lo único que necesita el globo de notificaciones.
+    Se lee del contador "user".unread_messages (una fila por clave primaria), sin contar los mensajes:
+    el costo no crece con el historial del usuario. El contador lo mantienen triggers de la base de datos.
+    """
+    unread = await db_session.scalar(select(User.unread_messages).where(User.id == principal.id))
+    return {"unread": unread or 0}
+
+
+# --- 4b. CANAL EN TIEMPO REAL DE MENSAJES NUEVOS (SERVER-SENT EVENTS) ---
+@message.get("/messages/stream", summary="Recibir los mensajes nuevos en tiempo real")
+async def stream_messages(token: str | None = Query(default=None), authorization: str | None = Header(default=None),
+                          last_event_id: str | None = Header(default=None)):
+    """
+    Mantiene abierta una respuesta text/event-stream por la que llega cada mensaje nuevo del usuario
+    (evento "message", con los mismos campos que GET /messages), en lugar de volver a pedir la lista completa.
+    - El token va en la cabecera Authorization o, como EventSource del navegador no permite cabeceras,
+      en el parámetro `token`. Es una concesión: un token en la URL queda en los logs de acceso de uvicorn
+      y de cualquier proxy intermedio, y quien los lea puede usarlo hasta que venza (hasta 8 horas).
+      Para esta ruta hay que desactivar o filtrar el registro de la query string, o usar un cliente
+      que permita enviar la cabecera.
+    - El canal no vive más que el token: en cada latido y antes de cada evento se vuelve a verificar que
+      no haya vencido ni se haya revocado (cambio de rol, usuario borrado), y si no es así se cierra.
+    - Cada evento lleva como id el del mensaje. Al reconectar, EventSource manda la cabecera Last-Event-ID
+      y primero se reenvían los mensajes posteriores a ese id que se perdieron mientras estaba desconectado.
+    Las sesiones de base de datos se usan solo para autenticar y para reenviar, y se cierran antes de
+    quedar esperando: un canal abierto no retiene una conexión del pool.
+    """
+    authorization = authorization or (f"Bearer {token}" if token else None)
+    async with AsyncSessionLocal() as session:
+        principal = await get_principal(authorization, session)
+    last_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    async def events():
+        # Se suscribe antes de leer lo pendiente: un mensaje que llegue en el medio no se pierde
+        # (y si aparece en ambos lados se descarta por id).
+        queue = message_broker.subscribe(principal.id)
+        try:
+            # Indica al navegador cuánto esperar antes de reconectar si se corta la conexión.
+            yield "retry: 3000\n\n"
+            sent_id = last_id or 0
+            if last_id is not None:
+                async with AsyncSessionLocal() as session:
+                    missed = (await session.scalars(
+                        select(Message).where(Message.recipient_id == principal.id, Message.id > last_id)
+                        .order_by(Message.id).limit(MESSAGE_STREAM_REPLAY_LIMIT)
+                    )).all()
+                for msg in missed:
+                    sent_id = msg.id
+                    yield f"id: {msg.id}\nevent: message\ndata: {MessageResponse.model_validate(msg).model_dump_json()}\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=MESSAGE_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Latido: mantiene viva la conexión y vuelve a verificar el token.
+                    if not await still_authorized(authorization):
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                # Token vencido o revocado: se cierra el canal. EventSource reconecta y recibe 401.
+                if item is None or not await still_authorized(authorization):
+                    return
+                message_id, data = item
+                if message_id <= sent_id:
+                    continue
+                sent_id = message_id
+                yield f"id: {message_id}\nevent: message\ndata: {data}\n\n"
+        finally:
+            message_broker.unsubscribe(principal.id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-    finally:
-        session.close()
 
 
 # --- 5. RUTA PARA MARCAR UN MENSAJE COMO LEÍDO ---
@@ -117,39 +357,60 @@ def get_user_messages(req: Request):
 # {message_id} en la URL es una variable. El número que ponga el cliente (ej: /api/messages/15/read) 
 # se pasará como argumento a nuestra función.
 @message.put("/messages/{message_id}/read", status_code=status.HTTP_204_NO_CONTENT, summary="Marcar un mensaje como leído")
-def mark_as_read(message_id: int, req: Request):
+async def mark_as_read(message_id: int, principal: Principal = Depends(get_principal), db_session: AsyncSession = Depends(get_async_db)):
     """
     Actualiza un mensaje para marcarlo como leído (is_read = True).
     """
-    # PASO A: Verificar quién es el usuario.
-    try:
-        token_data = Security.verify_token(req.headers)
-        user_id = token_data.get("user_id")
-        if not user_id:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
-    except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido o expirado.")
+    # PASO A: El usuario es el del token (verificado por la dependencia `get_principal`).
+    user_id = principal.id
 
     # PASO B: Buscar el mensaje y actualizarlo.
-    try:
-        # Buscamos el mensaje específico por su ID.
-        message_to_update = session.query(Message).filter(Message.id == message_id).first()
+    # Buscamos el mensaje específico por su ID.
+    message_to_update = await db_session.scalar(select(Message).where(Message.id == message_id))
 
-        if not message_to_update:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Mensaje no encontrado.")
-        
-        # ¡MUY IMPORTANTE! Verificamos que el mensaje le pertenezca al usuario.
-        # Esto evita que un usuario pueda marcar como leídos los mensajes de otra persona.
-        if message_to_update.recipient_id != user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes permiso para modificar este mensaje.")
+    if not message_to_update:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Mensaje no encontrado.")
+    
+    # ¡MUY IMPORTANTE! Verificamos que el mensaje le pertenezca al usuario.
+    # Esto evita que un usuario pueda marcar como leídos los mensajes de otra persona.
+    if message_to_update.recipient_id != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes permiso para modificar este mensaje.")
 
-        # Actualizamos el campo 'is_read' a True y guardamos.
-        message_to_update.is_read = True
-        session.commit()
+    # Actualizamos el campo 'is_read' a True y guardamos.
+    message_to_update.is_read = True
+    await db_session.commit()
 
-        # El código 204 significa "Todo salió bien, pero no te devuelvo ningún contenido".
-        # Es perfecto para una operación como esta. FastAPI se encarga de que la respuesta vaya vacía.
-        return
+    # El código 204 significa "Todo salió bien, pero no te devuelvo ningún contenido".
+    # Es perfecto para una operación como esta. FastAPI se encarga de que la respuesta vaya vacía.
+    return
 
-    finally:
-        session.close()
\ No newline at end of file
+
+# --- 6. RUTA PARA MARCAR VARIOS MENSAJES COMO LEÍDOS ---
+@message.put("/messages/read", summary="Marcar varios mensajes (o todos) como leídos")
+async def mark_many_as_read(data: InputMarkRead, principal: Principal = Depends(get_principal), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Marca como leídos varios mensajes del usuario con un único UPDATE, en lugar de una petición por mensaje.
+    El cuerpo lleva una de estas dos opciones:
+    - "ids": lista de IDs de mensajes.
+    - "before": fecha y hora; se marcan todos los no leídos recibidos hasta ese momento inclusive
+      ("marcar todos como leídos" envía la fecha del mensaje más nuevo que ve el usuario, así no marca
+      uno que llegó después sin que lo haya visto).
+    La condición `recipient_id` va en el mismo UPDATE: los IDs de mensajes de otros usuarios simplemente
+    no se modifican. Devuelve {"message", "updated"}, con la cantidad de mensajes que pasaron a leídos.
+    """
+    if (data.ids is None) == (data.before is None):
+        return JSONResponse(status_code=400, content={"message": "Envíe \"ids\" o \"before\" (uno de los dos)."})
+
+    statement = update(Message).where(Message.recipient_id == principal.id, ~Message.is_read)
+    if data.ids is not None:
+        statement = statement.where(Message.id.in_(set(data.ids)))
+    else:
+        statement = statement.where(Message.timestamp <= data.before)
+    try:
+        result = await db_session.execute(statement.values(is_read=True).execution_options(synchronize_session=False))
+        await db_session.commit()
+    except Exception as e:
+        await db_session.rollback()
+        print("Error al marcar los mensajes como leídos:", e)
+        return JSONResponse(status_code=500, content={"message": "Error interno al marcar los mensajes como leídos."})
+    return JSONResponse(status_code=200, content={"message": f"Mensajes marcados como leídos: {result.rowcount}.", "updated": result.rowcount})
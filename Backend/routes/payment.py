@@ -1,37 +1,367 @@
-from datetime import datetime
-from fastapi import APIRouter, Header, status, Request, HTTPException
-from fastapi.responses import JSONResponse
-from models.modelo import Payment, InputPayment, User, Message, session
-from sqlalchemy.orm import joinedload
-from auth.security import Security
+import csv
+import io
+import itertools
+import os
+import traceback
+from datetime import datetime, date
+from fastapi import APIRouter, status, HTTPException, Depends, Query, File, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool   # ejecuta código bloqueante (leer y convertir el CSV) en un hilo aparte
+from models.modelo import Payment, InputPayment, User, UserDetail, Message, Career, RevenueMonthly, PivoteUserCareer
+from configs.async_db import get_async_db, AsyncSessionLocal
+from sqlalchemy import select, insert, func, cast, tuple_, true, and_, or_, any_, literal_column, Date
+from sqlalchemy.dialects.postgresql import aggregate_order_by   # array_agg(... ORDER BY ...)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from auth.principal import Principal, get_principal, require_admin
+from routes.message import message_broker   # avisa en tiempo real al alumno del pago registrado
 
 payment = APIRouter()
 
 
+# Tamaño de página del listado de pagos: el predeterminado y el máximo que puede pedir el cliente.
+PAYMENTS_PAGE_SIZE = int(os.getenv("PAYMENTS_PAGE_SIZE", "50"))
+PAYMENTS_MAX_PAGE_SIZE = int(os.getenv("PAYMENTS_MAX_PAGE_SIZE", "500"))
+
+
+def payments_page_query(limit, cursor=None, career=None, student=None, month_from=None, month_to=None,
+                        amount_min=None, amount_max=None):
+    """
+    Consulta de una página del listado de pagos, del más reciente al más antiguo (por ID).
+    El alumno, su detalle y la carrera se cargan en la misma consulta con JOIN (sin lazy loading), y
+    todos los filtros se aplican en la base de datos. Pide `limit + 1` filas para saber si hay otra
+    página sin hacer un COUNT; `cursor` es el último ID de la página anterior (keyset: "IDs menores").
+    La usan la ruta y `python benchmark.py pagos`.
+    """
+    query = select(Payment).options(
+        joinedload(Payment.user).joinedload(User.userdetail),
+        joinedload(Payment.career)
+    )
+    if cursor is not None:
+        query = query.where(Payment.id < cursor)
+    if career is not None:
+        query = query.where(Payment.id_career == career)
+    if student is not None:
+        query = query.where(Payment.id_user == student)
+    if month_from is not None:
+        query = query.where(Payment.affected_month >= month_from)
+    if month_to is not None:
+        query = query.where(Payment.affected_month <= month_to)
+    if amount_min is not None:
+        query = query.where(Payment.amount >= amount_min)
+    if amount_max is not None:
+        query = query.where(Payment.amount <= amount_max)
+    return query.order_by(Payment.id.desc()).limit(limit + 1)
+
+
 @payment.get("/payment/all/detailled")
-def get_payments():
+async def get_payments(
+    career: int | None = None,
+    student: int | None = None,
+    month_from: date | None = None,
+    month_to: date | None = None,
+    amount_min: int | None = None,
+    amount_max: int | None = None,
+    limit: int = Query(default=PAYMENTS_PAGE_SIZE, ge=1, le=PAYMENTS_MAX_PAGE_SIZE),
+    cursor: int | None = None,
+    admin: Principal = Depends(require_admin),
+    db_session: AsyncSession = Depends(get_async_db),
+):
+    """
+    Listado de pagos con el alumno y la carrera, una página a la vez.
+    Solo accesible por administradores.
+
+    Filtros opcionales: `career` (ID de carrera), `student` (ID del alumno), `month_from` / `month_to`
+    (rango del mes pagado, YYYY-MM-DD, inclusive) y `amount_min` / `amount_max` (rango de montos).
+    La respuesta es {"payments": [...], "next_cursor": ...}; para la página siguiente se envía
+    `cursor=next_cursor` con los mismos filtros. Cuando no quedan más pagos `next_cursor` es null.
+    """
+    query = payments_page_query(limit, cursor, career=career, student=student, month_from=month_from,
+                                month_to=month_to, amount_min=amount_min, amount_max=amount_max)
+    allPayments = (await db_session.scalars(query)).all()
+    next_cursor = None
+    if len(allPayments) > limit:
+        allPayments = allPayments[:limit]
+        next_cursor = allPayments[-1].id
+
     paymentsDetailled = []
-    allPayments =  session.query(Payment).all()
     for pay in allPayments:
+        detail = pay.user.userdetail if pay.user else None
         result = {
             "id_pago" : pay.id,
             "monto": pay.amount,
-            "afecha de pago" : pay.created_at,
-            "mes_pagado" : pay.affected_month,
-            "alumno": f"{pay.user.userdetail.first_name} {pay.user.userdetail.last_name}",
-            "carrera afectada": pay.career.name
+            "afecha de pago" : pay.created_at.isoformat() if pay.created_at else None,
+            "mes_pagado" : pay.affected_month.isoformat() if pay.affected_month else None,
+            "alumno": f"{detail.first_name} {detail.last_name}" if detail else None,
+            "carrera afectada": pay.career.name if pay.career else None
         }
         paymentsDetailled.append(result)
-    return paymentsDetailled
+    return JSONResponse(status_code=200, content={"payments": paymentsDetailled, "next_cursor": next_cursor})
+
+def revenue_totals(by_month, year, months=None):
+    """
+    Total y cantidad de pagos de un año a partir de {(año, mes): (total, cantidad)}, comparados con el año anterior.
+    `change_pct` es la variación porcentual del total respecto del año anterior (null si el anterior no tuvo pagos).
+    Si se pasa `months` se agrega el detalle mes por mes, también con el total del mismo mes del año anterior.
+    """
+    total = sum(by_month.get((year, m), (0, 0))[0] for m in range(1, 13))
+    count = sum(by_month.get((year, m), (0, 0))[1] for m in range(1, 13))
+    previous = sum(by_month.get((year - 1, m), (0, 0))[0] for m in range(1, 13))
+    summary = {
+        "year": year,
+        "total_amount": total,
+        "payment_count": count,
+        "previous_total_amount": previous,
+        "change_pct": round((total - previous) * 100 / previous, 1) if previous else None,
+    }
+    if months:
+        summary["months"] = [{
+            "month": m,
+            "total_amount": by_month.get((year, m), (0, 0))[0],
+            "payment_count": by_month.get((year, m), (0, 0))[1],
+            "previous_total_amount": by_month.get((year - 1, m), (0, 0))[0],
+        } for m in range(1, 13)]
+    return summary
+
+
+@payment.get("/payment/reports/revenue")
+async def revenue_report(
+    year_from: int | None = Query(default=None, ge=1900, le=9999),
+    year_to: int | None = Query(default=None, ge=1900, le=9999),
+    career: int | None = None,
+    admin: Principal = Depends(require_admin),
+    db_session: AsyncSession = Depends(get_async_db),
+):
+    """
+    Reporte de recaudación por carrera y mes pagado, con la comparación contra el año anterior.
+    Solo accesible por administradores.
+
+    Parámetros: `year_from` y `year_to` (por defecto el año pasado y el actual) y `career` (ID, opcional).
+    Para cada carrera y cada año devuelve el total, la cantidad de pagos, el total del año anterior y la
+    variación porcentual, más el detalle de los 12 meses; "totals" es lo mismo sumando todas las carreras.
+
+    Lee el resumen revenue_monthly (a lo sumo una fila por carrera y mes), no la tabla de pagos: el costo
+    no depende de cuántos pagos haya.
+    """
+    today = date.today()
+    year_to = year_to or today.year
+    year_from = year_from or year_to - 1
+    if year_from > year_to:
+        return JSONResponse(status_code=400, content={"message": "year_from no puede ser posterior a year_to."})
+
+    # Se lee también el año anterior al primero pedido, para poder compararlo.
+    query = (
+        select(RevenueMonthly.id_career, Career.name, RevenueMonthly.affected_month,
+               RevenueMonthly.total_amount, RevenueMonthly.payment_count)
+        .join(Career, Career.id == RevenueMonthly.id_career)
+        .where(RevenueMonthly.affected_month >= date(year_from - 1, 1, 1),
+               RevenueMonthly.affected_month < date(year_to + 1, 1, 1))
+        .order_by(RevenueMonthly.id_career, RevenueMonthly.affected_month)
+    )
+    if career is not None:
+        query = query.where(RevenueMonthly.id_career == career)
+    rows = (await db_session.execute(query)).all()
+
+    careers = {}
+    overall = {}
+    for row in rows:
+        key = (row.affected_month.year, row.affected_month.month)
+        entry = careers.setdefault(row.id_career, {"name": row.name, "by_month": {}})
+        entry["by_month"][key] = (row.total_amount, row.payment_count)
+        total, count = overall.get(key, (0, 0))
+        overall[key] = (total + row.total_amount, count + row.payment_count)
+
+    years = range(year_from, year_to + 1)
+    return {
+        "year_from": year_from,
+        "year_to": year_to,
+        "careers": [{
+            "career_id": career_id,
+            "career_name": entry["name"],
+            "years": [revenue_totals(entry["by_month"], year, months=True) for year in years],
+        } for career_id, entry in careers.items()],
+        "totals": [revenue_totals(overall, year) for year in years],
+    }
+
+def first_of_month(value):
+    return value.replace(day=1)
+
+
+def next_month(value):
+    """Primer día del mes siguiente a `value`."""
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def delinquency_query(month_from, month_to, career=None, after=None):
+    """
+    Meses impagos: una fila (id_user, id_career, month) por cada alumno inscrito en una carrera y cada mes
+    del rango (ambos extremos inclusive) sin ningún pago de esa carrera con ese mes pagado.
+    Se resuelve en una sola consulta, sin consultas por alumno:
+    1. "paid": los meses pagados de cada (alumno, carrera) en el rango, agrupados en un arreglo. Se lee en
+       el orden del índice ix_payment_user_career_month, así que no hay que ordenar los pagos.
+    2. Las inscripciones de alumnos se cruzan con los meses del rango (generate_series) y se quedan los
+       meses que no están en "paid" (un anti-join contra los pagos ya agrupados).
+    Un NOT EXISTS directo contra payment hace que PostgreSQL compare cada (alumno, mes) con todos los
+    pagos del alumno; agrupar primero es varias veces más rápido con decenas de miles de alumnos.
+    `after` = (id_user, id_career) limita a las inscripciones posteriores a ese par (paginación por cursor).
+    La inscripción no tiene fecha, así que se consideran todos los meses del rango.
+    """
+    month_from, month_to = first_of_month(month_from), first_of_month(month_to)
+    paid = (
+        select(Payment.id_user, Payment.id_career,
+               func.array_agg(cast(func.date_trunc("month", Payment.affected_month), Date)).label("months"))
+        .where(Payment.affected_month >= month_from, Payment.affected_month < next_month(month_to))
+        .group_by(Payment.id_user, Payment.id_career)
+    )
+    months = func.generate_series(month_from, month_to, literal_column("interval '1 month'")).table_valued("month").render_derived(name="months")
+    month = cast(months.c.month, Date)
+    query = (
+        select(PivoteUserCareer.id_user, PivoteUserCareer.id_career, month.label("month"))
+        .join(User, User.id == PivoteUserCareer.id_user)
+        .join(UserDetail, UserDetail.id == User.id_userdetail)
+        .where(UserDetail.type == "alumno")
+    )
+    if career is not None:
+        paid = paid.where(Payment.id_career == career)
+        query = query.where(PivoteUserCareer.id_career == career)
+    if after is not None:
+        paid = paid.where(tuple_(Payment.id_user, Payment.id_career) > tuple_(*after))
+        query = query.where(tuple_(PivoteUserCareer.id_user, PivoteUserCareer.id_career) > tuple_(*after))
+    paid = paid.subquery("paid")
+    return (
+        query
+        .outerjoin(paid, and_(paid.c.id_user == PivoteUserCareer.id_user, paid.c.id_career == PivoteUserCareer.id_career))
+        .join(months, true())
+        .where(or_(paid.c.months.is_(None), ~(month == any_(paid.c.months))))
+    )
+
+
+def delinquency_page_query(month_from, month_to, limit=None, career=None, after=None):
+    """
+    Página del reporte de meses impagos agrupada por inscripción: una fila por (alumno, carrera) con sus
+    meses impagos en un arreglo, el nombre del alumno y el de la carrera. Ordenada por (id_user, id_career)
+    para paginar por cursor; pide `limit + 1` filas para saber si hay otra página (sin `limit`, todas).
+    """
+    missing = delinquency_query(month_from, month_to, career=career, after=after).subquery()
+    grouped = (
+        select(missing.c.id_user, missing.c.id_career,
+               func.array_agg(aggregate_order_by(missing.c.month, missing.c.month)).label("months"))
+        .group_by(missing.c.id_user, missing.c.id_career)
+        .order_by(missing.c.id_user, missing.c.id_career)
+    )
+    if limit is not None:
+        grouped = grouped.limit(limit + 1)
+    grouped = grouped.subquery()
+    return (
+        select(grouped.c.id_user, grouped.c.id_career, grouped.c.months,
+               UserDetail.first_name, UserDetail.last_name, UserDetail.email, Career.name.label("career_name"))
+        .join(User, User.id == grouped.c.id_user)
+        .join(UserDetail, UserDetail.id == User.id_userdetail)
+        .join(Career, Career.id == grouped.c.id_career)
+        .order_by(grouped.c.id_user, grouped.c.id_career)
+    )
+
+
+# Límites del reporte de meses impagos: tamaño de página (predeterminado y máximo) y meses por consulta.
+DELINQUENCY_PAGE_SIZE = int(os.getenv("DELINQUENCY_PAGE_SIZE", "100"))
+DELINQUENCY_MAX_PAGE_SIZE = int(os.getenv("DELINQUENCY_MAX_PAGE_SIZE", "1000"))
+DELINQUENCY_MAX_MONTHS = int(os.getenv("DELINQUENCY_MAX_MONTHS", "60"))
+DELINQUENCY_BATCH_SIZE = int(os.getenv("DELINQUENCY_BATCH_SIZE", "1000"))
+DELINQUENCY_COLUMNS = ["id_user", "first_name", "last_name", "email", "id_career", "career", "missing_months"]
+
+
+async def delinquency_csv_rows(month_from, month_to, career):
+    """
+    Generador asíncrono con el reporte completo en CSV, una fila por (alumno, carrera).
+    Como la exportación de usuarios, usa su propia sesión y `stream()`: se envía a medida que se lee.
+    """
+    async with AsyncSessionLocal() as session:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(DELINQUENCY_COLUMNS)
+        yield buffer.getvalue()
+        query = delinquency_page_query(month_from, month_to, career=career)
+        result = await session.stream(query.execution_options(yield_per=DELINQUENCY_BATCH_SIZE))
+        async for rows in result.partitions():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow([row.id_user, row.first_name, row.last_name, row.email, row.id_career,
+                                 row.career_name, "; ".join(f"{month:%Y-%m}" for month in row.months)])
+            yield buffer.getvalue()
+
+
+@payment.get("/payment/reports/delinquency")
+async def delinquency_report(
+    month_from: date,
+    month_to: date,
+    career: int | None = None,
+    format: str = Query(default="json", pattern="^(json|csv)$"),
+    limit: int = Query(default=DELINQUENCY_PAGE_SIZE, ge=1, le=DELINQUENCY_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    admin: Principal = Depends(require_admin),
+    db_session: AsyncSession = Depends(get_async_db),
+):
+    """
+    Reporte de meses impagos: qué alumnos inscritos no pagaron qué meses de cada carrera.
+    Solo accesible por administradores.
+
+    `month_from` y `month_to` (YYYY-MM-DD, se toma el mes) delimitan el rango, ambos inclusive;
+    `career` lo limita a una carrera. Con `format=json` (por defecto) devuelve una página
+    {"students": [...], "next_cursor": ...} con una entrada por (alumno, carrera) y sus meses impagos;
+    para la siguiente se envía `cursor=next_cursor`. Con `format=csv` descarga el reporte completo.
+    Se calcula en una sola consulta (ver `delinquency_query`).
+    """
+    month_from, month_to = first_of_month(month_from), first_of_month(month_to)
+    months = (month_to.year - month_from.year) * 12 + month_to.month - month_from.month + 1
+    if months < 1:
+        return JSONResponse(status_code=400, content={"message": "month_from no puede ser posterior a month_to."})
+    if months > DELINQUENCY_MAX_MONTHS:
+        return JSONResponse(status_code=400, content={"message": f"El rango no puede superar los {DELINQUENCY_MAX_MONTHS} meses."})
+
+    if format == "csv":
+        headers = {"Content-Disposition": f'attachment; filename="meses_impagos_{month_from:%Y-%m}_{month_to:%Y-%m}.csv"'}
+        return StreamingResponse(delinquency_csv_rows(month_from, month_to, career),
+                                 media_type="text/csv; charset=utf-8", headers=headers)
+
+    # El cursor es "id_user:id_career" de la última inscripción de la página anterior.
+    after = None
+    if cursor is not None:
+        try:
+            after = tuple(int(part) for part in cursor.split(":"))
+        except ValueError:
+            after = ()
+        if len(after) != 2:
+            return JSONResponse(status_code=400, content={"message": "Cursor inválido."})
+
+    rows = (await db_session.execute(delinquency_page_query(month_from, month_to, limit, career=career, after=after))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1].id_user}:{rows[-1].id_career}"
+
+    return JSONResponse(status_code=200, content={
+        "month_from": month_from.isoformat(),
+        "month_to": month_to.isoformat(),
+        "students": [{
+            "id_user": row.id_user,
+            "first_name": row.first_name,
+            "last_name": row.last_name,
+            "email": row.email,
+            "id_career": row.id_career,
+            "career_name": row.career_name,
+            "missing_months": [month.isoformat() for month in row.months],
+        } for row in rows],
+        "next_cursor": next_cursor,
+    })
+
 
 @payment.get("/payment/user")
-def payament_user(req: Request):
+async def payament_user(principal: Principal = Depends(get_principal), db_session: AsyncSession = Depends(get_async_db)):
+    # El usuario es el del token; `get_principal` lo verifica y rechaza los tokens revocados.
     try:
-        token_data = Security.verify_token(req.headers)
-        if "message" in token_data:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=token_data["message"])
-        username = token_data["username"]
-        user_encontrado = session.query(User).filter(User.username == username).first()
+        user_encontrado = await db_session.scalar(select(User).options(
+            selectinload(User.payments).joinedload(Payment.career)
+        ).where(User.id == principal.id))
         if not user_encontrado:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
         array_salida = []
@@ -50,26 +380,213 @@ def payament_user(req: Request):
     except Exception as e:
         print(f"Error inesperado en payament_user: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error interno al procesar la solicitud.")
-    finally:
-        session.close()
 
-@payment.post("/payment/add")
-def add_payment(pay: InputPayment, req: Request):
+def payment_notification(amount, affected_month, registered_at):
+    """Texto del mensaje que recibe el alumno cuando se le registra un pago."""
+    month_str = affected_month.strftime("%B de %Y")
+    payment_date_str = registered_at.strftime('%d/%m/%Y a las %H:%M')
+    return (f"Se ha registrado un pago de ${amount} "
+            f"correspondiente al mes de {month_str}. "
+            f"Fecha de registro: {payment_date_str}.")
+
+
+# Carga masiva de pagos (archivos de conciliación bancaria).
+# Columnas obligatorias del CSV, filas por lote de INSERT y máximo de filas por archivo.
+PAYMENT_INGEST_COLUMNS = ("id_user", "id_career", "amount", "affected_month")
+PAYMENT_INGEST_CHUNK = int(os.getenv("PAYMENT_INGEST_CHUNK", "1000"))
+PAYMENT_INGEST_MAX_ROWS = int(os.getenv("PAYMENT_INGEST_MAX_ROWS", "100000"))
+
+
+class PaymentIngestError(Exception):
+    """Error que invalida el archivo completo (encabezado, codificación o tamaño), no una fila."""
+
+
+def parse_payment_row(fields):
     """
-    Registra un nuevo pago y envía una notificación al usuario.
-    Requiere permisos de administrador.
+    Convierte una fila del CSV en (id_user, id_career, amount, affected_month).
+    El mes pagado puede venir como YYYY-MM-DD o YYYY-MM (se toma el día 1). Lanza ValueError con el motivo.
+    """
+    try:
+        id_user, id_career, amount = int(fields["id_user"]), int(fields["id_career"]), int(fields["amount"])
+    except (TypeError, ValueError):
+        raise ValueError("id_user, id_career y amount deben ser números enteros.")
+    if amount <= 0:
+        raise ValueError("El monto debe ser mayor que cero.")
+    month = (fields["affected_month"] or "").strip()
+    try:
+        affected_month = datetime.strptime(month, "%Y-%m-%d" if len(month) > 7 else "%Y-%m").date()
+    except ValueError:
+        raise ValueError(f"Mes pagado inválido: '{month}'. Debe ser YYYY-MM-DD o YYYY-MM.")
+    return id_user, id_career, amount, affected_month
+
+
+def read_payment_rows(reader, size):
+    """
+    Lee del CSV hasta `size` filas y las convierte con `parse_payment_row`. Devuelve una lista de
+    (número de línea, fila convertida o el ValueError con el motivo), vacía al terminar el archivo.
+    Es código bloqueante (lee el archivo y procesa cada fila): `ingest_payments` lo corre en un hilo aparte.
+    """
+    rows = []
+    for fields in itertools.islice(reader, size):
+        if reader.line_num > PAYMENT_INGEST_MAX_ROWS + 1:
+            raise PaymentIngestError(f"El archivo supera el máximo de {PAYMENT_INGEST_MAX_ROWS} filas.")
+        try:
+            rows.append((reader.line_num, parse_payment_row(fields)))
+        except ValueError as e:
+            rows.append((reader.line_num, e))
+    return rows
+
+
+async def ingest_payments(lines, db_session, sender_id, dry_run=False, created_messages=None):
+    """
+    Registra los pagos de un archivo CSV (id_user,id_career,amount,affected_month) y notifica a cada alumno,
+    en una sola transacción. `lines` es cualquier iterable de líneas (un archivo abierto): se lee fila por fila,
+    sin cargar el archivo completo. La lectura y la conversión de las filas se hacen de a lotes en un hilo
+    aparte, para no bloquear el event loop (ni las demás peticiones, ni el canal de mensajes en tiempo real).
+
+    - Los IDs de usuario y de carrera se validan contra conjuntos cargados una sola vez al principio,
+      no con una consulta por fila.
+    - Las filas válidas se acumulan en lotes de PAYMENT_INGEST_CHUNK. Por cada lote, una consulta detecta
+      los pagos ya registrados (mismo alumno, carrera, mes y monto) y dos INSERT de varias filas registran
+      los pagos y sus mensajes. Los duplicados, del archivo o de la base, se informan y no se registran:
+      volver a cargar el mismo extracto no duplica pagos.
+    - Con `dry_run` se valida todo pero no se registra nada.
+    - Si se pasa la lista `created_messages`, se le agregan los mensajes creados, para avisarlos por el
+      canal en tiempo real después del commit.
+
+    Devuelve el informe {"processed", "inserted", "duplicates", "errors", "results"}, con una entrada por
+    fila (número de línea del archivo; la 1 es el encabezado). Lanza PaymentIngestError si el archivo no
+    se puede procesar.
+    """
+    reader = csv.DictReader(lines)
+    try:
+        # Leer el encabezado también lee el archivo.
+        fieldnames = await run_in_threadpool(lambda: reader.fieldnames)
+        missing = [c for c in PAYMENT_INGEST_COLUMNS if c not in (fieldnames or [])]
+    except UnicodeDecodeError:
+        raise PaymentIngestError("El archivo debe estar codificado en UTF-8.")
+    if missing:
+        raise PaymentIngestError(f"Faltan columnas en el encabezado: {', '.join(missing)}.")
+
+    user_ids = set((await db_session.scalars(select(User.id))).all())
+    career_ids = set((await db_session.scalars(select(Career.id))).all())
+    first_line = {}
+    results = []
+    chunk = []
+
+    async def flush(chunk):
+        keys = {row for _, row in chunk}
+        existing = set((await db_session.execute(
+            select(Payment.id_user, Payment.id_career, Payment.amount, Payment.affected_month)
+            .where(tuple_(Payment.id_user, Payment.id_career, Payment.affected_month)
+                   .in_([(u, c, m) for u, c, _, m in keys]))
+        )).tuples().all())
+        new_rows = []
+        for line, row in chunk:
+            if row in existing:
+                results.append({"row": line, "status": "duplicate", "error": "El pago ya está registrado."})
+            elif row in first_line:
+                results.append({"row": line, "status": "duplicate", "error": f"El pago se repite en la línea {first_line[row]}."})
+            else:
+                first_line[row] = line
+                new_rows.append((line, row))
+        if not new_rows:
+            return
+        if dry_run:
+            results.extend({"row": line, "status": "valid"} for line, _ in new_rows)
+            return
+        registered_at = datetime.now()
+        payment_ids = (await db_session.scalars(
+            insert(Payment).returning(Payment.id, sort_by_parameter_order=True),
+            [{"id_user": u, "id_career": c, "amount": a, "affected_month": m, "created_at": registered_at}
+             for _, (u, c, a, m) in new_rows]
+        )).all()
+        messages = [{"sender_id": sender_id, "recipient_id": u, "content": payment_notification(a, m, registered_at)}
+                    for _, (u, c, a, m) in new_rows]
+        if created_messages is None:
+            await db_session.execute(insert(Message), messages)
+        else:
+            created_messages.extend((await db_session.scalars(insert(Message).returning(Message), messages)).all())
+        results.extend({"row": line, "status": "inserted", "payment_id": payment_id}
+                       for (line, _), payment_id in zip(new_rows, payment_ids))
+
+    try:
+        while batch := await run_in_threadpool(read_payment_rows, reader, PAYMENT_INGEST_CHUNK):
+            for line, row in batch:
+                if isinstance(row, ValueError):
+                    results.append({"row": line, "status": "error", "error": str(row)})
+                elif row[0] not in user_ids:
+                    results.append({"row": line, "status": "error", "error": f"El alumno con ID {row[0]} no existe."})
+                elif row[1] not in career_ids:
+                    results.append({"row": line, "status": "error", "error": f"La carrera con ID {row[1]} no existe."})
+                else:
+                    chunk.append((line, row))
+                    if len(chunk) >= PAYMENT_INGEST_CHUNK:
+                        await flush(chunk)
+                        chunk = []
+        if chunk:
+            await flush(chunk)
+    except UnicodeDecodeError:
+        raise PaymentIngestError("El archivo debe estar codificado en UTF-8.")
+    except csv.Error as e:
+        raise PaymentIngestError(f"CSV inválido en la línea {reader.line_num}: {e}")
+
+    results.sort(key=lambda result: result["row"])
+    count = lambda status: sum(1 for result in results if result["status"] == status)
+    return {
+        "processed": len(results),
+        "inserted": count("inserted"),
+        "valid": count("valid"),
+        "duplicates": count("duplicate"),
+        "errors": count("error"),
+        "results": results,
+    }
+
+
+@payment.post("/payment/ingest")
+async def ingest_payments_file(file: UploadFile = File(...), dry_run: bool = False, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Carga masiva de pagos desde un archivo CSV de conciliación bancaria, con encabezado:
+    id_user,id_career,amount,affected_month
+    Solo accesible por administradores; los mensajes de aviso a los alumnos salen a su nombre.
+    Con `dry_run=true` solo valida el archivo. La respuesta es el informe de `ingest_payments`, con el
+    resultado de cada fila. Lo mismo se puede hacer por consola con `python ingest_payments.py`.
     """
+    # El archivo subido se lee por partes desde el hilo de `ingest_payments`, no desde el event loop.
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    created_messages = []
     try:
-        token_data = Security.verify_token(req.headers)
-        if token_data.get("role") != "administrador":
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes permiso para registrar pagos.")
-        admin_sender_id = token_data.get("user_id")
+        report = await ingest_payments(lines, db_session, admin.id, dry_run=dry_run, created_messages=created_messages)
+        if dry_run:
+            await db_session.rollback()
+        else:
+            await db_session.commit()
+            message_broker.publish(created_messages)
+    except PaymentIngestError as e:
+        await db_session.rollback()
+        return JSONResponse(status_code=400, content={"message": str(e)})
     except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido o expirado.")
+        await db_session.rollback()
+        traceback.print_exc()
+        return JSONResponse(status_code=500, content={"message": "Error interno al registrar los pagos."})
+
+    if dry_run:
+        message = f"Validación completa: {report['valid']} pagos válidos, {report['duplicates']} duplicados, {report['errors']} con errores."
+    else:
+        message = f"Pagos registrados: {report['inserted']}. Duplicados: {report['duplicates']}. Con errores: {report['errors']}."
+    return JSONResponse(status_code=201 if report["inserted"] else 200, content={"message": message, **report})
+
+
+@payment.post("/payment/add")
+async def add_payment(pay: InputPayment, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Registra un nuevo pago y envía una notificación al usuario.
+    Requiere permisos de administrador (verificados por `require_admin`, que también rechaza tokens revocados).
+    """
+    admin_sender_id = admin.id
 
-    db_session = session
     try:
-        user_recipient = db_session.query(User).options(joinedload(User.userdetail)).filter(User.id == pay.id_user).first()
+        user_recipient = await db_session.scalar(select(User).options(joinedload(User.userdetail)).where(User.id == pay.id_user))
         if not user_recipient:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"El alumno con ID {pay.id_user} no existe.")
 
@@ -86,111 +603,71 @@ def add_payment(pay: InputPayment, req: Request):
         )
         db_session.add(new_payment)
         
-        month_str = affected_date_obj.strftime("%B de %Y")
-        payment_date_str = datetime.now().strftime('%d/%m/%Y a las %H:%M')
-        content = (f"Se ha registrado un pago de ${new_payment.amount} "
-                   f"correspondiente al mes de {month_str}. "
-                   f"Fecha de registro: {payment_date_str}.")
-        
+        content = payment_notification(new_payment.amount, affected_date_obj, datetime.now())
         new_message = Message(sender_id=admin_sender_id, recipient_id=pay.id_user, content=content)
         db_session.add(new_message)
         
-        db_session.commit()
+        await db_session.commit()
+        message_broker.publish([new_message])
 
         res = f"Pago para el alumno {user_recipient.userdetail.first_name} guardado y notificado con éxito."
         return JSONResponse(status_code=201, content={"message": res})
 
     except HTTPException as http_ex:
-        db_session.rollback()
+        await db_session.rollback()
         raise http_ex
     except Exception as e:
-        db_session.rollback()
+        await db_session.rollback()
         print(f"Error detallado en backend: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor al procesar el pago.")
-    finally:
-        db_session.close()
 
 @payment.get("/payment/{payment_id}")
-def get_payment_by_id(payment_id: int, authorization: str | None = Header(default=None)):
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data:
-        return JSONResponse(status_code=401, content={"message": "Token inválido."})
-
-    db_session = session
-    try:
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
-
-        payment_data = db_session.query(Payment).filter(Payment.id == payment_id).first()
-        if not payment_data:
-            return JSONResponse(status_code=404, content={"message": "Pago no encontrado."})
+async def get_payment_by_id(payment_id: int, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
+    payment_data = await db_session.scalar(select(Payment).where(Payment.id == payment_id))
+    if not payment_data:
+        return JSONResponse(status_code=404, content={"message": "Pago no encontrado."})
 
-        return {
-            "id": payment_data.id,
-            "id_user": payment_data.id_user,
-            "id_career": payment_data.id_career,
-            "amount": payment_data.amount,
-            "affected_month": payment_data.affected_month.strftime('%Y-%m-%d')
-        }
-    finally:
-        db_session.close()
+    return {
+        "id": payment_data.id,
+        "id_user": payment_data.id_user,
+        "id_career": payment_data.id_career,
+        "amount": payment_data.amount,
+        "affected_month": payment_data.affected_month.strftime('%Y-%m-%d')
+    }
 
 @payment.put("/payment/update/{payment_id}")
-def update_payment(payment_id: int, payment_update: InputPayment, authorization: str | None = Header(default=None)):
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data:
-        return JSONResponse(status_code=401, content={"message": "Token inválido."})
-        
-    db_session = session
+async def update_payment(payment_id: int, payment_update: InputPayment, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     try:
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
-
-        payment_to_update = db_session.query(Payment).filter(Payment.id == payment_id).first()
+        payment_to_update = await db_session.scalar(select(Payment).where(Payment.id == payment_id))
         if not payment_to_update:
             return JSONResponse(status_code=404, content={"message": "Pago no encontrado."})
 
         payment_to_update.id_user = payment_update.id_user
         payment_to_update.id_career = payment_update.id_career
         payment_to_update.amount = payment_update.amount
-        payment_to_update.affected_month = payment_update.affected_month
+        # asyncpg exige un objeto date (no acepta el texto 'YYYY-MM-DD' como hacía psycopg2).
+        try:
+            payment_to_update.affected_month = datetime.strptime(payment_update.affected_month, '%Y-%m-%d').date()
+        except ValueError:
+            return JSONResponse(status_code=400, content={"message": "El formato de la fecha es inválido. Debe ser YYYY-MM-DD."})
         
-        db_session.commit()
+        await db_session.commit()
         return JSONResponse(status_code=200, content={"message": "Pago actualizado con éxito."})
     except Exception as e:
-        db_session.rollback()
+        await db_session.rollback()
         return JSONResponse(status_code=500, content={"message": f"Error interno: {e}"})
-    finally:
-        db_session.close()
 
 @payment.delete("/payment/delete/{payment_id}")
-def delete_payment(payment_id: int, authorization: str | None = Header(default=None)):
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    
-    if "username" not in token_data:
-        return JSONResponse(status_code=401, content={"message": "Token inválido."})
-
-    db_session = session
+async def delete_payment(payment_id: int, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     try:
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
-
-        payment_to_delete = db_session.query(Payment).filter(Payment.id == payment_id).first()
+        payment_to_delete = await db_session.scalar(select(Payment).where(Payment.id == payment_id))
         if not payment_to_delete:
             return JSONResponse(status_code=404, content={"message": "Pago no encontrado."})
 
-        db_session.delete(payment_to_delete)
-        db_session.commit()
+        await db_session.delete(payment_to_delete)
+        await db_session.commit()
         return JSONResponse(status_code=200, content={"message": "Pago eliminado con éxito."})
 
     except Exception as e:
-        db_session.rollback()
-        return JSONResponse(status_code=500, content={"message": f"Error al eliminar el pago: {e}"})
-    finally:
-        db_session.close()
\ No newline at end of file
+        await db_session.rollback()
+        return JSONResponse(status_code=500, content={"message": f"Error al eliminar el pago: {e}"})
\ No newline at end of file
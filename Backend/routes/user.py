@@ -1,64 +1,129 @@
 from sqlalchemy.exc import IntegrityError  
 # clase de excepción específica que se lanza cuando se viola una restricción de integridad en la base de datos (p. ej., insertar un valor duplicado en una columna única)
 # muy útil para manejar errores de bases de datos de manera controlada 
-from fastapi import APIRouter, Request, Header, File, UploadFile
+from fastapi import APIRouter, Request, Header, File, UploadFile, Depends, Query
+from starlette.concurrency import run_in_threadpool   # ejecuta código bloqueante (como escribir un archivo) en un hilo aparte
 # APIRouter (clase de FastAPI que permite organizar la API en módulos separados y reutilizables, agrupa rutas relacionadas)
 # Request (representa la solicitud HTTP entrante, permite acceder a cuerpo, encabezado, parámetros de ruta, etc.)
 # Header (función para declarar parámetros de encabezado HTTP)
 # File (función para declarar que un parámetro de ruta o de cuerpo es un archivo)
 # UploadFile (clase que proporciona una interfaz para manejar archivos subidos)
-from fastapi.responses import JSONResponse   # clase que permite devolver respuestas HTTP con un cuerpo JSON de forma explícita
-from models.modelo import session, User, UserDetail, PivoteUserCareer, InputUser, InputLogin, InputUserAddCareer, InputUserUpdate, InputPasswordChange, InputAdminPasswordReset
-# importa una sesión, modelos de sqlalchemy y modelos de pydantic
-from sqlalchemy.orm import joinedload, subqueryload   # técnicas de carga ansiosa (eager loading)
+# Query (función para declarar parámetros de consulta con validaciones, p. ej. un mínimo y un máximo)
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError   # error de validación de los modelos de Pydantic (filas inválidas del CSV)
+# JSONResponse (clase que permite devolver respuestas HTTP con un cuerpo JSON de forma explícita)
+# StreamingResponse (envía el cuerpo por partes, a medida que lo produce un generador)
+from models.modelo import User, UserDetail, Career, PivoteUserCareer, InputUser, InputUserImport, InputLogin, InputUserAddCareer, InputUserUpdate, InputPasswordChange, InputAdminPasswordReset
+# importa modelos de sqlalchemy y modelos de pydantic
+from configs.async_db import get_async_db, AsyncSessionLocal   # dependencia que entrega una sesión asíncrona nueva por petición, y la fábrica de sesiones
+from sqlalchemy import select, insert, func, or_, any_, literal_column   # construye las consultas SELECT (estilo SQLAlchemy 2.0, necesario con sesiones asíncronas)
+from sqlalchemy.ext.asyncio import AsyncSession   # tipo de la sesión asíncrona
+from sqlalchemy.orm import joinedload, selectinload, contains_eager   # técnicas de carga ansiosa (eager loading)
 # joinedload (Permite cargar datos de relaciones (por ejemplo, los UserDetail de un User) en la misma consulta SQL utilizando un JOIN)
 # Esto evita el problema de las "N+1 consultas" donde se haría una consulta separada para cada objeto relacionado.
-# subqueryload (Carga los datos de las relaciones utilizando una subconsulta separada en lugar de un JOIN principal)
-# alternativa a joinedload 
+# selectinload (Carga los datos de las relaciones con una segunda consulta "WHERE id IN (...)" en lugar de un JOIN principal)
+# alternativa a joinedload para colecciones.
+# contains_eager (usa el JOIN que la consulta ya hace para filtrar, para cargar también la relación sin agregar otro)
+# Con sesiones asíncronas no existe el lazy loading implícito,
+# así que toda relación que se lea debe cargarse de antemano con una de estas opciones.
 from auth.security import Security   # importa la clase Security
+from auth.principal import Principal, get_principal, require_admin, invalidate_principal, revoke_user   # dependencia de autorización compartida y su caché
 import shutil  # módulo de utilidad de alto nivel para operaciones de archivos y directorios (para copiar, mover, eliminar archivos o directorios, etc.)
 import os   # módulo proporciona una forma de interactuar con el sistema operativo (operaciones como crear un directorio, listar el contenido de un directorio, etc.)
 import uuid # módulo para generar Identificadores Únicos Universales (UUIDs)(muy útiles para generar nombres de archivo únicos para los archivos subidos, evitando colisiones de nombres)
+import csv   # escritura de archivos CSV (para la exportación de usuarios)
+import io   # buffers de texto en memoria donde se escribe cada lote del CSV
+import json   # serialización de cada línea de la exportación NDJSON
+import unicodedata   # normalización de texto Unicode (para quitar los acentos del texto de búsqueda)
+import re   # expresiones regulares (para separar en palabras el texto de búsqueda)
 import traceback   # muy útil para la depuración, ya que proporciona información detallada sobre dónde ocurrió un error en el código
 
 user = APIRouter()
 
 
 @user.get("/")
-def helloUser():
+async def helloUser():
     return "Hello User!!!"
 
-@user.get("/users/all")   
-def getAllUsers(req: Request):   
+# Tamaño de página de /users/all: el predeterminado y el máximo que puede pedir el cliente.
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "50"))
+USERS_MAX_PAGE_SIZE = int(os.getenv("USERS_MAX_PAGE_SIZE", "500"))
+
+
+def filter_users(query, type=None, career=None, name=None):
+    """
+    Agrega a una consulta de User (que ya hace JOIN con UserDetail) los filtros del listado de usuarios:
+    - type: rol exacto ("alumno", "profesor", "administrador"). Usa el índice ix_userdetail_type.
+    - career: ID de carrera en la que está inscrito. Se resuelve con un EXISTS sobre el índice único (id_user, id_career).
+    - name: prefijo del nombre o del apellido, sin distinguir mayúsculas.
     """
-    Endpoint para obtener la lista de todos los usuarios registrados.
-    Requiere autenticación JWT. Devuelve los detalles del usuario y las carreras asociadas.
+    if type:
+        query = query.where(UserDetail.type == type)
+    if career is not None:
+        query = query.where(
+            select(PivoteUserCareer.id)
+            .where(PivoteUserCareer.id_user == User.id, PivoteUserCareer.id_career == career)
+            .exists()
+        )
+    if name:
+        # Se escapan los comodines de LIKE para que el texto se busque literalmente.
+        prefix = name.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = query.where(or_(
+            func.lower(UserDetail.first_name).like(prefix, escape="\\"),
+            func.lower(UserDetail.last_name).like(prefix, escape="\\"),
+        ))
+    return query
+
+
+@user.get("/users/all")
+async def getAllUsers(
+    type: str | None = None,
+    career: int | None = None,
+    name: str | None = None,
+    limit: int | None = Query(default=None, ge=1, le=USERS_MAX_PAGE_SIZE),
+    cursor: int | None = None,
+    principal: Principal = Depends(get_principal),
+    db_session: AsyncSession = Depends(get_async_db),
+):
+    """
+    Endpoint para obtener la lista de usuarios registrados.
+    Requiere autenticación JWT (la verifica la dependencia `get_principal`, que también rechaza tokens revocados). Devuelve los detalles del usuario y las carreras asociadas.
+
+    Filtros opcionales (se aplican en la base de datos): `type`, `career` (ID) y `name` (prefijo).
+
+    Paginación por cursor (keyset): si se envía `limit` o `cursor` la respuesta es una página
+    {"users": [...], "next_cursor": ...}. Para pedir la siguiente se envía `cursor=next_cursor`;
+    cuando no quedan más usuarios `next_cursor` es null. El cursor es el último ID devuelto y la
+    consulta pide "IDs mayores que el cursor", así que cada página cuesta lo mismo sin importar
+    cuántas se hayan recorrido antes (a diferencia de OFFSET, que recorre y descarta las anteriores).
+    Sin `limit` ni `cursor` se devuelve la lista completa (filtrada), como antes.
     """
     try:
-        # Verifica el token de autorización presente en los encabezados de la solicitud.
-        # Si el token no es válido (expirado, firma inválida, etc.),
-        # Security.verify_token devolverá un diccionario de error.
-        has_access = Security.verify_token(req.headers)
-
-        # Si el payload decodificado del token no contiene la clave "iat" (issued at),
-        # significa que la verificación del token falló.
-        if "iat" not in has_access:
-            # Devuelve una respuesta JSON con un código de estado 401 (Unauthorized)
-            # y el mensaje de error proporcionado por Security.verify_token.
-            return JSONResponse(status_code=401, content=has_access)
-        
-        # Realiza una consulta a la base de datos para obtener todos los objetos User.
-        # joinedload(User.userdetail): Carga ansiosamente los detalles del usuario (UserDetail)
-        # utilizando un JOIN en la misma consulta para evitar el problema N+1.
-        # subqueryload(User.pivoteusercareer).joinedload(PivoteUserCareer.career):
-        # Carga ansiosamente las relaciones de carrera del usuario. Primero, carga la tabla pivote
-        # (PivoteUserCareer) con una subconsulta, y luego carga los detalles de la carrera (Career)
-        # mediante un JOIN dentro de esa subconsulta.
-        users_query = session.query(User).options(
-            joinedload(User.userdetail),
-            subqueryload(User.pivoteusercareer).joinedload(PivoteUserCareer.career)
-        ).all()
-        
+        paginated = limit is not None or cursor is not None
+        page_size = limit or USERS_PAGE_SIZE
+
+        # El JOIN con UserDetail sirve para filtrar y, con contains_eager, también para cargar el detalle
+        # en la misma consulta (evita el problema N+1).
+        # selectinload(User.pivoteusercareer).joinedload(PivoteUserCareer.career):
+        # Carga ansiosamente las relaciones de carrera de los usuarios de la página con una segunda consulta
+        # (WHERE id_user IN (...)), y los detalles de la carrera (Career) mediante un JOIN dentro de esa consulta.
+        query = select(User).join(User.userdetail).options(
+            contains_eager(User.userdetail),
+            selectinload(User.pivoteusercareer).joinedload(PivoteUserCareer.career)
+        )
+        query = filter_users(query, type=type, career=career, name=name).order_by(User.id)
+        if cursor is not None:
+            query = query.where(User.id > cursor)
+        if paginated:
+            # Se pide un usuario de más para saber si hay otra página sin hacer un COUNT.
+            query = query.limit(page_size + 1)
+
+        users_query = (await db_session.scalars(query)).all()
+        next_cursor = None
+        if paginated and len(users_query) > page_size:
+            users_query = users_query[:page_size]
+            next_cursor = users_query[-1].id
+
         result_list = []
         # Itera sobre cada objeto User obtenido de la consulta.
         for user_item in users_query:
@@ -78,7 +143,9 @@ def getAllUsers(req: Request):
                 "careers": user_careers
             })
         # Devuelve una respuesta JSON con un código de estado 200 (OK)
-        # y la lista de usuarios formateada.
+        # y la página (o la lista completa) de usuarios formateada.
+        if paginated:
+            return JSONResponse(status_code=200, content={"users": result_list, "next_cursor": next_cursor})
         return JSONResponse(status_code=200, content=result_list)
 
     except Exception as ex:
@@ -87,37 +154,160 @@ def getAllUsers(req: Request):
         # Devuelve una respuesta JSON con un código de estado 500 (Internal Server Error)
         # y un mensaje genérico de error.
         return JSONResponse(status_code=500, content={"message": "Error interno al obtener los usuarios"})
-    finally:
-        # Asegura que la sesión de la base de datos se cierre, liberando los recursos de conexión.
-        session.close()
 
-@user.post("/users/add")   
-def create_user(us: InputUser, authorization: str | None = Header(default=None)):
+SEARCH_MAX_RESULTS = 100
+# Candidatos que se toman de cada índice, los más relevantes primero, antes de unir las dos tablas.
+# Acota el costo de las búsquedas muy amplias (p. ej. "a", que coincide con casi todos): las coincidencias
+# que quedan afuera son las de menor relevancia, no las que el índice haya dado al final.
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "200"))
+
+
+def search_users_query(q, limit):
     """
-    Endpoint para crear un nuevo usuario.
-    Requiere autenticación JWT y que el usuario que realiza la solicitud sea un 'administrador'.
+    Arma la consulta de búsqueda de usuarios, o devuelve None si el texto no tiene nada buscable.
+    Cada palabra del texto se busca como prefijo ("lop" encuentra "López") y deben aparecer todas.
+    Los candidatos salen de los índices GIN sobre los vectores guardados (detalle por un lado, nombre de
+    usuario por el otro), ya ordenados por relevancia (ts_rank); entre ellos se eligen los `limit` mejores.
+    """
+    # Sin acentos, como en el índice, y solo letras y números: así el texto armado es siempre un tsquery válido.
+    folded = "".join(c for c in unicodedata.normalize("NFKD", q.lower()) if not unicodedata.combining(c))
+    terms = re.findall(r"[^\W_]+", folded)
+    if not terms:
+        return None
+    ts_query = func.to_tsquery(literal_column("'simple'::regconfig"), " & ".join(f"{term}:*" for term in terms))
+    # Las palabras completas (sin prefijo) suman relevancia: "gomez" pone a "Gómez" antes que a "Gomezano",
+    # que para ts_rank con prefijos valen lo mismo.
+    exact_query = func.to_tsquery(literal_column("'simple'::regconfig"), " | ".join(terms))
+
+    def relevance(vector):
+        return func.ts_rank(vector, ts_query) + func.ts_rank(vector, exact_query)
+
+    # ARRAY(subconsulta) se evalúa una sola vez (InitPlan) y luego se busca "= ANY(...)" con los índices de
+    # "user" (ix_user_id_userdetail y la clave primaria), en lugar de recorrer la tabla para unirla.
+    # Cada subconsulta ordena todas sus coincidencias por relevancia (con el vector guardado no hay que
+    # recalcularlo por fila) antes de quedarse con las SEARCH_CANDIDATES mejores.
+    matching_details = func.array(
+        select(UserDetail.id).where(UserDetail.search_vector.op("@@")(ts_query))
+        .order_by(relevance(UserDetail.search_vector).desc(), UserDetail.id).limit(SEARCH_CANDIDATES).scalar_subquery()
+    )
+    matching_users = func.array(
+        select(User.id).where(User.search_vector.op("@@")(ts_query))
+        .order_by(relevance(User.search_vector).desc(), User.id).limit(SEARCH_CANDIDATES).scalar_subquery()
+    )
+    rank = relevance(UserDetail.search_vector.op("||")(User.search_vector))
+    return (
+        select(User, rank.label("rank"))
+        .join(User.userdetail)
+        .options(contains_eager(User.userdetail))
+        .where(or_(User.id_userdetail == any_(matching_details), User.id == any_(matching_users)))
+        .order_by(rank.desc(), User.id)
+        .limit(limit)
+    )
+
+
+@user.get("/users/search")
+async def search_users(
+    q: str,
+    limit: int = Query(default=20, ge=1, le=SEARCH_MAX_RESULTS),
+    admin: Principal = Depends(require_admin),
+    db_session: AsyncSession = Depends(get_async_db),
+):
+    """
+    Busca usuarios por nombre, apellido, email, DNI o nombre de usuario.
+    Solo accesible por administradores. Devuelve como máximo `limit` resultados, los más relevantes primero.
+    Reemplaza descargar /users/all y filtrar en el cliente: la búsqueda se resuelve con índices
+    de texto completo, así que tarda lo mismo con cien usuarios que con cien mil.
     """
-    # Construye un diccionario de encabezados para pasarlo a la función de verificación del token.
-    headers = {"authorization": authorization}
-    # Verifica la validez del token JWT proporcionado en los encabezados.
-    token_data = Security.verify_token(headers)
+    try:
+        query = search_users_query(q, limit)
+        if query is None:
+            return JSONResponse(status_code=200, content=[])
+        rows = (await db_session.execute(query)).all()
+        result_list = [{
+            "id": user_item.id,
+            "username": user_item.username,
+            "first_name": user_item.userdetail.first_name,
+            "last_name": user_item.userdetail.last_name,
+            "dni": user_item.userdetail.dni,
+            "type": user_item.userdetail.type,
+            "email": user_item.userdetail.email,
+        } for user_item, _rank in rows]
+        return JSONResponse(status_code=200, content=result_list)
+    except Exception:
+        traceback.print_exc()
+        return JSONResponse(status_code=500, content={"message": "Error interno al buscar usuarios."})
 
-    # Si el payload del token no contiene la clave 'username', significa que el token es inválido o falta.
-    if "username" not in token_data:
-        # Retorna un error de no autorizado.
-        return JSONResponse(status_code=401, content={"message": "No estás autorizado o el token es inválido."})
+# Cantidad de filas que se traen de la base de datos (y se escriben) por vez al exportar.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_COLUMNS = ["id", "username", "first_name", "last_name", "dni", "type", "email", "careers"]
 
-    # Extrae el nombre de usuario del token decodificado para identificar al usuario que hace la solicitud.
-    requesting_user_username = token_data["username"]
-    # Consulta la base de datos para obtener los detalles del usuario que está haciendo la solicitud.
-    # joinedload(User.userdetail) carga ansiosamente los detalles del usuario para evitar consultas adicionales.
-    requesting_user = session.query(User).filter(User.username == requesting_user_username).options(joinedload(User.userdetail)).first()
 
-    # Verifica si el usuario que solicita la creación existe y si su tipo de usuario es 'administrador'.
-    # Si no cumple alguna de estas condiciones, se deniega el permiso.
-    if not requesting_user or requesting_user.userdetail.type != 'administrador':
-        return JSONResponse(status_code=403, content={"message": "Permiso denegado. Se requiere rol de administrador."})
+def export_users_query():
+    """
+    Una fila por usuario, ordenadas por ID, con sus carreras ya agregadas en un arreglo.
+    Las carreras se obtienen con una subconsulta por usuario (usa el índice único (id_user, id_career)),
+    así PostgreSQL puede ir entregando filas a medida que recorre la clave primaria, sin agrupar toda la tabla.
+    """
+    careers = func.array(
+        select(Career.name)
+        .join(PivoteUserCareer, PivoteUserCareer.id_career == Career.id)
+        .where(PivoteUserCareer.id_user == User.id)
+        .order_by(Career.name)
+        .scalar_subquery()
+    )
+    return (
+        select(User.id, User.username, UserDetail.first_name, UserDetail.last_name, UserDetail.dni,
+               UserDetail.type, UserDetail.email, careers.label("careers"))
+        .join(User.userdetail)
+        .order_by(User.id)
+    )
+
+
+async def export_rows(format):
+    """
+    Generador asíncrono que produce la exportación por partes.
+    Usa su propia sesión (la respuesta se sigue enviando después de que la ruta retorna) y `stream()`,
+    que con asyncpg abre un cursor del lado del servidor: en memoria solo hay un lote de filas a la vez,
+    sea cual sea la cantidad de usuarios.
+    """
+    async with AsyncSessionLocal() as session:
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            yield buffer.getvalue()
+        result = await session.stream(export_users_query().execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in rows:
+                    writer.writerow([*row[:-1], "; ".join(row.careers)])
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps({**row._asdict(), "careers": list(row.careers)}, ensure_ascii=False) + "\n" for row in rows)
+
+
+@user.get("/users/export")
+async def export_users(format: str = Query(default="csv", pattern="^(csv|ndjson)$"), admin: Principal = Depends(require_admin)):
+    """
+    Exporta todos los usuarios con sus carreras, en CSV (por defecto) o NDJSON (un objeto JSON por línea).
+    Solo accesible por administradores.
+    La respuesta se envía mientras se va leyendo la base de datos, así que el uso de memoria
+    no depende del tamaño del padrón.
+    """
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="usuarios.{format}"'}
+    return StreamingResponse(export_rows(format), media_type=media_type, headers=headers)
 
+@user.post("/users/add")
+async def create_user(us: InputUser, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Endpoint para crear un nuevo usuario.
+    Requiere autenticación JWT y que el usuario que realiza la solicitud sea un 'administrador'.
+    La dependencia `require_admin` verifica el token y el rol (usando el caché de principales),
+    así que si la petición llega hasta aquí el solicitante ya es un administrador.
+    """
     try:
         # Crea una nueva instancia de User con el nombre de usuario y contraseña proporcionados.
         newUser = User(us.username, us.password)
@@ -126,48 +316,155 @@ def create_user(us: InputUser, authorization: str | None = Header(default=None))
         # Asocia los detalles del usuario con el nuevo usuario.
         newUser.userdetail = newUserDetail
         # Añade el nuevo usuario (y sus detalles, gracias a la relación) a la sesión de la base de datos.
-        session.add(newUser)
+        db_session.add(newUser)
         # Confirma la transacción, guardando el nuevo usuario en la base de datos.
-        session.commit()
+        await db_session.commit()
         # Retorna una respuesta de éxito con el código de estado 201 (Created).
         return JSONResponse(status_code=201, content={"message": "Usuario creado con éxito!"})
     
     # --- INICIO DE LA CORRECCIÓN ---
     except IntegrityError:
         # Esta excepción se dispara si se viola una restricción UNIQUE (username o email)
-        session.rollback()
+        await db_session.rollback()
         return JSONResponse(status_code=409, content={"message": "El nombre de usuario o el email ya existen."})
     except Exception as ex:
         # El resto de los errores inesperados
-        session.rollback()
+        await db_session.rollback()
         print("Error ---->> ", ex)
         return JSONResponse(status_code=500, content={"message": "Error interno al crear el usuario."})
     # --- FIN DE LA CORRECCIÓN ---
-    finally:
-        session.close()
+
+# Roles válidos de un usuario.
+USER_TYPES = ("alumno", "profesor", "administrador")
+# Máximo de filas por importación. Acota el tamaño de la transacción y la cantidad de parámetros de las consultas.
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "10000"))
+
+
+async def import_users(rows, db_session, errors=()):
+    """
+    Importa un lote de usuarios en una sola transacción.
+    `rows` es una lista de (número de fila, InputUserImport); `errors` trae los errores de lectura previos (p. ej. del CSV).
+
+    1. Valida el lote completo: tipo de usuario, carreras existentes y usernames/emails repetidos dentro del lote.
+       Si hay algún error no se importa nada y se devuelven todos los errores juntos.
+    2. Busca con dos consultas los usernames y emails que ya existen. Esas filas se informan como conflictos
+       y se saltean; el resto se importa.
+    3. Inserta los detalles, los usuarios y las inscripciones con INSERT de varias filas (SQLAlchemy agrupa
+       las filas en sentencias "INSERT ... VALUES (...), (...) RETURNING id"), en vez de un INSERT y un commit por usuario.
+    """
+    errors = list(errors)
+    if len(rows) + len(errors) > IMPORT_MAX_ROWS:
+        return JSONResponse(status_code=400, content={"message": f"El lote supera el máximo de {IMPORT_MAX_ROWS} filas."})
+
+    career_ids = {career_id for _, row in rows for career_id in row.careers}
+    existing_careers = set((await db_session.scalars(select(Career.id).where(Career.id.in_(career_ids)))).all()) if career_ids else set()
+    first_row_by_username, first_row_by_email = {}, {}
+    for number, row in rows:
+        if row.type not in USER_TYPES:
+            errors.append({"row": number, "error": f"Tipo de usuario inválido: '{row.type}'."})
+        missing = sorted(set(row.careers) - existing_careers)
+        if missing:
+            errors.append({"row": number, "error": f"No existen las carreras: {missing}."})
+        if row.username in first_row_by_username:
+            errors.append({"row": number, "error": f"El nombre de usuario '{row.username}' se repite en la fila {first_row_by_username[row.username]}."})
+        if row.email in first_row_by_email:
+            errors.append({"row": number, "error": f"El email '{row.email}' se repite en la fila {first_row_by_email[row.email]}."})
+        first_row_by_username.setdefault(row.username, number)
+        first_row_by_email.setdefault(row.email, number)
+    if errors:
+        return JSONResponse(status_code=400, content={"message": "El lote tiene errores. No se importó ningún usuario.", "errors": errors})
+    if not rows:
+        return JSONResponse(status_code=400, content={"message": "El lote está vacío."})
+
+    try:
+        taken_usernames = set((await db_session.scalars(select(User.username).where(User.username.in_(first_row_by_username)))).all())
+        taken_emails = set((await db_session.scalars(select(UserDetail.email).where(UserDetail.email.in_(first_row_by_email)))).all())
+        conflicts, new_rows = [], []
+        for number, row in rows:
+            if row.username in taken_usernames:
+                conflicts.append({"row": number, "username": row.username, "error": "El nombre de usuario ya existe."})
+            elif row.email in taken_emails:
+                conflicts.append({"row": number, "email": row.email, "error": "El email ya existe."})
+            else:
+                new_rows.append(row)
+        if not new_rows:
+            return JSONResponse(status_code=409, content={"message": "Todos los usuarios del lote ya existen.", "imported": 0, "conflicts": conflicts})
+
+        # sort_by_parameter_order garantiza que los IDs devueltos estén en el mismo orden que las filas enviadas.
+        detail_ids = (await db_session.scalars(
+            insert(UserDetail).returning(UserDetail.id, sort_by_parameter_order=True),
+            [{"first_name": r.firstname, "last_name": r.lastname, "dni": r.dni, "type": r.type, "email": r.email} for r in new_rows]
+        )).all()
+        user_ids = (await db_session.scalars(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [{"username": r.username, "password": r.password, "id_userdetail": detail_id} for r, detail_id in zip(new_rows, detail_ids)]
+        )).all()
+        enrollments = [{"id_user": user_id, "id_career": career_id}
+                       for r, user_id in zip(new_rows, user_ids) for career_id in sorted(set(r.careers))]
+        if enrollments:
+            await db_session.execute(insert(PivoteUserCareer), enrollments)
+        await db_session.commit()
+        return JSONResponse(status_code=201, content={
+            "message": f"Usuarios importados: {len(new_rows)}.",
+            "imported": len(new_rows),
+            "enrollments": len(enrollments),
+            "conflicts": conflicts,
+        })
+    except IntegrityError:
+        # Otro proceso registró el mismo username o email entre la verificación y el INSERT.
+        await db_session.rollback()
+        return JSONResponse(status_code=409, content={"message": "Algunos usuarios se registraron mientras se importaba el lote. Vuelve a intentarlo."})
+    except Exception:
+        await db_session.rollback()
+        traceback.print_exc()
+        return JSONResponse(status_code=500, content={"message": "Error interno al importar los usuarios."})
+
+
+@user.post("/users/import")
+async def import_users_json(users: list[InputUserImport], admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Importación masiva de usuarios desde un arreglo JSON (los mismos campos que /users/add más "careers",
+    una lista de IDs de carrera en las que se inscribe a cada usuario). Solo accesible por administradores.
+    Los números de fila de la respuesta empiezan en 1.
+    """
+    return await import_users(list(enumerate(users, start=1)), db_session)
+
+
+@user.post("/users/import/csv")
+async def import_users_csv(file: UploadFile = File(...), admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
+    """
+    Importación masiva de usuarios desde un archivo CSV con encabezado:
+    username,password,firstname,lastname,dni,type,email,careers
+    La columna careers es opcional y lleva los IDs separados por ';'. Solo accesible por administradores.
+    Los números de fila de la respuesta son las líneas del archivo (la 1 es el encabezado).
+    """
+    try:
+        content = (await file.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return JSONResponse(status_code=400, content={"message": "El archivo debe estar codificado en UTF-8."})
+
+    rows, errors = [], []
+    reader = csv.DictReader(io.StringIO(content))
+    for fields in reader:
+        try:
+            careers = [int(c) for c in (fields.pop("careers", None) or "").split(";") if c.strip()]
+            rows.append((reader.line_num, InputUserImport(**fields, careers=careers)))
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            errors.append({"row": reader.line_num, "error": f"Fila inválida: {detail}"})
+        except (ValueError, TypeError):
+            errors.append({"row": reader.line_num, "error": "Fila inválida: columnas o IDs de carrera con formato incorrecto."})
+    return await import_users(rows, db_session, errors)
+
 
 @user.post("/user/upload-photo")
-def upload_profile_photo(authorization: str | None = Header(default=None), file: UploadFile = File(...)):
+async def upload_profile_photo(file: UploadFile = File(...), principal: Principal = Depends(get_principal), db_session: AsyncSession = Depends(get_async_db)):
     """
     Permite a un usuario logueado subir o cambiar su foto de perfil.
+    El usuario es el del token, resuelto por la dependencia `get_principal` (que también rechaza tokens revocados).
     """
-    # Construye un diccionario de encabezados a partir del parámetro 'authorization'.
-    headers = {"authorization": authorization}
-    # Llama al método estático verify_token de la clase Security para decodificar y validar el token JWT.
-    # Si el token es válido, token_data contendrá el payload del token (un diccionario).
-    token_data = Security.verify_token(headers)
-    # Intenta obtener el 'username' del payload del token.
-    username = token_data.get("username")
-
-    # Si 'username' es None (lo que significa que no se encontró en el payload del token, o si es una cadena vacía)
-    # Devuelve una respuesta JSON
-    if not username:
-        return JSONResponse(status_code=401, content={"message": "Token inválido."})
-
-    # Renombra la variable 'session' a 'db_session' para mayor claridad y para evitar posibles confusiones
-    db_session = session
     try:
-        user_to_update = db_session.query(User).options(joinedload(User.userdetail)).filter(User.username == username).first()
+        user_to_update = await db_session.scalar(select(User).options(joinedload(User.userdetail)).where(User.id == principal.id))
         if not user_to_update:
             return JSONResponse(status_code=404, content={"message": "Usuario no encontrado."})
         
@@ -176,33 +473,33 @@ def upload_profile_photo(authorization: str | None = Header(default=None), file:
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         file_path = f"static/profile_pics/{unique_filename}"
         
-        # Guardar el archivo en el servidor
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Guardar el archivo en el servidor (en un hilo aparte para no bloquear el event loop)
+        def save_file():
+            with open(file_path, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer)
+        await run_in_threadpool(save_file)
             
         # Guardar la URL en la base de datos
         # La URL debe ser accesible desde el frontend
         image_url = f"/static/profile_pics/{unique_filename}"
         user_to_update.userdetail.profile_image_url = image_url
-        db_session.commit()
+        await db_session.commit()
 
         return JSONResponse(status_code=200, content={"message": "Foto de perfil actualizada con éxito.", "image_url": image_url})
 
     except Exception as e:
-        db_session.rollback()
+        await db_session.rollback()
         print("--- OCURRIÓ UN ERROR INTERNO DETALLADO ---")
         # Esta línea imprimirá el traceback completo en tu consola de uvicorn
         traceback.print_exc()
         print("-----------------------------------------")
         return JSONResponse(status_code=500, content={"message": f"Error interno: {e}"})
-    finally:
-        db_session.close()
 
 @user.post("/users/login")
-def login_user(us: InputLogin):
+async def login_user(us: InputLogin, db_session: AsyncSession = Depends(get_async_db)):
     try:
         # Buscamos al usuario y cargamos su detalle en la misma consulta
-        user = session.query(User).options(joinedload(User.userdetail)).filter(User.username == us.username).first()
+        user = await db_session.scalar(select(User).options(joinedload(User.userdetail)).where(User.username == us.username))
         
         if user and user.password == us.password:
             tkn = Security.generate_token(user)
@@ -234,47 +531,45 @@ def login_user(us: InputLogin):
     except Exception as ex:
         print("Error ---->> ", ex)
         return JSONResponse(status_code=500, content={"message":"Error interno en el servidor."})
-    finally:
-        session.close()   
 
 @user.post("/user/addcareer")
-def addCareer(ins: InputUserAddCareer, authorization: str | None = Header(default=None)):
+async def addCareer(ins: InputUserAddCareer, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     """
     Inscribe un alumno a una carrera.
     Solo accesible por administradores.
     """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data:
-        return JSONResponse(status_code=401, content={"message": "Token inválido o no proporcionado."})
-    db_session = session
     try:
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado. Se requiere rol de administrador."})
         newInsc = PivoteUserCareer(ins.id_user, ins.id_career)
         db_session.add(newInsc)
-        db_session.commit()
+        await db_session.commit()
+        # Volvemos a leer la inscripción con el alumno y la carrera cargados para armar el mensaje.
+        newInsc = await db_session.scalar(select(PivoteUserCareer).options(
+            joinedload(PivoteUserCareer.user).joinedload(User.userdetail),
+            joinedload(PivoteUserCareer.career)
+        ).where(PivoteUserCareer.id == newInsc.id))
         res = f"{newInsc.user.userdetail.first_name} {newInsc.user.userdetail.last_name} fue inscripto correctamente a {newInsc.career.name}"
         print(res)
         return JSONResponse(status_code=201, content={"message": res})
 
+    except IntegrityError:
+        # El índice único (id_user, id_career) rechaza la inscripción repetida.
+        await db_session.rollback()
+        return JSONResponse(status_code=409, content={"message": "El usuario ya está inscrito en esta carrera."})
     except Exception as ex:
-        db_session.rollback()
+        await db_session.rollback()
         print("Error al inscribir al alumno:", ex)
         return JSONResponse(status_code=500, content={"message": "Error interno al procesar la inscripción."})
-    finally:
-        db_session.close()
 
 @user.get("/user/career/{_username}")
-def get_career_user(_username: str):
+async def get_career_user(_username: str, db_session: AsyncSession = Depends(get_async_db)):
     """
     Endpoint para obtener las carreras asociadas a un usuario específico por su nombre de usuario.
     La ruta incluye un parámetro de ruta '_username' para identificar al usuario.
     """
-    db_session = session
     try:
-        user_found = db_session.query(User).filter(User.username == _username).first()
+        user_found = await db_session.scalar(select(User).options(
+            selectinload(User.pivoteusercareer).joinedload(PivoteUserCareer.career)
+        ).where(User.username == _username))
         if not user_found:
             return JSONResponse(status_code=404, content=[]) # Devuelve array vacío si no se encuentra
         
@@ -283,15 +578,13 @@ def get_career_user(_username: str):
         return user_careers
     except Exception:
         return JSONResponse(status_code=500, content={"message": "Error al traer las carreras del usuario"})
-    finally:
-        db_session.close()
 
 # =================================================================================
 # --- RUTAS DE GESTIÓN DE CARRERAS (Refactorizadas y funcionales) ---
 # =================================================================================
 
 @user.post("/users/{user_id}/careers")
-def assign_career_to_user(user_id: int, career_data: dict, authorization: str | None = Header(default=None)):
+async def assign_career_to_user(user_id: int, career_data: dict, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     """
     Endpoint para asignar una carrera a un usuario específico.
     Requiere autenticación JWT y que el usuario que realiza la solicitud sea un 'administrador'.
@@ -299,66 +592,45 @@ def assign_career_to_user(user_id: int, career_data: dict, authorization: str |
     Args:
         user_id (int): El ID del usuario al que se asignará la carrera.
         career_data (dict): Un diccionario que debe contener el 'id' de la carrera a asignar.
-        authorization (str | None): El token JWT en el encabezado 'Authorization'.
+        admin (Principal): El administrador que hace la petición (resuelto por `require_admin`).
     """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data: return JSONResponse(status_code=401, content={"message": "Token inválido."})
-    
-    db_session = session
     try:
-        # Busca al usuario administrador que está realizando la solicitud por su nombre de usuario del token.
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
-
         career_id = career_data.get("id")
         if not career_id: return JSONResponse(status_code=400, content={"message": "Falta el ID de la carrera."})
 
         # Verifica si el usuario ya está inscrito en esta carrera.
-        existing = db_session.query(PivoteUserCareer).filter_by(id_user=user_id, id_career=career_id).first()
+        existing = await db_session.scalar(select(PivoteUserCareer).filter_by(id_user=user_id, id_career=career_id))
         if existing: return JSONResponse(status_code=409, content={"message": "El usuario ya está inscrito en esta carrera."})
 
         # Crea una nueva entrada en la tabla PivoteUserCareer con los IDs de usuario y carrera.
         new_enrollment = PivoteUserCareer(id_user=user_id, id_career=career_id)
         db_session.add(new_enrollment)
-        db_session.commit()
+        await db_session.commit()
         return JSONResponse(status_code=201, content={"message": "Carrera asignada con éxito."})
 
+    except IntegrityError:
+        # Dos asignaciones simultáneas pueden pasar la verificación anterior; el índice único frena la segunda.
+        await db_session.rollback()
+        return JSONResponse(status_code=409, content={"message": "El usuario ya está inscrito en esta carrera."})
     except Exception:
-        db_session.rollback()
+        await db_session.rollback()
         return JSONResponse(status_code=500, content={"message": "Error interno al asignar la carrera."})
-    finally:
-        db_session.close()
 
 @user.get("/user/{user_id}")
-def get_user_by_id(user_id: int, authorization: str | None = Header(default=None)):
+async def get_user_by_id(user_id: int, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     """
     Obtiene los detalles de un usuario específico por su ID.
     Solo accesible por administradores.
     """
-    # 1. Seguridad: Verificamos que quien pide la info sea un admin
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data:
-        # Reemplazamos HTTPException con JSONResponse
-        return JSONResponse(status_code=401, content={"message": "Token inválido o no proporcionado."})
-
-    db_session = session
     try:
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            # Reemplazamos HTTPException con JSONResponse
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
-
-        # 2. Búsqueda del usuario solicitado
-        user_data = db_session.query(User).options(joinedload(User.userdetail)).filter(User.id == user_id).first()
+        # Búsqueda del usuario solicitado (la seguridad la resuelve `require_admin`)
+        user_data = await db_session.scalar(select(User).options(joinedload(User.userdetail)).where(User.id == user_id))
 
         if not user_data:
             # Reemplazamos HTTPException con JSONResponse
             return JSONResponse(status_code=404, content={"message": "Usuario no encontrado."})
 
-        # 3. Preparamos y devolvemos los datos
+        # Preparamos y devolvemos los datos
         user_details = {
             "id": user_data.id, # Usamos el id del User, no del UserDetail para consistencia
             "first_name": user_data.userdetail.first_name,
@@ -374,106 +646,82 @@ def get_user_by_id(user_id: int, authorization: str | None = Header(default=None
         print(f"Error al obtener usuario: {ex}")
         # Reemplazamos HTTPException con JSONResponse
         return JSONResponse(status_code=500, content={"message": "Error interno del servidor."})
-    finally:
-        db_session.close()  
 
 @user.put("/user/update/{user_id}")
-def update_user(user_id: int, user_update: InputUserUpdate, authorization: str | None = Header(default=None)):
+async def update_user(user_id: int, user_update: InputUserUpdate, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     """
     Actualiza los detalles de un usuario.
     Solo accesible por administradores.
     """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data:
-        return JSONResponse(status_code=401, content={"message": "Token inválido o no proporcionado."})
-
-    db_session = session
     try:
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
-
         # Buscamos al usuario que se quiere actualizar y su detalle
-        user_to_update = db_session.query(User).options(joinedload(User.userdetail)).filter(User.id == user_id).first()
+        user_to_update = await db_session.scalar(select(User).options(joinedload(User.userdetail)).where(User.id == user_id))
         
         if not user_to_update:
             return JSONResponse(status_code=404, content={"message": "Usuario a actualizar no encontrado."})
 
         # Actualizamos los campos del UserDetail asociado
         user_detail = user_to_update.userdetail
+        role_changed = user_detail.type != user_update.type
         user_detail.first_name = user_update.first_name
         user_detail.last_name = user_update.last_name
         user_detail.dni = user_update.dni
         user_detail.type = user_update.type
         user_detail.email = user_update.email
-        
-        db_session.commit()
+        # Si cambió el rol, los tokens ya emitidos llevan el rol viejo: se revocan en la misma transacción.
+        if role_changed:
+            await revoke_user(db_session, user_id)
+
+        await db_session.commit()
+        # Si no cambió, alcanza con descartar el principal cacheado de este usuario.
+        if not role_changed:
+            invalidate_principal(user_id)
         return JSONResponse(status_code=200, content={"message": "Usuario actualizado con éxito."})
 
     except IntegrityError:
         # Esto ocurre si el nuevo email ya está en uso por otro usuario
-        db_session.rollback()
+        await db_session.rollback()
         return JSONResponse(status_code=409, content={"message": "El email ya está en uso por otro usuario."})
     except Exception as ex:
-        db_session.rollback()
+        await db_session.rollback()
         print(f"Error al actualizar usuario: {ex}")
         return JSONResponse(status_code=500, content={"message": "Error interno del servidor."})
-    finally:
-        db_session.close()
 
 @user.delete("/user/delete/{user_id}")
-def delete_user(user_id: int, authorization: str | None = Header(default=None)):
+async def delete_user(user_id: int, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     """
     Elimina un usuario y sus datos asociados.
     Solo accesible por administradores.
     """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data:
-        return JSONResponse(status_code=401, content={"message": "Token inválido o no proporcionado."})
-
-    db_session = session
     try:
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
-        
-        if admin_user.id == user_id:
+        if admin.id == user_id:
             return JSONResponse(status_code=400, content={"message": "No puedes eliminar tu propia cuenta."})
 
-        user_to_delete = db_session.query(User).filter(User.id == user_id).first()
+        user_to_delete = await db_session.scalar(select(User).where(User.id == user_id))
         if not user_to_delete:
             return JSONResponse(status_code=404, content={"message": "Usuario no encontrado."})
 
-        db_session.delete(user_to_delete)
-        db_session.commit()
+        await db_session.delete(user_to_delete)
+        await revoke_user(db_session, user_id)
+        await db_session.commit()
         
         return JSONResponse(status_code=200, content={"message": "Usuario eliminado con éxito."})
 
     except Exception as ex:
-        db_session.rollback()
+        await db_session.rollback()
         print(f"Error al eliminar usuario: {ex}")
         return JSONResponse(status_code=500, content={"message": "Error interno del servidor."})
-    finally:
-        db_session.close()
 
 @user.post("/user/change-password/self")
-def change_own_password(pass_data: InputPasswordChange, authorization: str | None = Header(default=None)):
+async def change_own_password(pass_data: InputPasswordChange, principal: Principal = Depends(get_principal), db_session: AsyncSession = Depends(get_async_db)):
     """
     Permite a un usuario logueado cambiar su propia contraseña,
     verificando primero la contraseña actual.
+    El usuario es el del token, resuelto por la dependencia `get_principal` (que también rechaza tokens revocados).
     """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    username = token_data.get("username")
-    if not username:
-        return JSONResponse(status_code=401, content={"message": "Token inválido."})
-
-    db_session = session
     try:
-        # 1. Buscamos al usuario por el username del token
-        user_to_update = db_session.query(User).filter(User.username == username).first()
+        # 1. Buscamos al usuario del token
+        user_to_update = await db_session.scalar(select(User).where(User.id == principal.id))
         if not user_to_update:
             return JSONResponse(status_code=404, content={"message": "Usuario no encontrado."})
         
@@ -483,58 +731,44 @@ def change_own_password(pass_data: InputPasswordChange, authorization: str | Non
 
         # 3. Si todo es correcto, actualizamos a la nueva contraseña
         user_to_update.password = pass_data.new_password
-        db_session.commit()
+        await db_session.commit()
+        invalidate_principal(user_to_update.id)
         
         return JSONResponse(status_code=200, content={"message": "Contraseña actualizada con éxito."})
 
     except Exception as e:
-        db_session.rollback()
+        await db_session.rollback()
         return JSONResponse(status_code=500, content={"message": f"Error interno: {e}"})
-    finally:
-        db_session.close()
 
 @user.post("/user/reset-password/admin/{user_id}")
-def admin_reset_password(user_id: int, pass_data: InputAdminPasswordReset, authorization: str | None = Header(default=None)):
+async def admin_reset_password(user_id: int, pass_data: InputAdminPasswordReset, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     """
     Permite a un administrador restablecer la contraseña de cualquier usuario.
+    El rol de administrador lo verifica la dependencia `require_admin`.
     """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    
-    # 1. Verificar que el solicitante es un administrador
-    requesting_user_username = token_data.get("username")
-    if not requesting_user_username:
-        return JSONResponse(status_code=401, content={"message": "Token inválido."})
-
-    db_session = session
     try:
-        admin_user = db_session.query(User).options(joinedload(User.userdetail)).filter(User.username == requesting_user_username).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado. Se requiere rol de administrador."})
-
-        # 2. No permitir que un admin se cambie la contraseña a sí mismo por esta vía
-        if admin_user.id == user_id:
+        # 1. No permitir que un admin se cambie la contraseña a sí mismo por esta vía
+        if admin.id == user_id:
             return JSONResponse(status_code=400, content={"message": "Usa la opción 'Mi Perfil' para cambiar tu propia contraseña."})
 
-        # 3. Encontrar y actualizar al usuario objetivo
-        user_to_update = db_session.query(User).filter(User.id == user_id).first()
+        # 2. Encontrar y actualizar al usuario objetivo
+        user_to_update = await db_session.scalar(select(User).where(User.id == user_id))
         if not user_to_update:
             return JSONResponse(status_code=404, content={"message": "Usuario no encontrado."})
         
-        # 4. Actualizar la contraseña
+        # 3. Actualizar la contraseña
         user_to_update.password = pass_data.new_password
-        db_session.commit()
+        await db_session.commit()
+        invalidate_principal(user_id)
         
         return JSONResponse(status_code=200, content={"message": f"La contraseña para {user_to_update.username} ha sido actualizada con éxito."})
 
     except Exception as e:
-        db_session.rollback()
+        await db_session.rollback()
         return JSONResponse(status_code=500, content={"message": f"Error interno: {e}"})
-    finally:
-        db_session.close()
 
 @user.delete("/users/{user_id}/careers/{career_id}")
-def unassign_career_from_user(user_id: int, career_id: int, authorization: str | None = Header(default=None)):
+async def unassign_career_from_user(user_id: int, career_id: int, admin: Principal = Depends(require_admin), db_session: AsyncSession = Depends(get_async_db)):
     """
     Endpoint para desasignar (quitar) una carrera de un usuario específico.
     Requiere autenticación JWT y que el usuario que realiza la solicitud sea un 'administrador'.
@@ -542,28 +776,17 @@ def unassign_career_from_user(user_id: int, career_id: int, authorization: str |
     Args:
         user_id (int): El ID del usuario al que se le quitará la carrera.
         career_id (int): El ID de la carrera a quitar del usuario.
-        authorization (str | None): El token JWT en el encabezado 'Authorization'.
+        admin (Principal): El administrador que hace la petición (resuelto por `require_admin`).
     """
-    headers = {"authorization": authorization}
-    token_data = Security.verify_token(headers)
-    if "username" not in token_data: return JSONResponse(status_code=401, content={"message": "Token inválido."})
-    
-    db_session = session
     try:
-        admin_user = db_session.query(User).filter(User.username == token_data['username']).first()
-        if not admin_user or admin_user.userdetail.type != 'administrador':
-            return JSONResponse(status_code=403, content={"message": "Permiso denegado."})
-
-        enrollment = db_session.query(PivoteUserCareer).filter_by(id_user=user_id, id_career=career_id).first()
+        enrollment = await db_session.scalar(select(PivoteUserCareer).filter_by(id_user=user_id, id_career=career_id))
         if not enrollment: return JSONResponse(status_code=404, content={"message": "Inscripción no encontrada."})
 
-        db_session.delete(enrollment)
-        db_session.commit()
+        await db_session.delete(enrollment)
+        await db_session.commit()
         return JSONResponse(status_code=200, content={"message": "Carrera quitada con éxito."})
 
     except Exception:
-        db_session.rollback()
+        await db_session.rollback()
         return JSONResponse(status_code=500, content={"message": "Error interno al quitar la carrera."})
-    finally:
-        db_session.close()
 
@@ -0,0 +1,43 @@
+"""
+Configuración compartida de las pruebas (se corren con `python -m pytest` desde la carpeta Backend).
+Las pruebas que necesitan PostgreSQL usan la base de DATABASE_URL / ASYNC_DATABASE_URL y se saltean si
+no hay conexión. Todo lo que escriben queda dentro de una transacción que se deshace al terminar, así
+que la base queda como estaba (igual que `python benchmark.py consultas`).
+"""
+import asyncio
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+from configs.async_db import ASYNC_DATABASE_URL
+
+
+@pytest.fixture
+def rolled_back_db():
+    """
+    Devuelve una función que ejecuta `test(session, engine)` (una corrutina) con una sesión asíncrona
+    dentro de una transacción que se deshace al final. Los commit de las rutas cierran un savepoint,
+    no la transacción. Cada prueba usa su propio motor, sin pool, porque cada una corre en un event loop nuevo.
+    """
+
+    def run(test):
+        async def main():
+            engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+            try:
+                try:
+                    conn = await engine.connect()
+                except Exception as e:
+                    pytest.skip(f"No hay base de datos disponible: {e}")
+                trans = await conn.begin()
+                session = AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False)
+                try:
+                    return await test(session, engine)
+                finally:
+                    await session.close()
+                    await trans.rollback()
+                    await conn.close()
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
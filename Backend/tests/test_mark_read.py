@@ -0,0 +1,45 @@
+"""PUT /messages/read con "before": fechas con y sin zona horaria."""
+import datetime
+import json
+import pytest
+from models.modelo import InputMarkRead, Message, User, UserDetail
+from auth.principal import Principal
+from routes.message import mark_many_as_read
+
+UTC_NOON = datetime.datetime(2024, 5, 1, 12, 0, tzinfo=datetime.timezone.utc)
+# El mismo instante en la hora local del servidor, sin zona: así se guardan las fechas de los mensajes.
+LOCAL_NOON = UTC_NOON.astimezone().replace(tzinfo=None)
+
+
+@pytest.mark.parametrize("before", ["2024-05-01T12:00:00Z", "2024-05-01T12:00:00+00:00", "2024-05-01T09:00:00-03:00"])
+def test_before_with_timezone_is_converted_to_local_time(before):
+    assert InputMarkRead(before=before).before == LOCAL_NOON
+
+
+def test_before_without_timezone_is_kept():
+    assert InputMarkRead(before="2024-05-01T12:00:00").before == datetime.datetime(2024, 5, 1, 12, 0)
+
+
+@pytest.mark.parametrize("suffix", ["Z", "+00:00"])
+def test_mark_read_before_with_timezone(rolled_back_db, suffix):
+    async def test(session, engine):
+        sender = User("test_mr_sender", "x")
+        sender.userdetail = UserDetail("Test", "Remitente", 0, "administrador", "test_mr_sender@test")
+        recipient = User("test_mr_recipient", "x")
+        recipient.userdetail = UserDetail("Test", "Destinatario", 0, "alumno", "test_mr_recipient@test")
+        session.add_all([sender, recipient])
+        await session.flush()
+        for minutes in (-1, 0, 1):
+            msg = Message(sender.id, recipient.id, f"mensaje {minutes}")
+            msg.timestamp = LOCAL_NOON + datetime.timedelta(minutes=minutes)
+            session.add(msg)
+        await session.flush()
+
+        data = InputMarkRead(before=f"2024-05-01T12:00:00{suffix}")
+        response = await mark_many_as_read(data, principal=Principal(recipient.id, recipient.username, "alumno"), db_session=session)
+        return response.status_code, json.loads(response.body)
+
+    status, body = rolled_back_db(test)
+    # Se marcan el mensaje anterior y el de las 12:00 en punto; el posterior queda sin leer.
+    assert status == 200
+    assert body["updated"] == 2
@@ -0,0 +1,20 @@
+"""
+Cantidad de consultas SQL por ruta: no debe crecer con los datos (sin N+1).
+Es la misma verificación que `python benchmark.py consultas`, con datos más chicos.
+"""
+import pytest
+from auth.principal import Principal
+from benchmark import count_queries, seed_dashboard
+from routes.career import get_professor_dashboard_data
+
+
+@pytest.mark.parametrize("careers, students", [(1, 2), (5, 60)])
+def test_professor_dashboard_is_one_query(rolled_back_db, careers, students):
+    async def test(session, engine):
+        professor = Principal(await seed_dashboard(session, careers, students), "qc", "profesor")
+        return await count_queries(engine, lambda: get_professor_dashboard_data(professor=professor, db_session=session))
+
+    data, queries = rolled_back_db(test)
+    assert len(data) == careers
+    assert sum(career["student_count"] for career in data) == students
+    assert queries == 1
@@ -0,0 +1,25 @@
+"""/users/search: el límite de candidatos no deja afuera a las coincidencias más relevantes."""
+import routes.user
+from models.modelo import User, UserDetail
+from routes.user import search_users_query
+
+
+def test_exact_match_survives_candidate_limit(rolled_back_db, monkeypatch):
+    monkeypatch.setattr(routes.user, "SEARCH_CANDIDATES", 5)
+
+    async def test(session, engine):
+        # Primero muchas coincidencias solo por prefijo y al final la exacta: el índice no la daría primero.
+        for i in range(20):
+            user = User(f"test_search_prefix_{i}", "x")
+            user.userdetail = UserDetail("Test", f"Zqxgomezano{i}", 0, "alumno", f"test_search_prefix_{i}@test")
+            session.add(user)
+        exact = User("test_search_exact", "x")
+        exact.userdetail = UserDetail("Test", "Zqxgomez", 0, "alumno", "test_search_exact@test")
+        session.add(exact)
+        await session.flush()
+        rows = (await session.execute(search_users_query("zqxgómez", 3))).all()
+        return exact.id, [user.id for user, _rank in rows]
+
+    exact_id, found = rolled_back_db(test)
+    assert len(found) == 3
+    assert found[0] == exact_id
@@ -13,28 +13,57 @@ interface Message {
 
 const NotificationBell = () => {
   const [messages, setMessages] = useState<Message[]>([]);
+  const [unreadCount, setUnreadCount] = useState(0);
   const [showModal, setShowModal] = useState(false);
   const token = localStorage.getItem("token");
   const navigate = useNavigate();
 
   useEffect(() => {
     if(!token) return;
-    const fetchMessages = async () => {
+    // El globo solo necesita la cantidad de no leídos, no la lista de mensajes.
+    const fetchUnreadCount = async () => {
       try {
-        const res = await fetch("http://localhost:8000/messages", {
+        const res = await fetch("http://localhost:8000/messages/unread-count", {
           headers: { Authorization: `Bearer ${token}` },
         });
         if (!res.ok) throw new Error("No autorizado");
         const data = await res.json();
-        setMessages(data);
+        setUnreadCount(data.unread);
       } catch (err) {
         console.error("Error al obtener notificaciones", err);
       }
     };
-    fetchMessages();
+    fetchUnreadCount();
+
+    // Canal en tiempo real: cada mensaje nuevo llega como un evento y se agrega a la lista,
+    // sin volver a pedir /messages. EventSource reconecta solo si se corta la conexión.
+    const stream = new EventSource(
+      `http://localhost:8000/messages/stream?token=${encodeURIComponent(token)}`
+    );
+    stream.addEventListener("message", (event) => {
+      const msg: Message = JSON.parse((event as MessageEvent).data);
+      setMessages((prev) =>
+        prev.some((m) => m.id === msg.id) ? prev : [msg, ...prev]
+      );
+      setUnreadCount((count) => count + 1);
+    });
+    return () => stream.close();
   }, [token]);
 
-  const unreadCount = messages.filter((msg) => !msg.is_read).length;
+  // Los últimos 10 mensajes se piden recién al abrir el listado.
+  const openModal = async () => {
+    setShowModal(true);
+    try {
+      const res = await fetch("http://localhost:8000/messages?limit=10", {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (!res.ok) throw new Error("No autorizado");
+      const data = await res.json();
+      setMessages(data.messages);
+    } catch (err) {
+      console.error("Error al obtener notificaciones", err);
+    }
+  };
 
   // 👉 Si no hay token, no mostrar nada
   if (!token) return null;
@@ -43,7 +72,7 @@ const NotificationBell = () => {
     <>
       <div
         style={{ position: "relative", cursor: "pointer" }}
-        onClick={() => setShowModal(true)}
+        onClick={openModal}
       >
         <BellFill size={22} className="text-light" />
         {unreadCount > 0 && (
@@ -11,46 +11,74 @@ interface Message {
   is_read: boolean;
 }
 
+// Cantidad de mensajes que se piden por página a /messages.
+const PAGE_SIZE = 20;
+
 function Notifications() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [isLoading, setIsLoading] = useState(true);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  // Cursor de la página siguiente que devuelve el backend (null = no hay más mensajes).
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  // Filtro que se aplica en el servidor: solo los mensajes sin leer.
+  const [unreadOnly, setUnreadOnly] = useState(false);
   const navigate = useNavigate();
   const token = localStorage.getItem("token");
 
-  // Este efecto se ejecuta una vez cuando el componente se monta
-  useEffect(() => {
-    const fetchMessages = async () => {
-      if (!token) {
-        toast.error(
-          "No se pudo verificar la sesión. Por favor, inicie sesión."
-        );
-        setIsLoading(false);
-        return;
-      }
+  // Pide una página de mensajes (del más nuevo al más viejo). Sin cursor reemplaza la lista;
+  // con cursor agrega la página siguiente.
+  const fetchMessages = async (cursor: string | null = null) => {
+    if (!token) {
+      toast.error(
+        "No se pudo verificar la sesión. Por favor, inicie sesión."
+      );
+      setIsLoading(false);
+      return;
+    }
 
-      try {
-        const response = await fetch(`http://localhost:8000/messages`, {
-          headers: { Authorization: `Bearer ${token}` },
-        });
+    cursor === null ? setIsLoading(true) : setIsLoadingMore(true);
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (cursor !== null) params.set("cursor", cursor);
+    if (unreadOnly) params.set("unread_only", "true");
 
-        if (!response.ok) {
-          throw new Error("No se pudieron cargar las notificaciones.");
-        }
+    try {
+      const response = await fetch(`http://localhost:8000/messages?${params}`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
 
-        const data = await response.json();
-        // Ordenamos los mensajes para mostrar los no leídos primero
-        const sortedData = data.sort(
-          (a: Message, b: Message) => Number(a.is_read) - Number(b.is_read)
-        );
-        setMessages(sortedData);
-      } catch (err: any) {
-        toast.error(err.message);
-      } finally {
-        setIsLoading(false);
+      if (!response.ok) {
+        throw new Error("No se pudieron cargar las notificaciones.");
       }
-    };
 
+      const data = await response.json();
+      setMessages((prev) => (cursor === null ? data.messages : [...prev, ...data.messages]));
+      setNextCursor(data.next_cursor);
+    } catch (err: any) {
+      toast.error(err.message);
+    } finally {
+      setIsLoading(false);
+      setIsLoadingMore(false);
+    }
+  };
+
+  // Al cambiar el filtro se vuelve a la primera página.
+  useEffect(() => {
     fetchMessages();
+  }, [token, unreadOnly]);
+
+  // Los mensajes que lleguen mientras la página está abierta se agregan al principio (no leídos).
+  useEffect(() => {
+    if (!token) return;
+    const stream = new EventSource(
+      `http://localhost:8000/messages/stream?token=${encodeURIComponent(token)}`
+    );
+    stream.addEventListener("message", (event) => {
+      const msg: Message = JSON.parse((event as MessageEvent).data);
+      setMessages((prev) =>
+        prev.some((m) => m.id === msg.id) ? prev : [msg, ...prev]
+      );
+    });
+    return () => stream.close();
   }, [token]); // El efecto depende del token. Si cambia, se vuelve a ejecutar.
 
   // Función para marcar un mensaje como leído
@@ -81,6 +109,39 @@ function Notifications() {
     }
   };
 
+  // Marca como leídos todos los mensajes recibidos hasta el más nuevo que se está viendo, en una sola
+  // petición (los que lleguen después no se marcan).
+  const markAllAsRead = async () => {
+    if (messages.length === 0) return;
+    const newest = messages[0].timestamp;
+    try {
+      const response = await fetch("http://localhost:8000/messages/read", {
+        method: "PUT",
+        headers: {
+          Authorization: `Bearer ${token}`,
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ before: newest }),
+      });
+      if (!response.ok) {
+        toast.error("Error al marcar los mensajes como leídos.");
+        return;
+      }
+      const data = await response.json();
+      setMessages((prevMessages) =>
+        unreadOnly
+          ? prevMessages.filter((msg) => msg.timestamp > newest)
+          : prevMessages.map((msg) =>
+              msg.timestamp <= newest ? { ...msg, is_read: true } : msg
+            )
+      );
+      toast.success(data.message);
+    } catch (error) {
+      console.error("Error:", error);
+      toast.error("Ocurrió un error de red.");
+    }
+  };
+
   // Renderizado del componente
   return (
     <InfoContainer>
@@ -93,6 +154,27 @@ function Notifications() {
             </h1>
           </div>
           <div className="card-body">
+            <div className="d-flex justify-content-between align-items-center mb-3">
+              <div className="form-check form-switch">
+                <input
+                  className="form-check-input"
+                  type="checkbox"
+                  id="unreadOnly"
+                  checked={unreadOnly}
+                  onChange={(e) => setUnreadOnly(e.target.checked)}
+                />
+                <label className="form-check-label" htmlFor="unreadOnly">
+                  Solo no leídos
+                </label>
+              </div>
+              <button
+                className="btn btn-sm btn-outline-success"
+                onClick={markAllAsRead}
+                disabled={messages.every((msg) => msg.is_read)}
+              >
+                Marcar todos como leídos
+              </button>
+            </div>
             {isLoading && (
               <div className="text-center py-5">
                 <div className="spinner-border text-warning" role="status">
@@ -134,6 +216,17 @@ function Notifications() {
                   No tienes notificaciones nuevas.
                 </div>
               ))}
+            {!isLoading && nextCursor !== null && (
+              <div className="text-center mt-3">
+                <button
+                  className="btn btn-outline-warning"
+                  onClick={() => fetchMessages(nextCursor)}
+                  disabled={isLoadingMore}
+                >
+                  {isLoadingMore ? "Cargando..." : "Cargar más"}
+                </button>
+              </div>
+            )}
             <div className="mt-4">
               <button
                 className="btn btn-outline-secondary"
@@ -19,7 +19,8 @@ function CareerUserAssignment() {
   const [careers, setCareers] = useState<Career[]>([]);
   const [users, setUsers] = useState<User[]>([]);
   const [selectedCareer, setSelectedCareer] = useState("");
-  const [selectedUser, setSelectedUser] = useState("");
+  // Se pueden seleccionar varios usuarios: se inscriben (o quitan) todos con una sola petición.
+  const [selectedUsers, setSelectedUsers] = useState<string[]>([]);
 
   const [isLoading, setIsLoading] = useState({ data: true, assignment: false });
 
@@ -61,10 +62,10 @@ function CareerUserAssignment() {
   }, []);
 
   // --- MANEJADOR DEL FORMULARIO ---
-  const handleAssignment = async (e: React.FormEvent<HTMLFormElement>) => {
-    e.preventDefault();
-    if (!selectedUser || !selectedCareer) {
-toast.error('Debes seleccionar un usuario y una carrera.');
+  // Inscribe (POST) o quita (DELETE) a todos los usuarios seleccionados de la carrera en una sola petición.
+  const submitEnrollments = async (method: "POST" | "DELETE") => {
+    if (selectedUsers.length === 0 || !selectedCareer) {
+      toast.error("Debes seleccionar al menos un usuario y una carrera.");
       return;
     }
 
@@ -73,24 +74,30 @@ toast.error('Debes seleccionar un usuario y una carrera.');
 
     try {
       const res = await fetch(
-        `http://localhost:8000/users/${selectedUser}/careers`,
+        `http://localhost:8000/career/${selectedCareer}/enrollments`,
         {
-          method: "POST",
+          method,
           headers: {
             "Content-Type": "application/json",
             Authorization: `Bearer ${token}`,
           },
-          body: JSON.stringify({ id: Number(selectedCareer) }),
+          body: JSON.stringify({ user_ids: selectedUsers.map(Number) }),
         }
       );
 
       const data = await res.json();
       if (!res.ok)
-        throw new Error(data.message || "Error al asignar la carrera.");
+        throw new Error(data.message || "Error al actualizar las inscripciones.");
 
-      toast.success(data.message || "¡Usuario asignado a la carrera con éxito!");
-      // Limpiamos la selección después de una asignación exitosa
-      setSelectedUser("");
+      toast.success(data.message);
+      if (data.already_enrolled?.length) {
+        toast.info(`${data.already_enrolled.length} usuario(s) ya estaban inscritos.`);
+      }
+      if (data.not_enrolled?.length) {
+        toast.info(`${data.not_enrolled.length} usuario(s) no estaban inscritos.`);
+      }
+      // Limpiamos la selección después de una operación exitosa
+      setSelectedUsers([]);
       setSelectedCareer("");
     } catch (err: any) {
       toast.error(err.message);
@@ -99,6 +106,11 @@ toast.error('Debes seleccionar un usuario y una carrera.');
     }
   };
 
+  const handleAssignment = (e: React.FormEvent<HTMLFormElement>) => {
+    e.preventDefault();
+    submitEnrollments("POST");
+  };
+
   // --- RENDERIZADO ---
   return (
     <InfoContainer>
@@ -115,8 +127,8 @@ toast.error('Debes seleccionar un usuario y una carrera.');
           </div>
           <div className="card-body">
             <p className="lead mb-4">
-              Selecciona un usuario y la carrera a la que deseas inscribirlo o
-              asignarlo.
+              Selecciona uno o varios usuarios y la carrera a la que deseas
+              inscribirlos o asignarlos.
             </p>
 
             {isLoading.data ? (
@@ -127,18 +139,21 @@ toast.error('Debes seleccionar un usuario y una carrera.');
               <form onSubmit={handleAssignment}>
                 <div className="mb-3">
                   <label htmlFor="user-select" className="form-label">
-                    Usuario (Alumno/Profesor)
+                    Usuarios (Alumnos/Profesores) — Ctrl/Cmd + clic para elegir varios
                   </label>
                   <select
                     id="user-select"
                     className="form-select"
-                    value={selectedUser}
-                    onChange={(e) => setSelectedUser(e.target.value)}
+                    multiple
+                    size={8}
+                    value={selectedUsers}
+                    onChange={(e) =>
+                      setSelectedUsers(
+                        Array.from(e.target.selectedOptions, (option) => option.value)
+                      )
+                    }
                     required
                   >
-                    <option value="" disabled>
-                      --- Selecciona un usuario ---
-                    </option>
                     {users.map((user) => (
                       <option key={user.id} value={user.id}>
                         {user.first_name} {user.last_name} ({user.type})
@@ -178,6 +193,14 @@ toast.error('Debes seleccionar un usuario y una carrera.');
                   >
                     Volver a Carreras
                   </button>
+                  <button
+                    type="button"
+                    className="btn btn-outline-danger ms-auto me-2"
+                    onClick={() => submitEnrollments("DELETE")}
+                    disabled={isLoading.assignment}
+                  >
+                    Quitar de la Carrera
+                  </button>
                   <button
                     type="submit"
                     className="btn btn-outline-success"
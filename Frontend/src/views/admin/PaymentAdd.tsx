@@ -48,7 +48,7 @@ function PaymentAdd() {
     const fetchData = async () => {
         try {
             const [usersRes, careersRes] = await Promise.all([
-                fetch("http://localhost:8000/users/all", { headers }),
+                fetch("http://localhost:8000/users/all?type=alumno", { headers }),
                 fetch("http://localhost:8000/career/all", { headers })
             ]);
             if (!usersRes.ok || !careersRes.ok) throw new Error("No se pudieron cargar los datos para el formulario.");
@@ -13,17 +13,41 @@ type Payment = {
   "carrera afectada": string;
 };
 
+type Career = {
+  id: number;
+  name: string;
+};
+
+// Cantidad de pagos que se piden por página a /payment/all/detailled.
+const PAGE_SIZE = 50;
+
 function PaymentsDashboard() {
   const [payments, setPayments] = useState<Payment[]>([]);
   const [isLoading, setIsLoading] = useState(true); // Estado para la carga
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  // Cursor de la página siguiente que devuelve el backend (null = no hay más pagos).
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  // Filtros que se aplican en el servidor.
+  const [careers, setCareers] = useState<Career[]>([]);
+  const [careerFilter, setCareerFilter] = useState("");
+  const [monthFrom, setMonthFrom] = useState("");
+  const [monthTo, setMonthTo] = useState("");
 
   const loggedInUser = JSON.parse(localStorage.getItem("user") || "{}");
   const isAdmin = loggedInUser.type === "administrador";
 
-  const fetchAllPayments = async () => {
-    setIsLoading(true);
+  // Pide una página de pagos. Sin cursor reemplaza la lista; con cursor agrega la página siguiente.
+  // Los meses del filtro vienen como "YYYY-MM" (input type="month"); los pagos guardan el mes pagado
+  // como el día 1 de ese mes, así que ambos extremos se envían con día 01.
+  const fetchPayments = async (cursor: number | null = null) => {
+    cursor === null ? setIsLoading(true) : setIsLoadingMore(true);
     const token = localStorage.getItem("token") || "";
-    const PAYMENTS_URL = "http://localhost:8000/payment/all/detailled";
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (cursor !== null) params.set("cursor", String(cursor));
+    if (careerFilter) params.set("career", careerFilter);
+    if (monthFrom) params.set("month_from", `${monthFrom}-01`);
+    if (monthTo) params.set("month_to", `${monthTo}-01`);
+    const PAYMENTS_URL = `http://localhost:8000/payment/all/detailled?${params}`;
 
     try {
       const res = await fetch(PAYMENTS_URL, {
@@ -36,20 +60,32 @@ function PaymentsDashboard() {
       }
 
       const data = await res.json();
-      setPayments(data);
+      setPayments((prev) => (cursor === null ? data.payments : [...prev, ...data.payments]));
+      setNextCursor(data.next_cursor);
 
     } catch (err: any) {
       console.error("Error fetching payments:", err);
       toast.error(err.message);
+      if (cursor === null) setPayments([]);
     } finally {
       setIsLoading(false);
+      setIsLoadingMore(false);
     }
   };
 
+  // Carreras para el filtro.
   useEffect(() => {
-    fetchAllPayments();
+    fetch("http://localhost:8000/career/all")
+      .then((res) => (res.ok ? res.json() : []))
+      .then(setCareers)
+      .catch(() => setCareers([]));
   }, []);
 
+  // Al cambiar un filtro se vuelve a la primera página.
+  useEffect(() => {
+    fetchPayments();
+  }, [careerFilter, monthFrom, monthTo]);
+
   const formatDate = (dateString: string) => {
     const options: Intl.DateTimeFormatOptions = { year: 'numeric', month: 'long', day: 'numeric', hour: '2-digit', minute: '2-digit' };
     return new Date(dateString).toLocaleDateString("es-ES", options);
@@ -78,6 +114,38 @@ return (
           <p className="lead mb-4">
             Aquí puedes ver y administrar todos los registros de pagos del sistema.
           </p>
+          <div className="row g-2 mb-3">
+            <div className="col-md-4">
+              <select
+                className="form-select"
+                value={careerFilter}
+                onChange={(e) => setCareerFilter(e.target.value)}
+              >
+                <option value="">Todas las carreras</option>
+                {careers.map((career) => (
+                  <option key={career.id} value={career.id}>{career.name}</option>
+                ))}
+              </select>
+            </div>
+            <div className="col-md-4">
+              <input
+                type="month"
+                className="form-control"
+                title="Mes pagado desde"
+                value={monthFrom}
+                onChange={(e) => setMonthFrom(e.target.value)}
+              />
+            </div>
+            <div className="col-md-4">
+              <input
+                type="month"
+                className="form-control"
+                title="Mes pagado hasta"
+                value={monthTo}
+                onChange={(e) => setMonthTo(e.target.value)}
+              />
+            </div>
+          </div>
 
           {isLoading ? (
             <div className="text-center py-5">
@@ -129,13 +197,28 @@ return (
                         <div className="empty-state">
                           <i className="bi bi-wallet2"></i>
                           <h4 className="mt-3">No se encontraron pagos</h4>
-                          <p>Todavía no se han registrado pagos en el sistema.</p>
+                          <p>
+                            {careerFilter || monthFrom || monthTo
+                              ? "Ningún pago coincide con los filtros."
+                              : "Todavía no se han registrado pagos en el sistema."}
+                          </p>
                         </div>
                       </td>
                     </tr>
                   )}
                 </tbody>
               </table>
+              {nextCursor !== null && (
+                <div className="text-center mt-3">
+                  <button
+                    className="btn btn-outline-warning"
+                    onClick={() => fetchPayments(nextCursor)}
+                    disabled={isLoadingMore}
+                  >
+                    {isLoadingMore ? "Cargando..." : "Cargar más"}
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -11,6 +11,14 @@ type User = {
   type: string;
 };
 
+type Career = {
+  id: number;
+  name: string;
+};
+
+// A quién se envía: un usuario, todos los de un tipo o todos los alumnos de una carrera.
+type Target = 'user' | 'role' | 'career';
+
 function SendMessage() {
   const { recipientId } = useParams<{ recipientId?: string }>();
   const navigate = useNavigate();
@@ -18,6 +26,10 @@ function SendMessage() {
   const [content, setContent] = useState('');
   const [selectedRecipient, setSelectedRecipient] = useState(recipientId || '');
   const [allUsers, setAllUsers] = useState<User[]>([]);
+  const [careers, setCareers] = useState<Career[]>([]);
+  const [target, setTarget] = useState<Target>('user');
+  const [selectedRole, setSelectedRole] = useState('alumno');
+  const [selectedCareer, setSelectedCareer] = useState('');
   const [isLoading, setIsLoading] = useState(false);
 
   // Cargar la lista de todos los usuarios para el selector
@@ -37,13 +49,22 @@ function SendMessage() {
       }
     };
     fetchUsers();
+    // Carreras para la difusión a los alumnos de una carrera.
+    fetch('http://localhost:8000/career/all')
+      .then((res) => (res.ok ? res.json() : []))
+      .then(setCareers)
+      .catch(() => setCareers([]));
   }, []);
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
-    if (!selectedRecipient) {
+    if (target === 'user' && !selectedRecipient) {
       toast.error('Por favor, selecciona un destinatario.');
       return;
+    }
+    if (target === 'career' && !selectedCareer) {
+      toast.error('Por favor, selecciona una carrera.');
+      return;
     }
         if (!content.trim()) {
         toast.error('El contenido del mensaje no puede estar vacío.');
@@ -54,25 +75,30 @@ function SendMessage() {
     const token = localStorage.getItem('token');
 
     try {
-      const response = await fetch('http://localhost:8000/messages', {
+      // Un destinatario usa /messages; un tipo de usuario o una carrera, la difusión (una sola petición).
+      const body =
+        target === 'user'
+          ? { recipient_id: Number(selectedRecipient), content: content }
+          : target === 'role'
+          ? { role: selectedRole, content: content }
+          : { career: Number(selectedCareer), content: content };
+      const url = target === 'user' ? 'http://localhost:8000/messages' : 'http://localhost:8000/messages/broadcast';
+      const response = await fetch(url, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${token}`,
         },
-        body: JSON.stringify({
-          recipient_id: Number(selectedRecipient),
-          content: content,
-        }),
+        body: JSON.stringify(body),
       });
 
       const result = await response.json();
 
       if (!response.ok) {
-        throw new Error(result.detail || 'Error al enviar el mensaje.');
+        throw new Error(result.detail || result.message || 'Error al enviar el mensaje.');
       }
 
-      toast.success(result.detail || 'Mensaje fue enviado correctamente.');
+      toast.success(result.detail || result.message || 'Mensaje fue enviado correctamente.');
       setContent(''); // Limpiar el campo de texto
       
     } catch (error: any) {
@@ -95,22 +121,69 @@ function SendMessage() {
           <div className="card-body p-4">
             <form onSubmit={handleSubmit}noValidate>
               <div className="mb-3">
-                <label htmlFor="recipient" className="form-label">Destinatario</label>
+                <label htmlFor="target" className="form-label">Enviar a</label>
                 <select
-                  id="recipient"
+                  id="target"
                   className="form-select"
-                  value={selectedRecipient}
-                  onChange={(e) => setSelectedRecipient(e.target.value)}
-                  required
+                  value={target}
+                  onChange={(e) => setTarget(e.target.value as Target)}
                 >
-                  <option value="" disabled>Selecciona un usuario...</option>
-                  {allUsers.map(user => (
-                    <option key={user.id} value={user.id}>
-                      {user.first_name} {user.last_name} ({user.type})
-                    </option>
-                  ))}
+                  <option value="user">Un usuario</option>
+                  <option value="role">Todos los usuarios de un tipo</option>
+                  <option value="career">Todos los alumnos de una carrera</option>
                 </select>
               </div>
+              {target === 'user' && (
+                <div className="mb-3">
+                  <label htmlFor="recipient" className="form-label">Destinatario</label>
+                  <select
+                    id="recipient"
+                    className="form-select"
+                    value={selectedRecipient}
+                    onChange={(e) => setSelectedRecipient(e.target.value)}
+                    required
+                  >
+                    <option value="" disabled>Selecciona un usuario...</option>
+                    {allUsers.map(user => (
+                      <option key={user.id} value={user.id}>
+                        {user.first_name} {user.last_name} ({user.type})
+                      </option>
+                    ))}
+                  </select>
+                </div>
+              )}
+              {target === 'role' && (
+                <div className="mb-3">
+                  <label htmlFor="role" className="form-label">Tipo de usuario</label>
+                  <select
+                    id="role"
+                    className="form-select"
+                    value={selectedRole}
+                    onChange={(e) => setSelectedRole(e.target.value)}
+                  >
+                    <option value="alumno">Alumnos</option>
+                    <option value="profesor">Profesores</option>
+                  </select>
+                </div>
+              )}
+              {target === 'career' && (
+                <div className="mb-3">
+                  <label htmlFor="career" className="form-label">Carrera</label>
+                  <select
+                    id="career"
+                    className="form-select"
+                    value={selectedCareer}
+                    onChange={(e) => setSelectedCareer(e.target.value)}
+                  >
+                    <option value="" disabled>Selecciona una carrera...</option>
+                    {careers.map(career => (
+                      <option key={career.id} value={career.id}>
+                        {career.name}
+                      </option>
+                    ))}
+                  </select>
+                </div>
+              )}
               <div className="mb-3">
                 <label htmlFor="content" className="form-label">Mensaje</label>
                 <textarea
@@ -13,17 +13,31 @@ type User = {
   careers: string[];
 };
 
+// Cantidad de usuarios que se piden por página a /users/all.
+const PAGE_SIZE = 50;
+
 function UsersDashboard() {
   const [users, setUsers] = useState<User[]>([]);
   const [isLoading, setIsLoading] = useState(true);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  // Cursor de la página siguiente que devuelve el backend (null = no hay más usuarios).
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  // Filtros que se aplican en el servidor.
+  const [typeFilter, setTypeFilter] = useState("");
+  const [nameFilter, setNameFilter] = useState("");
 
   const loggedInUser = JSON.parse(localStorage.getItem("user") || "{}");
   const isAdmin = loggedInUser.type === "administrador";
 
-  const fetchUsers = async () => {
-    setIsLoading(true);
+  // Pide una página de usuarios. Sin cursor reemplaza la lista; con cursor agrega la página siguiente.
+  const fetchUsers = async (cursor: number | null = null) => {
+    cursor === null ? setIsLoading(true) : setIsLoadingMore(true);
     const token = localStorage.getItem("token") || "";
-    const USERS_URL = "http://localhost:8000/users/all";
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (cursor !== null) params.set("cursor", String(cursor));
+    if (typeFilter) params.set("type", typeFilter);
+    if (nameFilter.trim()) params.set("name", nameFilter.trim());
+    const USERS_URL = `http://localhost:8000/users/all?${params}`;
 
     try {
       const response = await fetch(USERS_URL, {
@@ -39,19 +53,76 @@ function UsersDashboard() {
       }
 
       const data = await response.json();
-      setUsers(data);
+      setUsers((prev) => (cursor === null ? data.users : [...prev, ...data.users]));
+      setNextCursor(data.next_cursor);
     } catch (error: any) {
       console.error("Error fetching users:", error);
       toast.error(error.message);
-      setUsers([]);
+      if (cursor === null) setUsers([]);
     } finally {
       setIsLoading(false);
+      setIsLoadingMore(false);
+    }
+  };
+
+  // Descarga el padrón completo en CSV. El backend lo genera por partes; aquí se arma el archivo y se descarga.
+  const exportUsers = async () => {
+    const token = localStorage.getItem("token") || "";
+    try {
+      const response = await fetch("http://localhost:8000/users/export?format=csv", {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.message || "Error al exportar los usuarios.");
+      }
+      const url = URL.createObjectURL(await response.blob());
+      const link = document.createElement("a");
+      link.href = url;
+      link.download = "usuarios.csv";
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (error: any) {
+      toast.error(error.message);
+    }
+  };
+
+  // Importa usuarios desde un CSV (username,password,firstname,lastname,dni,type,email,careers) en una sola petición.
+  const importUsers = async (e: React.ChangeEvent<HTMLInputElement>) => {
+    const file = e.target.files?.[0];
+    e.target.value = "";
+    if (!file) return;
+    const token = localStorage.getItem("token") || "";
+    const formData = new FormData();
+    formData.append("file", file);
+    try {
+      const response = await fetch("http://localhost:8000/users/import/csv", {
+        method: "POST",
+        headers: { Authorization: `Bearer ${token}` },
+        body: formData,
+      });
+      const result = await response.json();
+      if (!response.ok && !result.conflicts) {
+        const firstError = result.errors?.[0];
+        throw new Error(
+          firstError ? `${result.message} Fila ${firstError.row}: ${firstError.error}` : result.message
+        );
+      }
+      toast.success(result.message);
+      if (result.conflicts?.length) {
+        toast.warning(`${result.conflicts.length} filas ya existían y no se importaron.`);
+      }
+      fetchUsers();
+    } catch (error: any) {
+      toast.error(error.message || "Error al importar los usuarios.");
     }
   };
 
+  // Al cambiar un filtro se vuelve a la primera página. El nombre espera a que se deje de escribir.
   useEffect(() => {
-    fetchUsers();
-  }, []);
+    const timer = setTimeout(() => fetchUsers(), 300);
+    return () => clearTimeout(timer);
+  }, [typeFilter, nameFilter]);
 
   return (
     <InfoContainer>
@@ -64,6 +135,18 @@ function UsersDashboard() {
             </h1>
             {isAdmin && (
               <div className="d-flex gap-2">
+                <button
+                  className="btn btn-outline-warning d-flex align-items-center"
+                  onClick={exportUsers}
+                >
+                  <i className="bi bi-download me-2"></i>
+                  Exportar CSV
+                </button>
+                <label className="btn btn-outline-info d-flex align-items-center mb-0">
+                  <i className="bi bi-upload me-2"></i>
+                  Importar CSV
+                  <input type="file" accept=".csv" hidden onChange={importUsers} />
+                </label>
                 <Link
                   to="/admin/users/signup"
                   className="btn btn-outline-success d-flex align-items-center"
@@ -78,6 +161,29 @@ function UsersDashboard() {
             <p className="lead mb-4">
               Desde aquí puedes ver la lista de usuarios y editar sus perfiles.
             </p>
+            <div className="row g-2 mb-3">
+              <div className="col-md-4">
+                <select
+                  className="form-select"
+                  value={typeFilter}
+                  onChange={(e) => setTypeFilter(e.target.value)}
+                >
+                  <option value="">Todos los tipos</option>
+                  <option value="alumno">Alumnos</option>
+                  <option value="profesor">Profesores</option>
+                  <option value="administrador">Administradores</option>
+                </select>
+              </div>
+              <div className="col-md-8">
+                <input
+                  type="text"
+                  className="form-control"
+                  placeholder="Buscar por nombre o apellido..."
+                  value={nameFilter}
+                  onChange={(e) => setNameFilter(e.target.value)}
+                />
+              </div>
+            </div>
             {isLoading ? (
               <div className="text-center py-5">
                 <div className="spinner-border text-warning" role="status">
@@ -152,7 +258,9 @@ function UsersDashboard() {
                                   No se encontraron usuarios
                                 </h4>
                                 <p>
-                                  Aún no hay usuarios registrados en el sistema.
+                                  {typeFilter || nameFilter
+                                    ? "Ningún usuario coincide con los filtros."
+                                    : "Aún no hay usuarios registrados en el sistema."}
                                 </p>
                               </div>
                             </td>
@@ -162,6 +270,17 @@ function UsersDashboard() {
                     </table>
                   </div>
                 </div>
+                {nextCursor !== null && (
+                  <div className="text-center mt-3">
+                    <button
+                      className="btn btn-outline-warning"
+                      onClick={() => fetchUsers(nextCursor)}
+                      disabled={isLoadingMore}
+                    >
+                      {isLoadingMore ? "Cargando..." : "Cargar más"}
+                    </button>
+                  </div>
+                )}
               </div>
             )}
           </div>